@@ -15,11 +15,14 @@ Projet : PMO Orchestre
 Date : Novembre 2025
 """
 
+import numpy as np
 import pandas as pd
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
 import math
 
+from tracage_v4 import instrumenter, mesure, ALGORITHME
+
 
 # ========================================
 # CONSTANTES DE CALIBRAGE V4
@@ -28,6 +31,15 @@ import math
 # Ratio de conversion points → heures/semaine
 RATIO_CONVERSION = 0.4  # 1 point ICM/ICC = 0.4h/semaine
 HEURES_SEMAINE_PLAFOND = 40  # Capacité maximale standard
+SEUIL_ATTENTION_H = 36  # Proche saturation
+SEUIL_INFO_H = 30  # Utilisation élevée
+
+# Paliers d'alerte (niveau, seuil h/semaine strictement dépassé), du plus grave au moins grave
+NIVEAUX_ALERTE = [
+    ('CRITIQUE', HEURES_SEMAINE_PLAFOND),
+    ('ATTENTION', SEUIL_ATTENTION_H),
+    ('INFO', SEUIL_INFO_H)
+]
 
 # Seuils de normalisation (grilles 5 plages)
 SEUILS_CHARGE_JH = [20, 50, 100, 200, 300]
@@ -126,6 +138,52 @@ def extraire_nombre_texte(texte: str) -> int:
         return int(texte_str)
 
 
+# Valeurs normalisées par plage (mêmes littéraux que les fonctions scalaires)
+VALEURS_PLAGES = np.array([0.0, 0.2, 0.4, 0.6, 0.8, 1.0])
+
+
+def normaliser_5_plages_serie(valeurs: pd.Series, seuils: List[float]) -> np.ndarray:
+    """
+    Version vectorisée de normaliser_parametre_5_plages.
+    
+    Returns:
+        Tableau de valeurs normalisées (NaN si valeur manquante)
+    """
+    nombres = pd.to_numeric(valeurs, errors='coerce').to_numpy(dtype=float)
+    plages = np.searchsorted(np.asarray(seuils, dtype=float), nombres, side='right')
+    return np.where(np.isnan(nombres), np.nan, VALEURS_PLAGES[np.minimum(plages, 5)])
+
+
+def normaliser_1_5_serie(valeurs: pd.Series) -> np.ndarray:
+    """
+    Version vectorisée de normaliser_echelle_1_5 sur une colonne brute
+    (nombres ou textes "X=Description").
+    
+    Returns:
+        Tableau de valeurs normalisées (NaN si valeur illisible)
+    """
+    nombres = extraire_nombre_serie(valeurs)
+    rangs = np.clip(np.nan_to_num(nombres) - 1, 0, 4).astype(int)
+    return np.where(np.isnan(nombres), np.nan, VALEURS_PLAGES[rangs])
+
+
+def extraire_nombre_serie(valeurs: pd.Series) -> np.ndarray:
+    """
+    Version vectorisée de extraire_nombre_texte.
+    
+    Returns:
+        Tableau de nombres entiers (float, NaN si illisible)
+    """
+    nombres = pd.to_numeric(valeurs, errors='coerce')
+    # Découpage "X=Texte" seulement pour les cellules non numériques
+    textes = nombres.isna() & valeurs.notna()
+    if textes.any():
+        texte = valeurs[textes].astype(str).str.split('=', n=1).str[0].str.strip()
+        nombres = nombres.astype(float)
+        nombres[textes] = pd.to_numeric(texte, errors='coerce')
+    return np.trunc(nombres.to_numpy(dtype=float))
+
+
 # ========================================
 # CONVERSIONS HEURES/SEMAINE
 # ========================================
@@ -154,6 +212,7 @@ def heures_to_icc(heures: float) -> float:
 # CLASSE ALGORITHME AFFECTATION V4
 # ========================================
 
+@instrumenter(ALGORITHME)
 class AlgorithmeAffectationV4:
     """
     Classe contenant tous les algorithmes d'affectation V4.
@@ -292,6 +351,62 @@ class AlgorithmeAffectationV4:
         
         return round(icc, 2)
     
+    # ========================================
+    # CALCUL EN LOT (ICM / ICC)
+    # ========================================
+    
+    def calculer_icm_lot(self, projets_df: pd.DataFrame) -> pd.Series:
+        """
+        ICM de tous les projets en une passe (même résultat que calculer_icm).
+        
+        Args:
+            projets_df: DataFrame projets (colonnes de calculer_icm)
+        
+        Returns:
+            Series ICM alignée sur projets_df (NaN si paramètre manquant
+            ou illisible)
+        """
+        poids = self.ponderations['charge']
+        colonne = lambda nom: projets_df[nom] if nom in projets_df.columns \
+            else pd.Series(np.nan, index=projets_df.index)
+        
+        icm = (
+            normaliser_5_plages_serie(colonne('Charge_JH'), SEUILS_CHARGE_JH) * poids.get('Charge_JH', 19.75) +
+            normaliser_1_5_serie(colonne('Complexite_Tech')) * poids.get('Complexite_Tech', 18.5) +
+            normaliser_5_plages_serie(colonne('Budget_MAD'), SEUILS_BUDGET_MAD) * poids.get('Budget', 14.9) +
+            normaliser_1_5_serie(colonne('Niveau_Risque')) * poids.get('Niveau_Risque', 16.8) +
+            normaliser_5_plages_serie(colonne('Nb_Intervenants'), SEUILS_NB_INTERVENANTS) * poids.get('Nb_Intervenants', 11.25) +
+            normaliser_1_5_serie(colonne('Engagement_Client')) * poids.get('Engagement_Client', 9.3) +
+            normaliser_1_5_serie(colonne('Freq_Instances')) * poids.get('Freq_Instances', 4.65) +
+            normaliser_1_5_serie(colonne('Dispersion_Geo')) * poids.get('Dispersion_Geo', 4.9)
+        )
+        
+        return pd.Series(np.round(icm, 2), index=projets_df.index)
+    
+    def calculer_icc_lot(self, chefs_df: pd.DataFrame) -> pd.Series:
+        """
+        ICC de tous les chefs en une passe (même résultat que calculer_icc).
+        
+        Args:
+            chefs_df: DataFrame chefs (colonnes de calculer_icc)
+        
+        Returns:
+            Series ICC alignée sur chefs_df (NaN si paramètre manquant
+            ou illisible)
+        """
+        poids = self.ponderations['capacite']
+        colonne = lambda nom: chefs_df[nom] if nom in chefs_df.columns \
+            else pd.Series(np.nan, index=chefs_df.index)
+        
+        icc = (
+            normaliser_1_5_serie(colonne('Competences_Mgmt')) * poids.get('Competences_Mgmt', 35.0) +
+            normaliser_5_plages_serie(colonne('Annees_Experience'), SEUILS_EXPERIENCE_ANNEES) * poids.get('Annees_Experience', 30.0) +
+            normaliser_1_5_serie(colonne('Competences_Tech')) * poids.get('Competences_Tech', 25.0) +
+            normaliser_1_5_serie(colonne('Utilisation_IA')) * poids.get('Utilisation_IA', 10.0)
+        )
+        
+        return pd.Series(np.round(icc, 2), index=chefs_df.index)
+    
     # ========================================
     # TAUX D'UTILISATION
     # ========================================
@@ -478,11 +593,97 @@ class AlgorithmeAffectationV4:
         
         return recommendations
 
+    # ========================================
+    # PROPOSITIONS EN LOT
+    # ========================================
+    
+    def proposer_affectations(
+        self,
+        projets_a_affecter: pd.DataFrame,
+        chefs_df: pd.DataFrame,
+        projets_df: pd.DataFrame,
+        favoris: Optional[Dict[str, str]] = None
+    ) -> pd.DataFrame:
+        """
+        Propose un chef pour chaque projet d'une liste, en un seul passage.
+        
+        Même score que recommander_affectation, calculé pour tous les chefs
+        à la fois. Les propositions s'enchaînent : la charge d'un projet
+        proposé est ajoutée à son chef avant de traiter le projet suivant
+        (pas d'empilement sur le même chef).
+        
+        Args:
+            projets_a_affecter: Projets à affecter (ordre de traitement)
+            chefs_df: DataFrame chefs candidats
+            projets_df: DataFrame de tous les projets (charge actuelle)
+            favoris: Dict {ID_Client: ID du chef favori} (bonus +10 points)
+        
+        Returns:
+            DataFrame (une ligne par projet) : ID_Projet, Nom_Projet,
+            ID_Client, Indice_Charge, Chef_Propose, Nom_Chef, Score,
+            Charge_H_Future, Surcharge, Favori
+        """
+        colonnes = ['ID_Projet', 'Nom_Projet', 'ID_Client', 'Indice_Charge', 'Chef_Propose',
+                    'Nom_Chef', 'Score', 'Charge_H_Future', 'Surcharge', 'Favori']
+        if len(projets_a_affecter) == 0 or len(chefs_df) == 0:
+            return pd.DataFrame(columns=colonnes)
+        favoris = favoris or {}
+        
+        ids_chefs = chefs_df['ID_Chef'].to_numpy()
+        noms_chefs = chefs_df['Nom_Prenom'].to_numpy()
+        icc = chefs_df['Capacite_Max'].to_numpy(dtype=float)
+        
+        # Charge actuelle (mêmes projets que calculer_taux_utilisation)
+        en_cours = projets_df[projets_df['Statut'] == 'En cours']
+        charge_icm = en_cours.groupby('Chef_Affecte', observed=True)['Indice_Charge'].sum() \
+            .reindex(ids_chefs, fill_value=0).to_numpy(dtype=float)
+        
+        lignes = []
+        for _, projet in projets_a_affecter.iterrows():
+            icm = projet.get('Indice_Charge', 50)
+            icm = 0.0 if pd.isna(icm) else float(icm)
+            
+            # Même arrondi que calculer_taux_utilisation
+            charge_h = np.round(charge_icm * RATIO_CONVERSION, 1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                taux = np.where(icc > 0, np.round(charge_icm / icc * 100, 1), 0.0)
+            adequation = COEFF_ADEQUATION * (icc / icm if icm > 0 else np.zeros_like(icc))
+            score = np.minimum(np.round((adequation + COEFF_DISPONIBILITE * (1 - taux / 100)) * 100, 1), 100.0)
+            
+            chef_favori = favoris.get(projet.get('ID_Client'))
+            est_favori = ids_chefs == chef_favori
+            score = np.where(est_favori, np.minimum(score + 10, 100), score)
+            
+            charge_future = charge_h + icm_to_heures_semaine(icm)
+            surcharge = charge_future > HEURES_SEMAINE_PLAFOND
+            
+            # Meilleur chef sans surcharge (sinon meilleur score, signalé)
+            candidats = np.where(surcharge, -np.inf, score) if not surcharge.all() else score
+            i = int(np.argmax(candidats))
+            if not surcharge[i]:
+                charge_icm[i] += icm
+            
+            lignes.append({
+                'ID_Projet': projet['ID_Projet'],
+                'Nom_Projet': projet.get('Nom_Projet', ''),
+                'ID_Client': projet.get('ID_Client', ''),
+                'Indice_Charge': icm,
+                'Chef_Propose': ids_chefs[i],
+                'Nom_Chef': noms_chefs[i],
+                'Score': float(score[i]),
+                'Charge_H_Future': round(float(charge_future[i]), 1),
+                'Surcharge': bool(surcharge[i]),
+                'Favori': bool(est_favori[i])
+            })
+        
+        return pd.DataFrame(lignes, columns=colonnes)
+
 
 # ========================================
 # FONCTIONS UTILITAIRES SUPPLÉMENTAIRES
 # ========================================
 
+@mesure(ALGORITHME)
 def valider_affectation(
     chef_id: str,
     nouveau_projet_icm: float,
@@ -513,12 +714,12 @@ def valider_affectation(
             'niveau': 'CRITIQUE',
             'message': f'Surcharge : {charge_future_h:.1f}h/semaine (>40h plafond)'
         })
-    elif charge_future_h > 36:
+    elif charge_future_h > SEUIL_ATTENTION_H:
         alertes.append({
             'niveau': 'ATTENTION',
             'message': f'Proche saturation : {charge_future_h:.1f}h/semaine'
         })
-    elif charge_future_h > 30:
+    elif charge_future_h > SEUIL_INFO_H:
         alertes.append({
             'niveau': 'INFO',
             'message': f'Utilisation élevée : {charge_future_h:.1f}h/semaine'
@@ -12,7 +12,9 @@ Date : Novembre 2025
 
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+import os
 import sys
 
 # Plotly désactivé (non installé dans cet environnement)
@@ -22,7 +24,15 @@ import sys
 # Imports locaux
 sys.path.append('/home/claude')
 from data_manager_v4 import DataManagerV4, init_data_manager
-from algorithme_v4 import AlgorithmeAffectationV4, icm_to_heures_semaine, icc_to_heures_semaine
+from storage_v4 import ErreurStockage
+from algorithme_v4 import AlgorithmeAffectationV4, icm_to_heures_semaine, icc_to_heures_semaine, NIVEAUX_ALERTE
+from charge_v4 import MatriceCharge, IndexDisponibilite
+from nivellement_v4 import niveler_charge
+from rafraichissement_v4 import RafraichisseurDonnees, InstantaneDonnees, obtenir_rafraichisseur
+from ecriture_differee_v4 import EcrivainDiffere, obtenir_ecrivain_differe
+from miroir_v4 import MiroirBackend
+from snapshot_v4 import filtrer_utilisation, paginer, TRANCHES_TAUX, COLONNE_EQUIPE
+from tracage_v4 import Trace, tracer, historique, DONNEES, ALGORITHME
 
 
 # ========================================
@@ -57,39 +67,244 @@ st.markdown("""
 # INITIALISATION SESSION
 # ========================================
 
-# Pas de cache pour permettre les mises à jour
 def get_data_manager():
-    """Initialise le DataManager (sans cache pour permettre affectations)."""
+    """Initialise le DataManager (une instance par processus)."""
+    try:
+        return _creer_data_manager()
+    except ErreurStockage as e:
+        st.error(f"❌ Stockage inaccessible : {e}")
+        st.stop()
+
+
+@st.cache_resource(show_spinner=False)
+def _creer_data_manager():
+    """Construit le DataManager selon la configuration (SQLite local ou Google Sheets)."""
+    # Base SQLite locale (hors-ligne, tests de charge)
+    sqlite_path = os.environ.get('PMO_SQLITE_DB')
+    if sqlite_path:
+        return init_data_manager(sqlite_path=sqlite_path)
+    
     # Charger credentials depuis Streamlit Cloud ou local
+    # (connexion partagée par le processus : authentification unique)
+    credentials_file = None
+    credentials_info = None
     if 'gcp_service_account' in st.secrets:
         # En production (Streamlit Cloud)
-        import json
-        credentials_dict = dict(st.secrets["gcp_service_account"])
-        # Sauvegarder temporairement pour data_manager
-        with open('/tmp/credentials.json', 'w') as f:
-            json.dump(credentials_dict, f)
-        credentials_file = '/tmp/credentials.json'
+        credentials_info = dict(st.secrets["gcp_service_account"])
     else:
         # En local
         credentials_file = '/Users/mac/Documents/DSMIA_PFE/PMO_Orchestre/credentials.json'
     
+    # Miroir local : premier affichage servi sans attendre Google Sheets
+    # (PMO_MIROIR_DB vide pour désactiver)
+    miroir_path = os.environ.get('PMO_MIROIR_DB', '/tmp/pmo_orchestre_miroir.db')
+    
     return init_data_manager(
         credentials_file=credentials_file,
-        sheet_id='1TFCyjjWZirBQG45xXnJ8vzHMo5YrhkiIwHdHaMx7lfs'
+        sheet_id='1TFCyjjWZirBQG45xXnJ8vzHMo5YrhkiIwHdHaMx7lfs',
+        miroir_path=miroir_path or None,
+        credentials_info=credentials_info
     )
 
 def init_session_state():
     """Initialise les variables de session."""
     if 'page' not in st.session_state:
         st.session_state.page = 'Dashboard'
-    if 'last_refresh' not in st.session_state:
-        st.session_state.last_refresh = datetime.now()
+
+
+# ========================================
+# INSTANTANÉ DES DONNÉES
+# ========================================
+
+# Les pages lisent l'instantané préparé en fond (rafraichissement_v4) :
+# rechargé périodiquement et après chaque écriture, jamais pendant un rendu
+def _construire_matrice_alertes(donnees: Dict) -> MatriceCharge:
+    return MatriceCharge.depuis_projets(
+        donnees['projets'], HORIZON_ALERTES_SEMAINES, chefs=donnees['chefs']['ID_Chef'].tolist()
+    )
+
+
+def _construire_index_disponibilite(donnees: Dict) -> IndexDisponibilite:
+    return IndexDisponibilite(MatriceCharge.depuis_projets(
+        donnees['projets'], HORIZON_DISPONIBILITE_SEMAINES, chefs=donnees['chefs']['ID_Chef'].tolist()
+    ))
+
+
+def get_rafraichisseur() -> RafraichisseurDonnees:
+    """Rafraîchisseur partagé du processus (démarré au premier appel)."""
+    return obtenir_rafraichisseur(get_data_manager(), {
+        'matrice_alertes': _construire_matrice_alertes,
+        'index_disponibilite': _construire_index_disponibilite
+    }, dependances={
+        'matrice_alertes': ('projets', 'chefs'),
+        'index_disponibilite': ('projets', 'chefs')
+    })
+
+
+def get_ecrivain_differe() -> Optional[EcrivainDiffere]:
+    """
+    Écriture différée des affectations (journal PMO_JOURNAL_ECRITURES).
+
+    Returns:
+        Écrivain partagé du processus, ou None si le mode est désactivé
+    """
+    chemin_journal = os.environ.get('PMO_JOURNAL_ECRITURES')
+    if not chemin_journal:
+        return None
+    return obtenir_ecrivain_differe(get_data_manager(), get_rafraichisseur(), chemin_journal)
+
+
+def affecter(affectations: List[Tuple[str, str]]) -> Dict[str, Optional[str]]:
+    """
+    Affecte des projets, en écriture différée si elle est activée.
+
+    Args:
+        affectations: Liste de (ID_Projet, ID_Chef)
+
+    Returns:
+        Dict {ID_Projet: None si affecté, sinon message d'erreur}
+    """
+    ecrivain = get_ecrivain_differe()
+    if ecrivain is not None:
+        # Instantané déjà à jour : pas d'attente du Sheet
+        return ecrivain.affecter(affectations)
+    resultats = get_data_manager().affecter_projets(affectations)
+    # Relire après l'écriture : attendre l'instantané déjà demandé par
+    # l'invalidation (pas de second chargement)
+    get_rafraichisseur().rafraichir(attendre=True, timeout=30, rejoindre=True)
+    return resultats
+
+
+def instantane() -> InstantaneDonnees:
+    """Instantané courant (attend uniquement le tout premier chargement)."""
+    donnees = get_rafraichisseur().instantane()
+    if donnees is None:
+        st.error(f"❌ Données indisponibles : {get_rafraichisseur().derniere_erreur}")
+        st.stop()
+    return donnees
+
+
+def charger_donnees(noms: List[str]) -> Dict:
+    """
+    Jeux de données d'une page, lus dans l'instantané courant.
+
+    Args:
+        noms: Jeux parmi rafraichissement_v4.JEUX_INSTANTANE
+
+    Returns:
+        Dict {nom: données} (partagé entre sessions : ne pas modifier)
+    """
+    donnees = instantane().donnees
+    return {nom: donnees[nom] for nom in noms}
+
+
+def matrice_charge() -> MatriceCharge:
+    """Matrice chefs × semaines du balayage des surcharges."""
+    return instantane().index['matrice_alertes']
+
+
+def index_disponibilite() -> IndexDisponibilite:
+    """Index de disponibilité des chefs (page Affectation)."""
+    return instantane().index['index_disponibilite']
+
+
+def format_age(secondes: float) -> str:
+    """Formate l'âge d'un instantané."""
+    if secondes < 60:
+        return f"{secondes:.0f} s"
+    return f"{secondes // 60:.0f} min"
+
+
+# ========================================
+# DIAGNOSTICS DU RENDU
+# ========================================
+
+# Rendus précédents affichés dans l'historique du panneau
+HISTORIQUE_DIAGNOSTICS = 50
+
+
+def format_octets(octets: float) -> str:
+    """Formate une taille en octets."""
+    for unite in ['o', 'Ko', 'Mo']:
+        if octets < 1024:
+            return f"{octets:.0f} {unite}"
+        octets /= 1024
+    return f"{octets:.1f} Go"
+
+
+def afficher_diagnostics(zone, trace: Trace):
+    """
+    Panneau de diagnostic du rendu (sidebar).
+
+    Args:
+        zone: Conteneur Streamlit réservé dans la sidebar
+        trace: Trace fermée du rendu de la page
+    """
+    resume = trace.resume()
+    precedents = pd.DataFrame(historique(trace.nom)[:-1][-HISTORIQUE_DIAGNOSTICS:])
+    
+    with zone.expander("🩺 Diagnostics du rendu", expanded=True):
+        reference = f" (médiane : {precedents['total_s'].median():.2f}s)" if not precedents.empty else ""
+        st.caption(f"Rendu total : {resume['total_s']:.2f}s{reference}")
+        st.caption(f"DataManager : {resume['donnees_s']:.2f}s · Algorithme : {resume['algorithme_s']:.2f}s")
+        st.caption(f"Requêtes Sheets : {resume['requetes_sheets']} · "
+                   f"Téléchargé : {format_octets(resume['octets_sheets'])}")
+        
+        appels = [
+            {'Appel': ligne['appel'], 'Nb': ligne['nb'], 'Durée (ms)': round(ligne['duree_s'] * 1000, 1)}
+            for categorie in [DONNEES, ALGORITHME]
+            for ligne in trace.detail(categorie)
+        ]
+        if appels:
+            st.dataframe(pd.DataFrame(appels), width='stretch', hide_index=True)
+        
+        rendus = pd.DataFrame(historique(trace.nom)[-HISTORIQUE_DIAGNOSTICS:])
+        if len(rendus) > 1:
+            st.caption(f"Derniers rendus de la page ({len(rendus)})")
+            st.line_chart(
+                rendus.set_index('horodatage')[['total_s', 'donnees_s', 'algorithme_s']],
+                height=150
+            )
+        
+        rafraichissements = historique('rafraichissement')[-5:]
+        if rafraichissements:
+            st.caption("Derniers rafraîchissements (arrière-plan)")
+            st.dataframe(pd.DataFrame([{
+                'Heure': r['horodatage'].strftime('%H:%M:%S'),
+                'Durée (s)': round(r['total_s'], 2),
+                'Requêtes': r['requetes_sheets'],
+                'Téléchargé': format_octets(r['octets_sheets'])
+            } for r in reversed(rafraichissements)]), width='stretch', hide_index=True)
+        
+        memoire = instantane().memoire
+        st.caption(f"Mémoire des données : {format_octets(memoire['memoire_ko'].sum() * 1024)}")
+        st.dataframe(memoire.rename(columns={
+            'jeu': 'Jeu', 'lignes': 'Lignes', 'colonnes': 'Colonnes',
+            'categorielles': 'Catégorielles', 'memoire_ko': 'Mémoire (Ko)'
+        }), width='stretch', hide_index=True)
 
 
 # ========================================
 # FONCTIONS UTILITAIRES
 # ========================================
 
+# Horizon du balayage des surcharges (dashboard)
+HORIZON_ALERTES_SEMAINES = 12
+
+# Horizon de l'index de disponibilité (page Affectation)
+HORIZON_DISPONIBILITE_SEMAINES = 26
+
+# Vue utilisation des chefs (dashboard)
+CHEFS_PAR_PAGE = 20
+TRIS_UTILISATION = {
+    'Taux (décroissant)': ('Taux_Calc', True),
+    'Taux (croissant)': ('Taux_Calc', False),
+    'Charge (h/sem)': ('Charge_H', True),
+    'Nb projets': ('Projets_Actifs', True),
+    'Nom': ('Nom_Prenom', False)
+}
+
+
 def get_color_taux(taux_pct: float) -> str:
     """Retourne couleur selon taux utilisation."""
     if taux_pct >= 100:
@@ -117,18 +332,18 @@ def page_dashboard():
     """Page tableau de bord principal."""
     st.title("📊 Dashboard PMO")
     
-    dm = get_data_manager()
-    projets = dm.get_projets()
-    chefs = dm.get_chefs()
+    donnees = charger_donnees(['projets', 'chefs', 'charge', 'noms'])
+    projets = donnees['projets']
+    chefs = donnees['chefs']
+    charge = donnees['charge']
+    noms = donnees['noms']
     
     # Métriques globales
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         # Gestion colonne Statut manquante
-        nb_en_cours = 0
-        if 'Statut' in projets.columns:
-            nb_en_cours = len(projets[projets['Statut']=='Actif'])
+        nb_en_cours = charge.nb_statut('Actif')
         st.metric(
             "Total Projets",
             len(projets),
@@ -160,22 +375,8 @@ def page_dashboard():
         )
     
     with col4:
-        # Recalculer charge moyenne depuis les projets réels
-        charges_reelles = []
-        for _, chef in chefs.iterrows():
-            chef_id = chef['ID_Chef']
-            icc = chef.get('Capacite_Max', 100)
-            
-            # Somme ICM des projets actifs
-            charge_icm = projets[
-                (projets['Chef_Affecte'] == chef_id) & 
-                (projets['Statut'] == 'Actif')
-            ]['Indice_Charge'].sum()
-            
-            taux = (charge_icm / icc * 100) if icc > 0 else 0
-            charges_reelles.append(taux)
-        
-        charge_moy = sum(charges_reelles) / len(charges_reelles) if charges_reelles else 0
+        # Charge moyenne depuis les projets réels (snapshot)
+        charge_moy = charge.charge_moyenne()
         
         st.metric(
             "Charge moyenne",
@@ -188,34 +389,8 @@ def page_dashboard():
     # Graphique synthèse chefs
     st.subheader("📊 Vue d'ensemble des chefs")
     
-    # Calculer métriques réelles pour chaque chef
-    chefs_summary = chefs.copy()
-    
-    for idx, chef in chefs_summary.iterrows():
-        chef_id = chef['ID_Chef']
-        
-        # Compter projets actifs réels
-        nb_projets = len(projets[
-            (projets['Chef_Affecte'] == chef_id) & 
-            (projets['Statut'] == 'Actif')
-        ])
-        
-        # Calculer charge réelle
-        charge_icm = projets[
-            (projets['Chef_Affecte'] == chef_id) & 
-            (projets['Statut'] == 'Actif')
-        ]['Indice_Charge'].sum()
-        
-        charge_h = charge_icm * 0.4
-        
-        # Calculer taux réel
-        icc = chef['Capacite_Max']
-        taux_reel = (charge_icm / icc * 100) if icc > 0 else 0
-        
-        # Mettre à jour
-        chefs_summary.at[idx, 'Projets_Actifs'] = nb_projets
-        chefs_summary.at[idx, 'Charge_H'] = charge_h
-        chefs_summary.at[idx, 'Taux_Calc'] = taux_reel
+    # Métriques réelles de chaque chef (snapshot de charge)
+    chefs_summary = charge.joindre(chefs)
     
     # Tableau synthèse
     df_summary_display = chefs_summary[['Nom_Prenom', 'Charge_H', 'Projets_Actifs', 'Taux_Calc']].copy()
@@ -232,17 +407,115 @@ def page_dashboard():
         width='stretch',
         hide_index=True
     )
-    
+
     st.markdown("---")
-    
-    # Utilisation des chefs
+
+    # Alertes de surcharge (toutes semaines, tous chefs)
+    st.subheader(f"🚨 Alertes de surcharge ({HORIZON_ALERTES_SEMAINES} semaines)")
+
+    matrice = matrice_charge()
+    alertes = matrice.scanner_surcharges()
+
+    if len(alertes) == 0:
+        st.success("✅ Aucune semaine au-dessus de 30h/semaine")
+    else:
+        colonnes_niveaux = st.columns(len(NIVEAUX_ALERTE))
+        for col, (niveau, seuil) in zip(colonnes_niveaux, NIVEAUX_ALERTE):
+            with col:
+                st.metric(f"{niveau} (>{seuil}h)", int((alertes['Niveau'] == niveau).sum()))
+
+        alertes_display = alertes.assign(
+            Chef=noms.noms_chefs(alertes['Chef_ID']),
+            Date=pd.to_datetime(alertes['Date']).dt.strftime('%d/%m/%Y')
+        )
+        st.dataframe(
+            alertes_display[['Chef', 'Semaine', 'Date', 'Charge_H', 'Niveau']].rename(columns={
+                'Charge_H': 'Charge (h/sem)'
+            }),
+            width='stretch',
+            hide_index=True
+        )
+
+        # Lissage : décaler les projets non démarrés plutôt que réaffecter
+        if st.button("🪄 Proposer un lissage (décalage des dates de début)"):
+            resultat = niveler_charge(projets, HORIZON_ALERTES_SEMAINES)
+            resume = resultat.resume()
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Projets décalés", resume['projets_decales'])
+            with col2:
+                st.metric(
+                    "Semaines > 40h",
+                    resume['semaines_surcharge_apres'],
+                    delta=resume['semaines_surcharge_apres'] - resume['semaines_surcharge_avant'],
+                    delta_color="inverse"
+                )
+            with col3:
+                st.metric(
+                    "Pic de charge",
+                    f"{resume['pic_apres_h']:.1f}h",
+                    delta=f"{resume['pic_apres_h'] - resume['pic_avant_h']:.1f}h",
+                    delta_color="inverse"
+                )
+
+            propositions = resultat.propositions
+            if len(propositions) > 0:
+                st.dataframe(
+                    propositions.assign(
+                        Chef=noms.noms_chefs(propositions['Chef_ID']),
+                        Date_Debut=propositions['Date_Debut'].dt.strftime('%d/%m/%Y'),
+                        Nouvelle_Date_Debut=propositions['Nouvelle_Date_Debut'].dt.strftime('%d/%m/%Y')
+                    )[['ID_Projet', 'Chef', 'Date_Debut', 'Nouvelle_Date_Debut', 'Decalage_Semaines', 'Charge_H']].rename(columns={
+                        'Date_Debut': 'Début actuel',
+                        'Nouvelle_Date_Debut': 'Début proposé',
+                        'Decalage_Semaines': 'Décalage (sem)',
+                        'Charge_H': 'Charge (h/sem)'
+                    }),
+                    width='stretch',
+                    hide_index=True
+                )
+
+    st.markdown("---")
+
+    # Utilisation des chefs (filtrée et paginée côté serveur)
     st.subheader("👥 Utilisation des chefs de projet")
     
-    for _, chef in chefs_summary.iterrows():
-        # Vérifier si Statut existe
-        if 'Statut' in chef.index and chef.get('Statut') != 'Actif':
-            continue
-        
+    col1, col2, col3 = st.columns([2, 2, 3])
+    with col1:
+        surcharges_seulement = st.checkbox("Surchargés uniquement (≥ 100%)", key='util_surcharges')
+        tri = st.selectbox(
+            "Trier par",
+            list(TRIS_UTILISATION),
+            key='util_tri'
+        )
+    with col2:
+        equipes = []
+        if COLONNE_EQUIPE in chefs_summary.columns:
+            equipes = st.multiselect(
+                "Équipe",
+                sorted(chefs_summary[COLONNE_EQUIPE].dropna().unique()),
+                key='util_equipes'
+            )
+    with col3:
+        tranches = st.multiselect("Tranche de taux", list(TRANCHES_TAUX), key='util_tranches')
+    
+    colonne_tri, decroissant = TRIS_UTILISATION[tri]
+    chefs_filtres = filtrer_utilisation(
+        chefs_summary, surcharges_seulement, equipes, tranches, colonne_tri, decroissant
+    )
+    
+    if len(chefs_filtres) == 0:
+        st.info("Aucun chef ne correspond aux filtres")
+        return
+    
+    nb_pages = paginer(chefs_filtres, 1, CHEFS_PAR_PAGE)[1]
+    page = st.number_input(
+        f"Page (sur {nb_pages})", min_value=1, max_value=nb_pages, value=1, step=1, key='util_page'
+    ) if nb_pages > 1 else 1
+    chefs_page, _ = paginer(chefs_filtres, int(page), CHEFS_PAR_PAGE)
+    st.caption(f"{len(chefs_filtres)} chef(s) · {CHEFS_PAR_PAGE} par page")
+    
+    for _, chef in chefs_page.iterrows():
         # Utiliser taux calculé
         taux = chef.get('Taux_Calc', 0)
         couleur = get_color_taux(taux)
@@ -277,20 +550,14 @@ def page_dashboard():
                 int(chef.get('Projets_Actifs', 0))
             )
         
-        # Détail projets (expander)
-        projets_chef = projets[
-            (projets['Chef_Affecte'] == chef['ID_Chef']) &
-            (projets['Statut'] == 'Actif')
-        ]
-        
-        if len(projets_chef) > 0:
-            with st.expander(f"{couleur} Détail projets"):
-                for _, p in projets_chef.iterrows():
+        # Détail projets : calculé seulement quand l'interrupteur est activé
+        # (état conservé par session via la clé)
+        if chef.get('Projets_Actifs', 0) > 0:
+            if st.toggle(f"{couleur} Détail projets", key=f"detail_chef_{chef['ID_Chef']}"):
+                projets_chef = charge.projets_actifs(chef['ID_Chef'])
+                for _, p in noms.ajouter_noms(projets_chef).iterrows():
                     icm_h = p.get('ICM_H_Semaine', 0)
-                    # Récupérer nom client
-                    client_id = p.get('ID_Client', '')
-                    client = dm.get_client_by_id(client_id)
-                    client_nom = client.get('Nom_Client', client_id) if client else client_id
+                    client_nom = p.get('Nom_Client', '')
                     
                     st.write(f"• **{p['ID_Projet']}** - {client_nom} - {p['Nom_Projet']} : {p['Indice_Charge']:.0f} pts ({icm_h:.1f}h/sem)")
 
@@ -303,13 +570,22 @@ def page_affectation():
     """Page d'affectation intelligente."""
     st.title("🤖 Affectation Intelligente")
     
-    dm = get_data_manager()
-    projets = dm.get_projets()
-    chefs = dm.get_chefs()
-    ponderations = dm.get_ponderations()
+    # Message de la dernière affectation (affiché après le rerun)
+    message = st.session_state.pop('message_affectation', None)
+    if message:
+        st.success(message)
+        st.balloons()
+    
+    donnees = charger_donnees(
+        ['projets', 'chefs', 'ponderations', 'projets_non_affectes', 'noms']
+    )
+    projets = donnees['projets']
+    chefs = donnees['chefs']
+    ponderations = donnees['ponderations']
+    noms = donnees['noms']
     
     # Sélection projet avec ID et Client
-    projets_non_affectes = dm.get_projets_non_affectes()
+    projets_non_affectes = donnees['projets_non_affectes']
     
     if len(projets_non_affectes) == 0:
         st.info("✅ Tous les projets sont affectés !")
@@ -333,9 +609,9 @@ def page_affectation():
     # Affichage projet
     col1, col2, col3 = st.columns(3)
     
-    # Récupérer infos client
+    # Récupérer infos client (correspondances chargées une fois)
     client_id = projet.get('ID_Client', '')
-    client = dm.get_client_by_id(client_id)
+    client = noms.client(client_id)
     client_nom = client.get('Nom_Client', client_id) if client else client_id
     chef_favori_id = client.get('Chef_Favori', '') if client else ''
     
@@ -343,9 +619,8 @@ def page_affectation():
     st.info(f"📋 **Client :** {client_nom} ({client_id})")
     
     if chef_favori_id:
-        chef_fav = chefs[chefs['ID_Chef'] == chef_favori_id]
-        if len(chef_fav) > 0:
-            chef_favori_nom = chef_fav.iloc[0]['Nom_Prenom']
+        chef_favori_nom = noms.noms_par_chef.get(chef_favori_id)
+        if chef_favori_nom is not None:
             st.success(f"⭐ **Chef favori du client :** {chef_favori_nom} ({chef_favori_id})")
     
     with col1:
@@ -363,10 +638,29 @@ def page_affectation():
     
     st.markdown("---")
     
+    # Pré-filtre : chefs ayant la marge sur toute la durée du projet
+    index_dispo = index_disponibilite()
+    debut_projet = projet.get('Date_Debut')
+    fin_projet = projet.get('Date_Fin_Prev')
+    debut_projet = 0 if pd.isna(debut_projet) else debut_projet
+    fin_projet = HORIZON_DISPONIBILITE_SEMAINES - 1 if pd.isna(fin_projet) else fin_projet
+    chefs_dispo = index_dispo.chefs_disponibles(icm_h, debut_projet, fin_projet)
+    
+    # Projet hors de l'horizon de l'index : disponibilité inconnue, pas de pré-filtre
+    if chefs_dispo is None:
+        st.caption("🗓️ Dates du projet hors de l'horizon de disponibilité : aucun pré-filtre possible")
+        filtrer_dispo = False
+    else:
+        filtrer_dispo = st.checkbox(
+            f"🗓️ Seulement les chefs disponibles sur toute la durée du projet "
+            f"({len(chefs_dispo)}/{len(chefs)} chefs peuvent absorber {icm_h:.1f}h/sem)"
+        )
+    
     # Bouton recommandation
     if st.button("🔍 Obtenir Recommandations", type="primary"):
         with st.spinner("Calcul en cours..."):
             algo = AlgorithmeAffectationV4(ponderations)
+            chefs_candidats = chefs[chefs['ID_Chef'].isin(chefs_dispo['Chef_ID'])] if filtrer_dispo else chefs
             
             # Récupérer client et son chef favori
             client_id = projet.get('ID_Client')
@@ -374,18 +668,17 @@ def page_affectation():
             chef_favori_nom = None
             
             if client_id:
-                client = dm.get_client_by_id(client_id)
+                client = noms.client(client_id)
                 if client and 'Chef_Favori' in client:
                     chef_favori_id = client.get('Chef_Favori')
                     # Récupérer nom du chef favori
                     if chef_favori_id:
-                        chef_fav = chefs[chefs['ID_Chef'] == chef_favori_id]
-                        if len(chef_fav) > 0:
-                            chef_favori_nom = chef_fav.iloc[0]['Nom_Prenom']
+                        chef_favori_nom = noms.noms_par_chef.get(chef_favori_id)
+                        if chef_favori_nom is not None:
                             st.success(f"⭐ **Chef favori du client :** {chef_favori_nom} ({chef_favori_id})")
             
             recommendations = algo.recommander_affectation(
-                projet, chefs, projets, chef_favori_id=chef_favori_id
+                projet, chefs_candidats, projets, chef_favori_id=chef_favori_id
             )
             st.session_state['recommendations'] = recommendations
             st.session_state['projet_actuel'] = projet
@@ -412,25 +705,19 @@ def page_affectation():
                 if st.button(f"✅ Affecter", key=btn_key, type="primary" if i==1 else "secondary"):
                     if not reco['surcharge']:
                         with st.spinner("Affectation en cours..."):
-                            dm_temp = get_data_manager()
-                            success = dm_temp.affecter_projet(
-                                projet['ID_Projet'],
-                                reco['chef_id']
-                            )
+                            erreur = affecter([(projet['ID_Projet'], reco['chef_id'])]).get(projet['ID_Projet'])
                             
-                            if success:
-                                st.success(f"✅ Projet affecté à {reco['chef_nom']} !")
-                                st.balloons()
+                            if erreur is None:
+                                st.session_state['message_affectation'] = \
+                                    f"✅ Projet affecté à {reco['chef_nom']} !"
                                 # Nettoyer session state
                                 if 'recommendations' in st.session_state:
                                     del st.session_state['recommendations']
                                 if 'projet_actuel' in st.session_state:
                                     del st.session_state['projet_actuel']
-                                import time
-                                time.sleep(2)
                                 st.rerun()
                             else:
-                                st.error("❌ Erreur lors de l'affectation")
+                                st.error(f"❌ Erreur lors de l'affectation : {erreur}")
                     else:
                         st.error(f"❌ Surcharge ! {reco['chef_nom']} dépasserait 40h/sem")
             
@@ -488,6 +775,99 @@ def page_affectation():
             st.markdown("---")  # Séparateur entre recommandations
 
 
+# ========================================
+# PAGE : AFFECTATION EN LOT
+# ========================================
+
+def page_affectation_lot():
+    """Page d'affectation groupée des projets non affectés."""
+    st.title("📦 Affectation en lot")
+    
+    # Rapport de la dernière validation (affiché après le rerun)
+    rapport = st.session_state.pop('rapport_affectation_lot', None)
+    if rapport is not None:
+        nb_ok = int((rapport['Résultat'] == '✅ Affecté').sum())
+        if nb_ok == len(rapport):
+            st.success(f"✅ {nb_ok} projet(s) affecté(s)")
+        else:
+            st.warning(f"⚠️ {nb_ok}/{len(rapport)} projet(s) affecté(s)")
+        st.dataframe(rapport, width='stretch', hide_index=True)
+    
+    donnees = charger_donnees(['projets', 'chefs', 'clients', 'ponderations', 'projets_non_affectes', 'noms'])
+    chefs = donnees['chefs']
+    clients = donnees['clients']
+    noms = donnees['noms']
+    projets_non_affectes = donnees['projets_non_affectes']
+    
+    if len(projets_non_affectes) == 0:
+        st.info("✅ Tous les projets sont affectés !")
+        return
+    
+    # Propositions pour tous les projets (un seul passage)
+    favoris = {}
+    if {'ID_Client', 'Chef_Favori'}.issubset(clients.columns):
+        favoris = dict(zip(clients['ID_Client'], clients['Chef_Favori']))
+    algo = AlgorithmeAffectationV4(donnees['ponderations'])
+    propositions = algo.proposer_affectations(
+        projets_non_affectes, chefs, donnees['projets'], favoris
+    )
+    
+    st.caption(
+        f"{len(propositions)} projet(s) non affecté(s) · "
+        f"{int(propositions['Surcharge'].sum())} sans chef disponible sous 40h/sem"
+    )
+    
+    # Tableau éditable : chef modifiable, lignes à valider cochées
+    options_chefs = (chefs['ID_Chef'] + ' - ' + chefs['Nom_Prenom']).tolist()
+    tableau = pd.DataFrame({
+        'Valider': ~propositions['Surcharge'],
+        'ID_Projet': propositions['ID_Projet'],
+        'Projet': propositions['Nom_Projet'],
+        'Client': noms.noms_clients(propositions['ID_Client']),
+        'ICM': propositions['Indice_Charge'],
+        'Chef': propositions['Chef_Propose'] + ' - ' + propositions['Nom_Chef'],
+        'Score': propositions['Score'],
+        'Charge future (h/sem)': propositions['Charge_H_Future'],
+        'Favori': propositions['Favori'].map({True: '⭐', False: ''})
+    })
+    
+    edite = st.data_editor(
+        tableau,
+        column_config={
+            'Valider': st.column_config.CheckboxColumn("Valider"),
+            'Chef': st.column_config.SelectboxColumn("Chef", options=options_chefs, required=True),
+            'ICM': st.column_config.NumberColumn("ICM", format="%.0f"),
+            'Score': st.column_config.NumberColumn("Score", format="%.0f")
+        },
+        disabled=['ID_Projet', 'Projet', 'Client', 'ICM', 'Score', 'Charge future (h/sem)', 'Favori'],
+        width='stretch',
+        hide_index=True,
+        key='editeur_affectation_lot'
+    )
+    
+    retenues = edite[edite['Valider']]
+    
+    if st.button(f"✅ Valider {len(retenues)} affectation(s)", type="primary", disabled=len(retenues) == 0):
+        affectations = [
+            (projet_id, chef.split(' - ')[0])
+            for projet_id, chef in zip(retenues['ID_Projet'], retenues['Chef'])
+        ]
+        with st.spinner("Affectation en cours..."):
+            resultats = affecter(affectations)
+        
+        # Rapport ligne par ligne
+        st.session_state['rapport_affectation_lot'] = pd.DataFrame({
+            'ID_Projet': [projet_id for projet_id, _ in affectations],
+            'Chef': retenues['Chef'].tolist(),
+            'Résultat': [
+                '✅ Affecté' if resultats.get(projet_id) is None else f"❌ {resultats[projet_id]}"
+                for projet_id, _ in affectations
+            ]
+        })
+        del st.session_state['editeur_affectation_lot']
+        st.rerun()
+
+
 # ========================================
 # PAGE : PROJETS
 # ========================================
@@ -496,9 +876,10 @@ def page_projets():
     """Page liste des projets."""
     st.title("📁 Gestion des Projets")
     
-    dm = get_data_manager()
-    projets = dm.get_projets()
-    chefs = dm.get_chefs()  # Charger les chefs pour afficher noms
+    # Charger les correspondances de noms avec les projets
+    donnees = charger_donnees(['projets', 'noms'])
+    projets = donnees['projets']
+    noms = donnees['noms']
     
     # Filtres
     col1, col2 = st.columns(2)
@@ -534,16 +915,12 @@ def page_projets():
     # Créer copie pour affichage avec nom client
     df_display = df_filtre[colonnes_disponibles].copy()
     
-    # Ajouter colonne Nom_Client
-    df_display.insert(2, 'Nom_Client', df_filtre['ID_Client'].apply(
-        lambda x: dm.get_client_by_id(x).get('Nom_Client', x) if dm.get_client_by_id(x) else x
-    ))
+    # Ajouter colonne Nom_Client (un seul map, sans appel au stockage)
+    df_display.insert(2, 'Nom_Client', noms.noms_clients(df_filtre['ID_Client']))
     
     # Remplacer Chef_Affecte (ID) par Nom du chef
     if 'Chef_Affecte' in df_display.columns:
-        df_display['Nom_Chef'] = df_display['Chef_Affecte'].apply(
-            lambda x: chefs[chefs['ID_Chef'] == x]['Nom_Prenom'].iloc[0] if len(chefs[chefs['ID_Chef'] == x]) > 0 else x
-        )
+        df_display['Nom_Chef'] = noms.noms_chefs(df_display['Chef_Affecte'])
         # Insérer après Chef_Affecte
         idx = list(df_display.columns).index('Chef_Affecte')
         cols = list(df_display.columns)
@@ -573,36 +950,15 @@ def page_chefs():
     """Page liste des chefs."""
     st.title("👥 Gestion des Chefs de Projet")
     
-    dm = get_data_manager()
-    chefs = dm.get_chefs()
-    projets = dm.get_projets()
+    donnees = charger_donnees(['chefs', 'charge'])
+    chefs = donnees['chefs']
     
-    # Calculer métriques réelles pour chaque chef
-    chefs_display = chefs.copy()
-    
-    for idx, chef in chefs_display.iterrows():
-        chef_id = chef['ID_Chef']
-        
-        # Compter projets actifs réels
-        nb_projets = len(projets[
-            (projets['Chef_Affecte'] == chef_id) & 
-            (projets['Statut'] == 'Actif')
-        ])
-        
-        # Calculer charge réelle
-        charge_icm = projets[
-            (projets['Chef_Affecte'] == chef_id) & 
-            (projets['Statut'] == 'Actif')
-        ]['Indice_Charge'].sum()
-        
-        # Calculer taux réel
-        icc = chef['Capacite_Max']
-        taux_reel = (charge_icm / icc * 100) if icc > 0 else 0
-        
-        # Mettre à jour
-        chefs_display.at[idx, 'Nb_Projets_Actifs'] = nb_projets
-        chefs_display.at[idx, 'Charge_Actuelle'] = charge_icm
-        chefs_display.at[idx, 'Taux_Charge_Pct'] = taux_reel
+    # Métriques réelles de chaque chef (snapshot de charge)
+    chefs_display = donnees['charge'].joindre(chefs, {
+        'Projets_Actifs': 'Nb_Projets_Actifs',
+        'Charge_ICM': 'Charge_Actuelle',
+        'Taux_Calc': 'Taux_Charge_Pct'
+    })
     
     # Réorganiser colonnes
     colonnes_affichees = ['ID_Chef', 'Nom_Prenom', 'Capacite_Max', 'ICC_H_Semaine',
@@ -645,7 +1001,7 @@ def main():
         
         page = st.radio(
             "Navigation",
-            ["Dashboard", "Affectation", "Projets", "Chefs"],
+            ["Dashboard", "Affectation", "Affectation en lot", "Projets", "Chefs"],
             key='page_selector'
         )
         
@@ -653,20 +1009,74 @@ def main():
         
         # Bouton refresh
         if st.button("🔄 Actualiser"):
-            st.cache_resource.clear()
+            # Réconciliation avec le Sheet puis nouvel instantané
+            get_rafraichisseur().rafraichir(attendre=True, synchroniser=True)
             st.rerun()
         
-        st.caption(f"Dernière mise à jour : {st.session_state.last_refresh.strftime('%H:%M')}")
+        etat = get_rafraichisseur().etat()
+        if etat['age_s'] is not None:
+            st.caption(f"Données : il y a {format_age(etat['age_s'])} (chargées en {etat['duree_s']:.1f}s)")
+        if etat['en_cours']:
+            st.caption("⏳ Rafraîchissement en cours…")
+        if etat['erreur']:
+            st.caption(f"⚠️ Dernier rafraîchissement en échec : {etat['erreur']}")
+        # Feuilles que le miroir n'a pas pu relire (copie locale servie)
+        backend = get_data_manager().backend
+        if isinstance(backend, MiroirBackend) and backend.derniere_erreur:
+            st.caption(f"⚠️ Miroir non synchronisé : {backend.derniere_erreur}")
+        
+        # Cellules illisibles du Sheet (schema_v4), à corriger à la source
+        anomalies = get_data_manager().rapport_validation()
+        if len(anomalies):
+            with st.expander(f"⚠️ Saisie : {len(anomalies)} anomalie(s)"):
+                st.dataframe(anomalies.rename(columns={
+                    'feuille': 'Feuille', 'ligne': 'Ligne', 'identifiant': 'ID',
+                    'colonne': 'Colonne', 'valeur': 'Valeur', 'motif': 'Motif'
+                }), width='stretch', hide_index=True)
+        
+        # Affectations journalisées, pas encore écrites dans le stockage
+        ecrivain = get_ecrivain_differe()
+        if ecrivain is not None:
+            ecritures = ecrivain.etat()
+            with st.expander(f"📝 Écritures : {ecritures['en_attente']} en attente"):
+                st.caption(f"Écrites : {ecritures['ecrites']} · Rejetées : {ecritures['rejetees']}")
+                if ecritures['dernier_vidage'] is not None:
+                    st.caption(f"Dernier vidage : {ecritures['dernier_vidage']:%H:%M:%S}")
+                if ecritures['erreur']:
+                    st.caption(f"⚠️ Dernier essai en échec : {ecritures['erreur']}")
+                if st.button("📤 Écrire maintenant", disabled=ecritures['en_attente'] == 0):
+                    ecrivain.vider()
+                    st.rerun()
+                st.dataframe(ecrivain.journal.dernieres(20), width='stretch', hide_index=True)
+        
+        # Quota Google Sheets (ordonnanceur partagé du processus)
+        metriques = get_data_manager().metriques_stockage()
+        if metriques:
+            with st.expander("📶 Quota Google Sheets"):
+                st.caption(f"File d'attente : {metriques['en_attente']} · En cours : {metriques['en_cours']}")
+                st.caption(f"Requêtes : {metriques['requetes']} · Regroupées : {metriques['coalescees']}")
+                st.caption(f"Limitées : {metriques['limitees']} ({metriques['attente_quota_s']:.1f}s)")
+                st.caption(f"Reprises 429/5xx : {metriques['reessais']} · Échecs : {metriques['echecs']}")
+        
+        # Profil du rendu (opt-in) : rempli une fois la page affichée
+        diagnostics = st.checkbox("🩺 Diagnostics du rendu", key='diagnostics')
+        zone_diagnostics = st.container()
     
     # Routing
-    if page == "Dashboard":
-        page_dashboard()
-    elif page == "Affectation":
-        page_affectation()
-    elif page == "Projets":
-        page_projets()
-    elif page == "Chefs":
-        page_chefs()
+    pages = {
+        "Dashboard": page_dashboard,
+        "Affectation": page_affectation,
+        "Affectation en lot": page_affectation_lot,
+        "Projets": page_projets,
+        "Chefs": page_chefs
+    }
+    if not diagnostics:
+        pages[page]()
+        return
+    
+    with tracer(f"page:{page}") as trace:
+        pages[page]()
+    afficher_diagnostics(zone_diagnostics, trace)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,320 @@
+"""
+Benchmark - Montée en charge multi-sessions de l'application
+=============================================================
+
+Simule N sessions Streamlit simultanées qui parcourent les pages
+(Dashboard, Affectation, Projets, Chefs) sans navigateur, avec
+streamlit.testing (AppTest), contre le faux client gspread en mémoire
+(faux_gspread_v4) :
+- latence fixe par requête API
+- erreurs 429 (quota) injectées avec une probabilité donnée
+- quota de l'ordonnanceur configurable (60 requêtes/minute par défaut,
+  comme le compte de service réel)
+
+Chaque rendu est chronométré (exécution complète du script, sidebar
+comprise) et tracé (tracage_v4) pour compter les requêtes API émises
+par la session elle-même ; les requêtes du rafraîchissement en fond
+sont comptées à part.
+
+AppTest n'est pas réentrant (Runtime et configuration globaux) : les
+rendus passent un par un, dans l'ordre d'arrivée. La latence rapportée
+inclut l'attente dans cette file, le temps de service est donné à part.
+Les rendus lisant l'instantané en mémoire (pas d'E/S) et se partageant
+le GIL, c'est proche d'un serveur Streamlit unique ; le rafraîchissement
+en fond tourne, lui, réellement en parallèle.
+
+Sur la page Affectation, chaque rendu choisit un projet et demande les
+recommandations ; aucune affectation n'est écrite.
+
+Usage :
+    python benchmarks/bench_charge_sessions.py [--sessions 10] [--rendus 20]
+        [--pause 0.5] [--latence 0.2] [--taux-429 0.05] [--quota 60]
+        [--projets 500] [--chefs 40]
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streamlit.testing.v1 import AppTest
+
+import app_v4
+from data_manager_v4 import DataManagerV4
+from faux_gspread_v4 import FauxClientGspread
+from ordonnanceur_v4 import OrdonnanceurRequetes
+from rafraichissement_v4 import obtenir_rafraichisseur
+from storage_v4 import SheetsBackend
+
+
+PAGES = ['Dashboard', 'Affectation', 'Projets', 'Chefs']
+
+# Un seul AppTest exécuté à la fois dans le processus
+_VERROU_APPTEST = threading.Lock()
+
+
+# ========================================
+# DONNÉES
+# ========================================
+
+def donnees_exemple(nb_projets=500, nb_chefs=40, graine=1):
+    """Jeu de données synthétique au format get_all_records."""
+    rng = np.random.default_rng(graine)
+    chefs = pd.DataFrame({
+        'ID_Chef': [f'CP{i:03d}' for i in range(nb_chefs)],
+        'Nom_Prenom': [f'Chef {i}' for i in range(nb_chefs)],
+        'Equipe': rng.choice(['Nord', 'Sud', 'Centre'], nb_chefs),
+        'Statut': 'Actif',
+        'Annees_Experience': rng.integers(1, 20, nb_chefs),
+        'Competences_Mgmt': rng.integers(1, 6, nb_chefs),
+        'Competences_Tech': rng.integers(1, 6, nb_chefs),
+        'Utilisation_IA': rng.integers(1, 6, nb_chefs),
+        'Capacite_Max': 100,
+        'ICC_H_Semaine': 40
+    })
+    clients = pd.DataFrame({
+        'ID_Client': [f'CL{i:02d}' for i in range(10)],
+        'Nom_Client': [f'Client {i}' for i in range(10)],
+        'Chef_Favori': ''
+    })
+    debut = pd.Timestamp.now().normalize() + pd.to_timedelta(rng.integers(-120, 120, nb_projets), unit='D')
+    projets = pd.DataFrame({
+        'ID_Projet': [f'PRJ{i:04d}' for i in range(nb_projets)],
+        'Nom_Projet': [f'Projet {i}' for i in range(nb_projets)],
+        'ID_Client': rng.choice(clients['ID_Client'], nb_projets),
+        'Statut': rng.choice(['Actif', 'En cours', 'Planifié', 'Clos'], nb_projets),
+        'Charge_JH': rng.integers(10, 400, nb_projets),
+        'Complexite_Tech': rng.integers(1, 6, nb_projets),
+        'Budget_MAD': rng.integers(100_000, 5_000_000, nb_projets),
+        'Niveau_Risque': rng.integers(1, 6, nb_projets),
+        'Nb_Intervenants': rng.integers(1, 20, nb_projets),
+        'Engagement_Client': rng.integers(1, 6, nb_projets),
+        'Freq_Instances': rng.integers(1, 6, nb_projets),
+        'Dispersion_Geo': rng.integers(1, 6, nb_projets),
+        'Indice_Charge': rng.integers(5, 60, nb_projets),
+        'Chef_Affecte': rng.choice(list(chefs['ID_Chef']) + ['', ''], nb_projets),
+        'Date_Debut': debut.strftime('%Y-%m-%d'),
+        'Date_Fin_Prev': (debut + pd.to_timedelta(rng.integers(14, 300, nb_projets), unit='D')).strftime('%Y-%m-%d'),
+        'Duree_Semaines': 10
+    })
+    projets['ICM_H_Semaine'] = (projets['Indice_Charge'] * 0.4).round(1)
+    ponderations = pd.DataFrame({
+        'Paramètre': ['Charge_JH', 'Complexite_Tech', 'Budget', 'Niveau_Risque',
+                      'Nb_Intervenants', 'Engagement_Client', 'Freq_Instances', 'Dispersion_Geo'],
+        'Poids_Moyen': [19.75, 18.5, 14.9, 16.8, 11.25, 9.3, 4.65, 4.9]
+    })
+
+    def records(df):
+        # Types natifs, comme get_all_records (nombres numérisés)
+        return [{cle: (valeur.item() if hasattr(valeur, 'item') else valeur) for cle, valeur in ligne.items()}
+                for ligne in df.to_dict('records')]
+
+    return {
+        'Projets': records(projets),
+        'Chefs_Projets': records(chefs),
+        'Clients': records(clients),
+        'Ponderations': records(ponderations),
+        'Planification_Hebdo': []
+    }
+
+
+# ========================================
+# SESSIONS SIMULÉES
+# ========================================
+
+def _script_session():
+    """Script exécuté par AppTest : l'application, tracée par rendu."""
+    import streamlit as st
+    import app_v4
+    import tracage_v4
+
+    with tracage_v4.tracer('bench:rendu') as trace:
+        try:
+            app_v4.main()
+        finally:
+            st.session_state['bench_requetes'] = trace.compteurs.get(tracage_v4.REQUETES_SHEETS, 0)
+
+
+def _afficher_page(at: AppTest, page: str, aleatoire: random.Random) -> None:
+    """Navigue vers la page ; sur Affectation, demande des recommandations."""
+    at.sidebar.radio(key='page_selector').set_value(page).run()
+    if page == 'Affectation' and not at.exception and at.selectbox:
+        selecteur = at.selectbox[0]
+        selecteur.set_value(aleatoire.choice(selecteur.options)).run()
+        [b for b in at.button if b.label.startswith('🔍')][0].click().run()
+
+
+def simuler_session(
+    numero: int,
+    nb_rendus: int,
+    pause_s: float,
+    timeout: float,
+    depart: threading.Barrier
+) -> pd.DataFrame:
+    """
+    Une session : navigation circulaire entre les pages.
+
+    Args:
+        numero: Numéro de la session (page de départ, graine)
+        nb_rendus: Pages affichées
+        pause_s: Temps de lecture moyen entre deux pages (secondes)
+        timeout: Délai max par rendu
+        depart: Barrière de départ commune aux sessions
+
+    Returns:
+        DataFrame (session, page, duree_s, service_s, requetes, erreur),
+        une ligne par rendu
+    """
+    aleatoire = random.Random(numero)
+    at = AppTest.from_function(_script_session, default_timeout=timeout)
+    with _VERROU_APPTEST:
+        at.run()
+    depart.wait()
+
+    mesures = []
+    for i in range(nb_rendus):
+        if pause_s:
+            time.sleep(aleatoire.uniform(0, 2 * pause_s))
+        page = PAGES[(numero + i) % len(PAGES)]
+        erreur = None
+        debut = time.perf_counter()
+        with _VERROU_APPTEST:
+            debut_service = time.perf_counter()
+            try:
+                _afficher_page(at, page, aleatoire)
+                if at.exception:
+                    erreur = at.exception[0].value
+            except Exception as e:
+                erreur = str(e)
+            fin = time.perf_counter()
+        mesures.append({
+            'session': numero,
+            'page': page,
+            'duree_s': fin - debut,
+            'service_s': fin - debut_service,
+            'requetes': at.session_state['bench_requetes'] if 'bench_requetes' in at.session_state else 0,
+            'erreur': erreur
+        })
+    return pd.DataFrame(mesures)
+
+
+def percentiles(durees: pd.Series) -> dict:
+    """p50 / p95 / p99 / max en millisecondes."""
+    valeurs = durees.to_numpy() * 1000
+    return {
+        'p50_ms': round(float(np.percentile(valeurs, 50)), 1),
+        'p95_ms': round(float(np.percentile(valeurs, 95)), 1),
+        'p99_ms': round(float(np.percentile(valeurs, 99)), 1),
+        'max_ms': round(float(valeurs.max()), 1)
+    }
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sessions', type=int, default=10, help='Sessions simultanées')
+    parser.add_argument('--rendus', type=int, default=20, help='Rendus de page par session')
+    parser.add_argument('--pause', type=float, default=0.5,
+                        help='Temps de lecture moyen entre deux pages (secondes)')
+    parser.add_argument('--latence', type=float, default=0.2,
+                        help='Latence injectée par requête API (secondes)')
+    parser.add_argument('--taux-429', type=float, default=0.05,
+                        help="Probabilité qu'une requête API réponde 429")
+    parser.add_argument('--quota', type=float, default=60,
+                        help="Quota de l'ordonnanceur (requêtes/minute)")
+    parser.add_argument('--intervalle', type=float, default=10,
+                        help='Période du rafraîchissement en fond (secondes)')
+    parser.add_argument('--projets', type=int, default=500)
+    parser.add_argument('--chefs', type=int, default=40)
+    parser.add_argument('--timeout', type=float, default=120, help='Délai max par rendu (secondes)')
+    args = parser.parse_args()
+
+    client = FauxClientGspread(
+        donnees_exemple(args.projets, args.chefs), latence_s=args.latence, taux_429=args.taux_429
+    )
+    ordonnanceur = OrdonnanceurRequetes(requetes_par_minute=args.quota)
+    dm = DataManagerV4(backend=SheetsBackend(
+        None, 'faux-sheet', client=client, ordonnanceur=ordonnanceur
+    ))
+
+    # L'application utilise ce DataManager et un rafraîchisseur à la période demandée
+    app_v4.get_data_manager = lambda: dm
+    rafraichisseur = obtenir_rafraichisseur(dm, {
+        'matrice_alertes': app_v4._construire_matrice_alertes,
+        'index_disponibilite': app_v4._construire_index_disponibilite
+    }, args.intervalle, dependances={
+        'matrice_alertes': ('projets', 'chefs'),
+        'index_disponibilite': ('projets', 'chefs')
+    })
+
+    debut = time.perf_counter()
+    rafraichisseur.instantane()
+    print(f"Premier chargement : {time.perf_counter() - debut:.2f}s "
+          f"({args.projets} projets, {args.chefs} chefs, latence {args.latence}s)")
+    client.reinitialiser_journal()
+    metriques_avant = ordonnanceur.metriques()
+
+    depart = threading.Barrier(args.sessions + 1)
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        futures = [
+            pool.submit(simuler_session, numero, args.rendus, args.pause, args.timeout, depart)
+            for numero in range(args.sessions)
+        ]
+        depart.wait()
+        debut = time.perf_counter()
+        mesures = pd.concat([future.result() for future in futures], ignore_index=True)
+        duree = time.perf_counter() - debut
+    rafraichisseur.arreter(timeout=0)
+
+    metriques = ordonnanceur.metriques()
+    erreurs = mesures['erreur'].notna()
+
+    print(f"\n{args.sessions} sessions × {args.rendus} rendus en {duree:.1f}s "
+          f"→ {len(mesures) / duree:.1f} rendus/s")
+    print(f"Latence (file d'attente comprise) : {percentiles(mesures['duree_s'])}")
+    print(f"Temps de service : {percentiles(mesures['service_s'])}")
+    if erreurs.any():
+        print(f"⚠️ {int(erreurs.sum())} rendu(s) en erreur, ex. : {mesures.loc[erreurs, 'erreur'].iloc[0]}")
+
+    print("\nPar page :")
+    for page, groupe in mesures.groupby('page'):
+        print(f"  {page:<12} latence {percentiles(groupe['duree_s'])}")
+        print(f"  {'':<12} service {percentiles(groupe['service_s'])}")
+
+    print("\nPar session :")
+    par_session = mesures.groupby('session').agg(
+        rendus=('duree_s', 'size'),
+        p50_ms=('duree_s', lambda d: round(d.median() * 1000, 1)),
+        p95_ms=('duree_s', lambda d: round(d.quantile(0.95) * 1000, 1)),
+        requetes_api=('requetes', 'sum'),
+        erreurs=('erreur', lambda e: int(e.notna().sum()))
+    )
+    print(par_session.to_string())
+
+    print("\nAPI Sheets pendant le test :")
+    print(f"  Requêtes émises par les rendus : {int(mesures['requetes'].sum())}")
+    print(f"  Requêtes totales (dont rafraîchissement en fond) : {metriques['requetes'] - metriques_avant['requetes']}"
+          f" ({client.nb_appels()} reçues par le faux client)")
+    print(f"  429 injectées : {len([a for a in client.appels() if a.statut == 429])} · Reprises : {metriques['reessais'] - metriques_avant['reessais']}"
+          f" · Échecs : {metriques['echecs'] - metriques_avant['echecs']}")
+    print(f"  Limitées par le quota : {metriques['limitees'] - metriques_avant['limitees']}"
+          f" ({metriques['attente_quota_s'] - metriques_avant['attente_quota_s']:.1f}s d'attente)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+Benchmark - Écritures Google Sheets (lot, diff, ajout) vérifiées
+=================================================================
+
+Exécute les écritures de SheetsBackend contre le faux client gspread
+(faux_gspread_v4) avec une latence par requête, puis vérifie sur le
+journal des appels et sur le contenu des onglets :
+- affecter_projets : 2 lectures + 1 batch_update, quel que soit le lot
+  (comparé à affecter_projet en boucle)
+- mettre_a_jour_cellules : 2 lectures + 1 batch_update
+- ajouter_planification (remplacement) : clear + en-têtes + 1 append_rows
+- appliquer_diff_planification : 1 lecture, au plus 1 batch_update,
+  1 delete_rows par bloc contigu, au plus 1 append_rows ; le Sheet
+  final contient exactement la nouvelle planification
+- reprise : un 503 injecté sur batch_update est rejoué par l'ordonnanceur ;
+  sur append_rows (non idempotent), un 429 est rejoué mais pas un 503
+
+Usage :
+    python benchmarks/bench_ecritures_sheets.py [--latence 0.05] [--lot 30]
+
+Code de sortie : 1 si une vérification échoue.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_lecture_concurrente import donnees_exemple
+from faux_gspread_v4 import FauxClientGspread, formater_cellule
+from ordonnanceur_v4 import OrdonnanceurRequetes
+from planification_v4 import generer_planification, calculer_diff
+from storage_v4 import (
+    SheetsBackend, lignes_planification, FEUILLE_PROJETS, FEUILLE_PLANIFICATION,
+    COLONNES_PLANIFICATION
+)
+
+
+DATE_REFERENCE = datetime(2025, 3, 3)
+NB_SEMAINES = 12
+
+
+# ========================================
+# OUTILS
+# ========================================
+
+class Verifications:
+    """Vérifications cumulées (affichées au fil de l'eau)."""
+
+    def __init__(self):
+        self.echecs = 0
+
+    def verifier(self, condition: bool, message: str) -> None:
+        print(f"  {'✅' if condition else '❌'} {message}")
+        self.echecs += not condition
+
+
+def preparer(latence: float):
+    """Faux client rempli et backend Sheets branché dessus."""
+    client = FauxClientGspread(donnees_exemple(), latence_s=latence)
+    # Quota non limitant, reprises rapides : on mesure les requêtes émises
+    ordonnanceur = OrdonnanceurRequetes(requetes_par_minute=1e6, rafale=1000, delai_base=0.01)
+    backend = SheetsBackend(None, 'faux-sheet', client=client, ordonnanceur=ordonnanceur)
+    backend._worksheet(FEUILLE_PROJETS)
+    backend._worksheet(FEUILLE_PLANIFICATION)
+    client.reinitialiser_journal()
+    return client, backend
+
+
+def lignes_attendues(planning_df: pd.DataFrame) -> list:
+    """Lignes telles qu'affichées dans le Sheet, triées par (Projet_ID, Date)."""
+    lignes = [[formater_cellule(valeur) for valeur in ligne] for ligne in lignes_planification(planning_df)]
+    return sorted(lignes, key=lambda ligne: (ligne[4], ligne[2]))
+
+
+def lignes_sheet(client: FauxClientGspread) -> list:
+    valeurs = client.valeurs(FEUILLE_PLANIFICATION)
+    return sorted(valeurs[1:], key=lambda ligne: (ligne[4], ligne[2])), valeurs[:1]
+
+
+def chronometrer(fonction):
+    debut = time.perf_counter()
+    resultat = fonction()
+    return resultat, time.perf_counter() - debut
+
+
+def projets_typees() -> pd.DataFrame:
+    projets = pd.DataFrame(donnees_exemple()['Projets'])
+    for colonne in ['Date_Debut', 'Date_Fin_Prev']:
+        projets[colonne] = pd.to_datetime(projets[colonne])
+    return projets
+
+
+# ========================================
+# SCÉNARIOS
+# ========================================
+
+def scenario_affectations(latence: float, lot: int, v: Verifications) -> None:
+    print(f"\n▶ affecter_projets ({lot} projets)")
+    affectations = [(f'P{i:04d}', 'CP999') for i in range(0, lot * 5, 5)]
+
+    client, backend = preparer(latence)
+    resultats, duree_lot = chronometrer(lambda: backend.affecter_projets(affectations))
+    v.verifier(all(erreur is None for erreur in resultats.values()), "tous les projets trouvés")
+    v.verifier(client.nb_appels() == 3, f"3 requêtes (obtenu {client.nb_appels()})")
+    v.verifier(client.nb_appels('batch_update') == 1, "un seul batch_update")
+    projets = client.dataframe(FEUILLE_PROJETS).set_index('ID_Projet')
+    ids = [projet_id for projet_id, _ in affectations]
+    v.verifier((projets.loc[ids, 'Chef_Affecte'] == 'CP999').all()
+               and (projets.loc[ids, 'Statut'] == 'Actif').all(), "Chef_Affecte et Statut écrits")
+    v.verifier((projets.drop(index=ids)['Chef_Affecte'] != 'CP999').all(), "aucune autre ligne modifiée")
+
+    client, backend = preparer(latence)
+    _, duree_boucle = chronometrer(lambda: [backend.affecter_projet(p, c) for p, c in affectations])
+    print(f"  Lot : {duree_lot * 1000:.0f} ms · Boucle affecter_projet : {duree_boucle * 1000:.0f} ms "
+          f"({client.nb_appels()} requêtes)")
+
+
+def scenario_cellules(latence: float, lot: int, v: Verifications) -> None:
+    print(f"\n▶ mettre_a_jour_cellules ({lot * 2} cellules)")
+    client, backend = preparer(latence)
+    cellules = [(f'P{i:04d}', colonne, 12.5 + i)
+                for i in range(lot) for colonne in ['Indice_Charge', 'ICM_H_Semaine']]
+    ecrites, duree = chronometrer(lambda: backend.mettre_a_jour_cellules(FEUILLE_PROJETS, cellules))
+    v.verifier(ecrites == len(cellules), f"{len(cellules)} cellules écrites")
+    v.verifier(client.nb_appels() == 3 and client.nb_appels('batch_update') == 1,
+               f"2 lectures + 1 batch_update (obtenu {client.nb_appels()} requêtes)")
+    projets = client.dataframe(FEUILLE_PROJETS).set_index('ID_Projet')
+    v.verifier(projets.loc['P0003', 'ICM_H_Semaine'] == '15.5', "valeurs relues à l'identique")
+    print(f"  Durée : {duree * 1000:.0f} ms")
+
+
+def scenario_planification(latence: float, v: Verifications) -> None:
+    projets_a = projets_typees()
+    plan_a = generer_planification(projets_a, NB_SEMAINES, DATE_REFERENCE)
+
+    print(f"\n▶ ajouter_planification (remplacement, {len(plan_a)} lignes)")
+    client, backend = preparer(latence)
+    _, duree = chronometrer(lambda: backend.ajouter_planification(plan_a, remplacer=True))
+    v.verifier([appel.methode for appel in client.appels()] == ['clear', 'append_row', 'append_rows'],
+               "clear + en-têtes + un seul append_rows")
+    lignes, entetes = lignes_sheet(client)
+    v.verifier(entetes == [COLONNES_PLANIFICATION], "en-têtes réécrits")
+    v.verifier(lignes == lignes_attendues(plan_a), "contenu identique à la planification")
+    print(f"  Durée : {duree * 1000:.0f} ms")
+
+    # Nouvelle planification : réaffectations, fins anticipées, nouveaux projets
+    projets_b = projets_a.copy()
+    projets_b.loc[1:10, 'Chef_Affecte'] = 'CP999'
+    projets_b.loc[20:29, 'Date_Fin_Prev'] = pd.Timestamp('2025-04-01')
+    nouveaux = projets_a.iloc[:5].assign(
+        ID_Projet=[f'N{i:04d}' for i in range(5)], Chef_Affecte='CP001'
+    )
+    projets_b = pd.concat([projets_b, nouveaux], ignore_index=True)
+    plan_b = generer_planification(projets_b, NB_SEMAINES, DATE_REFERENCE)
+    diff = calculer_diff(plan_a, plan_b)
+
+    print(f"\n▶ appliquer_diff_planification {diff.resume()}")
+    client.reinitialiser_journal()
+    _, duree = chronometrer(lambda: backend.appliquer_diff_planification(diff))
+    suppressions = client.nb_appels('delete_rows')
+    v.verifier(client.nb_appels('get_all_values') == 1, "une seule lecture")
+    v.verifier(client.nb_appels('batch_update') == 1, "modifications en un batch_update")
+    v.verifier(client.nb_appels('append_rows') == 1, "insertions en un append_rows")
+    v.verifier(suppressions <= len(diff.supprimees),
+               f"suppressions par blocs contigus ({suppressions} delete_rows pour {len(diff.supprimees)} lignes)")
+    lignes, _ = lignes_sheet(client)
+    v.verifier(lignes == lignes_attendues(plan_b), "Sheet final = nouvelle planification")
+    ecrites = sum(appel.taille for appel in client.appels() if appel.methode in ('batch_update', 'append_rows'))
+    print(f"  Durée : {duree * 1000:.0f} ms ({client.nb_appels()} requêtes, {ecrites} lignes écrites "
+          f"au lieu de {len(plan_b)} pour une réécriture complète)")
+
+
+def scenario_reprise(latence: float, v: Verifications) -> None:
+    print("\n▶ reprise sur 503 (batch_update)")
+    client, backend = preparer(latence)
+    client.injecter_echec('batch_update', statut=503)
+    resultats = backend.affecter_projets([('P0001', 'CP998')])
+    tentatives = client.appels('batch_update')
+    v.verifier([appel.statut for appel in tentatives] == [503, 200], "503 puis succès")
+    v.verifier(resultats == {'P0001': None}
+               and client.dataframe(FEUILLE_PROJETS).set_index('ID_Projet').loc['P0001', 'Chef_Affecte'] == 'CP998',
+               "écriture appliquée une seule fois")
+
+    print("\n▶ écriture non idempotente (append_rows)")
+    plan = generer_planification(projets_typees(), NB_SEMAINES, DATE_REFERENCE)
+    client, backend = preparer(latence)
+    client.injecter_echec('append_rows', statut=429)
+    backend.ajouter_planification(plan, remplacer=True)
+    v.verifier([appel.statut for appel in client.appels('append_rows')] == [429, 200],
+               "429 (refus avant exécution) puis succès")
+    v.verifier(len(client.valeurs(FEUILLE_PLANIFICATION)) == len(plan) + 1, "lignes ajoutées une seule fois")
+
+    client, backend = preparer(latence)
+    client.injecter_echec('append_rows', statut=503)
+    try:
+        backend.ajouter_planification(plan, remplacer=True)
+        leve = False
+    except Exception:
+        leve = True
+    v.verifier(leve and client.nb_appels('append_rows') == 1,
+               "503 non rejoué (l'ajout a pu être appliqué), erreur remontée")
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latence', type=float, default=0.05,
+                        help='Latence injectée par requête (secondes)')
+    parser.add_argument('--lot', type=int, default=30, help="Projets par lot d'affectation")
+    args = parser.parse_args()
+
+    v = Verifications()
+    scenario_affectations(args.latence, args.lot, v)
+    scenario_cellules(args.latence, args.lot, v)
+    scenario_planification(args.latence, v)
+    scenario_reprise(args.latence, v)
+
+    print(f"\n{'✅ Toutes les vérifications passent' if not v.echecs else f'❌ {v.echecs} vérification(s) en échec'}")
+    return 1 if v.echecs else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
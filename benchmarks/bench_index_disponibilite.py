@@ -0,0 +1,159 @@
+"""
+Benchmark - Index de disponibilité (table clairsemée de minima)
+===============================================================
+
+Compare IndexDisponibilite à un calcul direct (min sur les marges) sur
+des matrices de charge aléatoires et vérifie :
+- marge_min sur chaque plage [a, b] de la grille (bornes des niveaux
+  de la table clairsemée : longueurs 1, 2^k et 2^k ± 1 comprises)
+- plages données en dates et plages débordant de la grille (bornées)
+- plages hors grille : +inf et chefs_disponibles sans pré-filtre (None)
+- mettre_a_jour_chef (chef existant et chef inconnu, qui agrandit la
+  table) et ajouter_charge, contre un index reconstruit
+- durée d'une requête indexée vs calcul direct
+
+Usage :
+    python benchmarks/bench_index_disponibilite.py [--chefs 30] [--tirages 5]
+
+Code de sortie : 1 si une vérification échoue.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_ecritures_sheets import Verifications
+from charge_v4 import MatriceCharge, IndexDisponibilite
+from planification_v4 import grille_semaines
+
+
+# Tailles de grille : cas limites des niveaux (1, 2^k, 2^k ± 1) et horizon courant
+NB_SEMAINES_TESTES = [1, 2, 3, 7, 8, 9, 16, 17, 26]
+
+
+# ========================================
+# PRÉPARATION
+# ========================================
+
+def matrice_aleatoire(nb_chefs: int, nb_semaines: int, rng: np.random.Generator) -> MatriceCharge:
+    """Charge aléatoire (avec semaines vides et surcharges)."""
+    chefs = pd.Index([f'CP{i:03d}' for i in range(nb_chefs)], dtype=object)
+    valeurs = rng.uniform(0, 60, (nb_chefs, nb_semaines)) * (rng.random((nb_chefs, nb_semaines)) > 0.2)
+    return MatriceCharge(chefs, grille_semaines(nb_semaines), valeurs)
+
+
+def ecart_toutes_plages(index: IndexDisponibilite, marges: np.ndarray) -> float:
+    """Écart maximal entre marge_min et le minimum direct, sur toutes les plages [a, b]."""
+    ecart = 0.0
+    nb = marges.shape[1]
+    for a in range(nb):
+        for b in range(a, nb):
+            ecart = max(ecart, float(np.abs(index.marge_min(a, b) - marges[:, a:b + 1].min(axis=1)).max(initial=0)))
+    return ecart
+
+
+# ========================================
+# VÉRIFICATIONS
+# ========================================
+
+def verifier_grille(v: Verifications, nb_chefs: int, nb: int, rng: np.random.Generator) -> None:
+    """Invariants de l'index sur une grille de `nb` semaines."""
+    matrice = matrice_aleatoire(nb_chefs, nb, rng)
+    capacites = pd.Series(rng.uniform(30, 45, nb_chefs), index=matrice.chefs)
+    index = IndexDisponibilite(matrice, capacites)
+    marges = capacites.to_numpy()[:, None] - matrice.valeurs
+
+    v.verifier(ecart_toutes_plages(index, marges) < 1e-9,
+               f"{nb} semaine(s) : marge_min = minimum direct sur les {nb * (nb + 1) // 2} plages")
+
+    # Plages en dates : jours au milieu des semaines, comme les dates projets
+    dates = pd.to_datetime(matrice.semaines['Date'])
+    a, b = sorted(rng.integers(0, nb, 2))
+    debut, fin = dates.iloc[a] - pd.Timedelta(days=3), dates.iloc[b] + pd.Timedelta(days=3)
+    v.verifier(np.allclose(index.marge_min(debut, fin), marges[:, a:b + 1].min(axis=1)),
+               f"{nb} semaine(s) : plage en dates = semaines [{a}, {b}]")
+
+    # Plages débordant de la grille : bornées à la grille
+    v.verifier(np.allclose(index.marge_min(-3, b), marges[:, :b + 1].min(axis=1))
+               and np.allclose(index.marge_min(a, nb + 5), marges[:, a:].min(axis=1)),
+               f"{nb} semaine(s) : plages débordant de la grille bornées")
+
+    # Hors grille : +inf, et pas de pré-filtre
+    hors_grille = [(nb, nb + 3), (-5, -1), (dates.iloc[0] - pd.Timedelta(days=60), dates.iloc[0] - pd.Timedelta(days=1))]
+    v.verifier(all(np.isinf(index.marge_min(d, f)).all() and index.chefs_disponibles(0, d, f) is None
+                   for d, f in hors_grille),
+               f"{nb} semaine(s) : plages hors grille -> +inf et chefs_disponibles None")
+
+    # chefs_disponibles : même sélection que le calcul direct
+    heures = float(rng.uniform(0, 20))
+    dispo = index.chefs_disponibles(heures, a, b)
+    attendus = set(matrice.chefs[marges[:, a:b + 1].min(axis=1) >= heures])
+    v.verifier(set(dispo['Chef_ID']) == attendus and dispo['Marge_Min_H'].is_monotonic_decreasing,
+               f"{nb} semaine(s) : chefs_disponibles({heures:.1f} h) = {len(attendus)} chef(s), triés")
+
+    # Mises à jour : chef existant, chef inconnu (table agrandie), ajout de charge
+    charge = rng.uniform(0, 60, nb)
+    index.mettre_a_jour_chef(matrice.chefs[0], charge)
+    index.mettre_a_jour_chef('CP_NOUVEAU', charge)
+    index.ajouter_charge(matrice.chefs[-1], a, b, 12.5)
+    valeurs = matrice.valeurs.copy()
+    valeurs[0] = charge
+    valeurs[-1, a:b + 1] += 12.5
+    reference = IndexDisponibilite(
+        MatriceCharge(matrice.chefs.append(pd.Index(['CP_NOUVEAU'])), matrice.semaines, np.vstack([valeurs, charge])),
+        capacites
+    )
+    v.verifier(list(index.chefs) == list(reference.chefs)
+               and all(n.shape == r.shape for n, r in zip(index.niveaux, reference.niveaux))
+               and ecart_toutes_plages(index, reference.marges) < 1e-9,
+               f"{nb} semaine(s) : mises à jour (chef inconnu compris) = index reconstruit")
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--chefs', type=int, default=30)
+    parser.add_argument('--tirages', type=int, default=5)
+    parser.add_argument('--graine', type=int, default=1)
+    args = parser.parse_args()
+
+    v = Verifications()
+    rng = np.random.default_rng(args.graine)
+    for tirage in range(1, args.tirages + 1):
+        print(f"\n▶ Tirage {tirage}")
+        for nb in NB_SEMAINES_TESTES:
+            verifier_grille(v, args.chefs, nb, rng)
+
+    # Durée d'une requête sur l'horizon courant
+    matrice = matrice_aleatoire(args.chefs, 26, rng)
+    index = IndexDisponibilite(matrice)
+    marges = index.marges
+    plages = [tuple(sorted(rng.integers(0, 26, 2))) for _ in range(2000)]
+    durees = {}
+    for nom, requete in [('indexée', lambda a, b: index.marge_min(a, b)),
+                         ('directe', lambda a, b: marges[:, a:b + 1].min(axis=1))]:
+        debut = time.perf_counter()
+        for a, b in plages:
+            requete(a, b)
+        durees[nom] = (time.perf_counter() - debut) / len(plages) * 1e6
+    print(f"\nDurée marge_min ({args.chefs} chefs, 26 semaines) : indexée {durees['indexée']:.1f} µs · "
+          f"directe {durees['directe']:.1f} µs")
+    print(f"\n{'✅ Toutes les vérifications passent' if not v.echecs else f'❌ {v.echecs} vérification(s) en échec'}")
+    return 1 if v.echecs else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
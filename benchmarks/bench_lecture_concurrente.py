@@ -0,0 +1,114 @@
+"""
+Benchmark - Lectures de feuilles séquentielles vs parallèles
+=============================================================
+
+Mesure le temps de chargement d'une page (projets, chefs, pondérations,
+projets non affectés) avec le faux client gspread (faux_gspread_v4) qui
+injecte une latence fixe par requête, sans compte Google.
+
+Usage :
+    python benchmarks/bench_lecture_concurrente.py [--latence 0.3] [--repetitions 5]
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager_v4 import DataManagerV4
+from faux_gspread_v4 import FauxClientGspread
+from ordonnanceur_v4 import OrdonnanceurRequetes
+from storage_v4 import SheetsBackend
+
+
+# ========================================
+# DONNÉES
+# ========================================
+
+def donnees_exemple(nb_projets=200, nb_chefs=20):
+    """Jeu de données synthétique au format get_all_records."""
+    chefs = [
+        {'ID_Chef': f'CP{i:03d}', 'Nom_Prenom': f'Chef {i}', 'Capacite_Max': 80,
+         'Annees_Experience': 5, 'Competences_Mgmt': '3=Bon',
+         'Competences_Tech': '4=Élevé', 'Utilisation_IA': 2}
+        for i in range(nb_chefs)
+    ]
+    projets = [
+        {'ID_Projet': f'P{i:04d}', 'Nom_Projet': f'Projet {i}', 'ID_Client': 'CL001',
+         'Statut': 'Actif' if i % 3 else 'Planifié', 'Indice_Charge': 40 + i % 30,
+         'ICM_H_Semaine': 16, 'Chef_Affecte': f'CP{i % nb_chefs:03d}' if i % 5 else '',
+         'Date_Debut': '2025-01-06', 'Date_Fin_Prev': '2025-12-29'}
+        for i in range(nb_projets)
+    ]
+    ponderations = [
+        {'Paramètre': 'Charge_JH', 'Poids_Moyen': 19.75},
+        {'Paramètre': 'Complexite_Tech', 'Poids_Moyen': 18.5}
+    ]
+    return {
+        'Projets': projets,
+        'Chefs_Projets': chefs,
+        'Clients': [{'ID_Client': 'CL001', 'Nom_Client': 'Client 1', 'Chef_Favori': ''}],
+        'Ponderations': ponderations,
+        'Planification_Hebdo': []
+    }
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+PAGE_AFFECTATION = ['projets', 'chefs', 'ponderations', 'projets_non_affectes']
+
+
+def mesurer(fonction, repetitions):
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append(time.perf_counter() - debut)
+    return statistics.median(durees)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--latence', type=float, default=0.3,
+                        help='Latence injectée par requête (secondes)')
+    parser.add_argument('--repetitions', type=int, default=5)
+    args = parser.parse_args()
+
+    client = FauxClientGspread(donnees_exemple(), latence_s=args.latence)
+    # Quota non limitant : on mesure la latence, pas le seau à jetons
+    ordonnanceur = OrdonnanceurRequetes(requetes_par_minute=1e6, rafale=1000)
+    dm = DataManagerV4(backend=SheetsBackend(
+        None, 'faux-sheet', client=client, ordonnanceur=ordonnanceur
+    ))
+
+    def sequentiel():
+        for nom in PAGE_AFFECTATION:
+            dm.charger_donnees([nom])
+
+    def parallele():
+        dm.charger_donnees(PAGE_AFFECTATION)
+
+    parallele()  # Préchauffage (cache des onglets, pool de threads)
+
+    t_seq = mesurer(sequentiel, args.repetitions)
+    t_par = mesurer(parallele, args.repetitions)
+
+    print(f"Latence injectée : {args.latence * 1000:.0f} ms / requête")
+    print(f"Lectures par page : {len(PAGE_AFFECTATION)}")
+    print(f"  Séquentiel : {t_seq * 1000:8.1f} ms")
+    print(f"  Parallèle  : {t_par * 1000:8.1f} ms")
+    print(f"  Gain       : x{t_seq / t_par:.2f}")
+    print(f"Requêtes API (journal du faux client) : {client.nb_appels()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark - Mémoire et filtres : types bruts vs schéma compact
+===============================================================
+
+Compare, sur un jeu synthétique, les DataFrames typés comme avant
+(texte en objets Python, nombres en float64) et ceux typés par
+schema_v4 (catégoriels, entiers réduits, float32 sans perte) :
+- mémoire profonde de chaque feuille
+- durée des filtres booléens courants (Statut, Chef_Affecte) et de
+  l'agrégation de charge par chef
+- résultats identiques dans les deux cas
+
+Usage :
+    python benchmarks/bench_memoire_types.py [--projets 20000] [--chefs 200] [--repetitions 20]
+
+Code de sortie : 1 si un résultat diffère.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_charge_sessions import donnees_exemple
+from data_manager_v4 import DataManagerV4
+from schema_v4 import rapport_memoire
+
+
+# ========================================
+# TYPAGES COMPARÉS
+# ========================================
+
+def typer_brut(df: pd.DataFrame, numeriques: list, dates: list) -> pd.DataFrame:
+    """Typage d'origine : numériques en float64, le reste en objets."""
+    df = df.copy()
+    for colonne in numeriques:
+        if colonne in df.columns:
+            df[colonne] = pd.to_numeric(df[colonne], errors='coerce').fillna(0).astype(float)
+    for colonne in dates:
+        if colonne in df.columns:
+            df[colonne] = pd.to_datetime(df[colonne], errors='coerce')
+    # Texte lu du Sheet : objets Python
+    for colonne in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[colonne]) and not pd.api.types.is_datetime64_dtype(df[colonne]):
+            df[colonne] = df[colonne].astype(object)
+    return df
+
+
+def jeux_compares(nb_projets: int, nb_chefs: int):
+    feuilles = donnees_exemple(nb_projets, nb_chefs)
+    projets = pd.DataFrame(feuilles['Projets'])
+    chefs = pd.DataFrame(feuilles['Chefs_Projets'])
+    bruts = {
+        'projets': typer_brut(projets, [c for c in projets.columns if projets[c].dtype.kind in 'if'],
+                              ['Date_Debut', 'Date_Fin_Prev']),
+        'chefs': typer_brut(chefs, [c for c in chefs.columns if chefs[c].dtype.kind in 'if'], [])
+    }
+    compacts = {
+        'projets': DataManagerV4._typer_projets(projets),
+        'chefs': DataManagerV4._typer_chefs(chefs)
+    }
+    return bruts, compacts
+
+
+# ========================================
+# OPÉRATIONS MESURÉES
+# ========================================
+
+def operations(chefs_cibles: list) -> dict:
+    return {
+        "Statut == 'En cours'": lambda p: p['Statut'] == 'En cours',
+        'Chef_Affecte isin (10 chefs)': lambda p: p['Chef_Affecte'].isin(chefs_cibles),
+        'Statut & Chef_Affecte': lambda p: (p['Statut'] == 'Actif') & p['Chef_Affecte'].isin(chefs_cibles),
+        'charge ICM par chef (actifs)': lambda p: p[p['Statut'] == 'Actif']
+            .groupby('Chef_Affecte', observed=True)['Indice_Charge'].sum()
+    }
+
+
+def chronometrer(fonction, df, repetitions: int) -> float:
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction(df)
+        durees.append(time.perf_counter() - debut)
+    return statistics.median(durees)
+
+
+def identiques(a, b) -> bool:
+    if isinstance(a.index, pd.CategoricalIndex) or isinstance(b.index, pd.CategoricalIndex):
+        a = a.set_axis(a.index.astype(object)).sort_index()
+        b = b.set_axis(b.index.astype(object)).sort_index()
+    return (a.to_numpy(dtype=float) == b.to_numpy(dtype=float)).all() and list(a.index) == list(b.index)
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--projets', type=int, default=20000)
+    parser.add_argument('--chefs', type=int, default=200)
+    parser.add_argument('--repetitions', type=int, default=20)
+    args = parser.parse_args()
+
+    bruts, compacts = jeux_compares(args.projets, args.chefs)
+
+    print(f"Jeu : {args.projets} projets, {args.chefs} chefs\n")
+    avant = rapport_memoire(bruts).set_index('jeu')
+    apres = rapport_memoire(compacts).set_index('jeu')
+    print("Mémoire (Ko) :")
+    for jeu in avant.index:
+        print(f"  {jeu:<8} {avant.loc[jeu, 'memoire_ko']:>10.1f} -> {apres.loc[jeu, 'memoire_ko']:>9.1f} "
+              f"(x{avant.loc[jeu, 'memoire_ko'] / apres.loc[jeu, 'memoire_ko']:.1f}, "
+              f"{apres.loc[jeu, 'categorielles']} colonnes catégorielles)")
+
+    echecs = 0
+    chefs_cibles = list(bruts['chefs']['ID_Chef'].iloc[:10])
+    print("\nFiltres (médiane) :")
+    for nom, operation in operations(chefs_cibles).items():
+        duree_avant = chronometrer(operation, bruts['projets'], args.repetitions)
+        duree_apres = chronometrer(operation, compacts['projets'], args.repetitions)
+        egal = identiques(operation(bruts['projets']), operation(compacts['projets']))
+        echecs += not egal
+        print(f"  {'✅' if egal else '❌'} {nom:<30} {duree_avant * 1000:>7.2f} ms -> {duree_apres * 1000:>6.2f} ms "
+              f"(x{duree_avant / duree_apres:.1f})")
+
+    print(f"\n{'✅ Résultats identiques' if not echecs else f'❌ {echecs} résultat(s) différent(s)'}")
+    return 1 if echecs else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
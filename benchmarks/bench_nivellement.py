@@ -0,0 +1,146 @@
+"""
+Benchmark - Lissage de charge (nivellement_v4)
+==============================================
+
+Lance niveler_charge sur des jeux synthétiques tirés au hasard (avec
+et sans affectations proposées pour les projets non affectés) et
+vérifie à chaque tirage :
+- la durée de chaque projet décalé est conservée
+- aucun projet n'est avancé avant la date de référence
+- la matrice `apres` est celle reconstruite depuis appliquer()
+- les heures au-delà du plafond n'augmentent jamais
+- durée du nivellement (médiane, p95)
+
+Le nombre de semaines en surcharge peut augmenter alors que les heures
+de surcharge baissent (surcharge étalée sur plus de semaines) : il est
+affiché, pas vérifié.
+
+Usage :
+    python benchmarks/bench_nivellement.py [--projets 500] [--chefs 40] [--tirages 20]
+
+Code de sortie : 1 si une vérification échoue.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_charge_sessions import donnees_exemple
+from bench_ecritures_sheets import Verifications
+from charge_v4 import MatriceCharge
+from data_manager_v4 import DataManagerV4
+from faux_gspread_v4 import FauxClientGspread
+from nivellement_v4 import niveler_charge
+from ordonnanceur_v4 import OrdonnanceurRequetes
+from planification_v4 import CHEFS_NON_AFFECTES
+from schema_v4 import modifiable
+from storage_v4 import SheetsBackend
+
+
+# ========================================
+# PRÉPARATION
+# ========================================
+
+def charger_projets(nb_projets: int, nb_chefs: int, graine: int) -> pd.DataFrame:
+    """Projets typés par DataManagerV4 (faux Sheet, aucune écriture)."""
+    client = FauxClientGspread(donnees_exemple(nb_projets, nb_chefs, graine))
+    ordonnanceur = OrdonnanceurRequetes(requetes_par_minute=1e6, rafale=1000)
+    dm = DataManagerV4(backend=SheetsBackend(None, 'faux-sheet', client=client, ordonnanceur=ordonnanceur))
+    return dm.get_projets()
+
+
+def affectations_aleatoires(projets: pd.DataFrame, rng: np.random.Generator) -> dict:
+    """Chef tiré au hasard pour chaque projet non affecté."""
+    chef = projets['Chef_Affecte'].astype(object)
+    sans_chef = projets[chef.isna() | chef.isin(CHEFS_NON_AFFECTES)]
+    chefs = pd.unique(chef[~chef.isin(CHEFS_NON_AFFECTES) & chef.notna()])
+    return {projet_id: str(rng.choice(chefs)) for projet_id in sans_chef['ID_Projet'].astype(str)}
+
+
+# ========================================
+# VÉRIFICATIONS
+# ========================================
+
+def verifier_resultat(v: Verifications, projets: pd.DataFrame, affectations: dict,
+                      resultat, reference: datetime, libelle: str) -> None:
+    """Invariants d'un nivellement."""
+    propositions = resultat.propositions
+    durees = (propositions['Nouvelle_Date_Fin'] - propositions['Nouvelle_Date_Debut']) \
+        == (propositions['Date_Fin_Prev'] - propositions['Date_Debut'])
+    v.verifier(bool(durees.all()), f"{libelle} : durées conservées ({len(propositions)} projet(s) décalé(s))")
+
+    avances = propositions[(propositions['Decalage_Semaines'] < 0)
+                           & (propositions['Nouvelle_Date_Debut'] < pd.Timestamp(reference))]
+    v.verifier(len(avances) == 0,
+               f"{libelle} : aucun projet avancé avant la référence ({list(avances['ID_Projet'][:3])})")
+
+    # Chefs proposés reportés sur les projets, comme le fait niveler_charge
+    affectes = modifiable(projets.copy(), 'Chef_Affecte')
+    chef = affectes['Chef_Affecte'].astype(object)
+    propose = affectes['ID_Projet'].map(affectations or {})
+    cibles = (chef.isna() | chef.isin(CHEFS_NON_AFFECTES)) & propose.notna()
+    affectes.loc[cibles, 'Chef_Affecte'] = propose[cibles]
+    reconstruite = MatriceCharge.depuis_projets(
+        resultat.appliquer(affectes), semaines=resultat.apres.semaines, chefs=list(resultat.apres.chefs)
+    )
+    ecart = np.abs(
+        reconstruite.valeurs[reconstruite.chefs.get_indexer(resultat.apres.chefs)] - resultat.apres.valeurs
+    ).max(initial=0)
+    v.verifier(len(reconstruite.chefs) == len(resultat.apres.chefs) and ecart < 1e-6,
+               f"{libelle} : `apres` = matrice reconstruite depuis appliquer() (écart {ecart:.2g} h)")
+
+    resume = resultat.resume()
+    v.verifier(resume['heures_surcharge_apres'] <= resume['heures_surcharge_avant'],
+               f"{libelle} : heures de surcharge {resume['heures_surcharge_avant']} h "
+               f"-> {resume['heures_surcharge_apres']} h · semaines en surcharge "
+               f"{resume['semaines_surcharge_avant']} -> {resume['semaines_surcharge_apres']}")
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--projets', type=int, default=500)
+    parser.add_argument('--chefs', type=int, default=40)
+    parser.add_argument('--tirages', type=int, default=20)
+    parser.add_argument('--semaines', type=int, default=12)
+    args = parser.parse_args()
+
+    v = Verifications()
+    durees = []
+    reference = datetime.today()
+    for graine in range(1, args.tirages + 1):
+        projets = charger_projets(args.projets, args.chefs, graine)
+        rng = np.random.default_rng(graine)
+        marge = int(rng.integers(1, 7))
+        print(f"\n▶ Tirage {graine} (marge {marge} semaine(s))")
+        for libelle, affectations in [('affectés', None), ('avec propositions', affectations_aleatoires(projets, rng))]:
+            debut = time.perf_counter()
+            resultat = niveler_charge(projets, args.semaines, reference, marge_semaines=marge,
+                                      affectations=affectations)
+            durees.append(time.perf_counter() - debut)
+            verifier_resultat(v, projets, affectations, resultat, reference, libelle)
+
+    durees_ms = sorted(d * 1000 for d in durees)
+    print(f"\nDurée niveler_charge : médiane {statistics.median(durees_ms):.1f} ms · "
+          f"p95 {durees_ms[int(len(durees_ms) * 0.95) - 1]:.1f} ms")
+    print(f"\n{'✅ Toutes les vérifications passent' if not v.echecs else f'❌ {v.echecs} vérification(s) en échec'}")
+    return 1 if v.echecs else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Benchmark - Simulation d'affectations du service (POST /simuler)
+================================================================
+
+Simule des affectations tirées au hasard sur un jeu synthétique
+(faux client gspread, rafraîchisseur en mémoire) et vérifie :
+- le chef qui reçoit un projet ne voit jamais baisser son pic de
+  charge hebdomadaire ni sa charge totale
+- un projet non affecté dont les dates couvrent l'horizon s'ajoute
+  semaine par semaine à la charge de son nouveau chef (pic attendu)
+- durée de chaque simulation (médiane, p95)
+
+Usage :
+    python benchmarks/bench_simulation_service.py [--projets 500] [--chefs 40] [--simulations 200]
+
+Code de sortie : 1 si une vérification échoue.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_charge_sessions import donnees_exemple
+from bench_ecritures_sheets import Verifications
+from charge_v4 import MatriceCharge
+from data_manager_v4 import DataManagerV4
+from faux_gspread_v4 import FauxClientGspread
+from ordonnanceur_v4 import OrdonnanceurRequetes
+from planification_v4 import grille_semaines
+from rafraichissement_v4 import RafraichisseurDonnees
+from schema_v4 import modifiable
+from service_v4 import ServiceRecommandation, HORIZON_SEMAINES, _construire_index_disponibilite
+from storage_v4 import SheetsBackend
+
+
+# ========================================
+# PRÉPARATION
+# ========================================
+
+def preparer(nb_projets: int, nb_chefs: int) -> ServiceRecommandation:
+    """Service branché sur un faux Sheet (aucune écriture)."""
+    client = FauxClientGspread(donnees_exemple(nb_projets, nb_chefs))
+    ordonnanceur = OrdonnanceurRequetes(requetes_par_minute=1e6, rafale=1000)
+    dm = DataManagerV4(backend=SheetsBackend(None, 'faux-sheet', client=client, ordonnanceur=ordonnanceur))
+    rafraichisseur = RafraichisseurDonnees(
+        dm, {'index_disponibilite': _construire_index_disponibilite}, intervalle_s=3600
+    )
+    return ServiceRecommandation(dm, rafraichisseur)
+
+
+def projets_dans_horizon(projets: pd.DataFrame) -> pd.Series:
+    """Projets non affectés dont l'intervalle chevauche l'horizon simulé."""
+    dates = grille_semaines(HORIZON_SEMAINES)['Date']
+    debut, fin = dates.iloc[0], dates.iloc[-1]
+    return (projets['Chef_Affecte'].astype(object).fillna('') == '') \
+        & (projets['Date_Debut'] <= fin) & (projets['Date_Fin_Prev'] >= debut) \
+        & (projets['Indice_Charge'] > 0)
+
+
+# ========================================
+# BENCHMARK
+# ========================================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--projets', type=int, default=500)
+    parser.add_argument('--chefs', type=int, default=40)
+    parser.add_argument('--simulations', type=int, default=200)
+    parser.add_argument('--graine', type=int, default=1)
+    args = parser.parse_args()
+
+    service = preparer(args.projets, args.chefs)
+    donnees = service._instantane().donnees
+    projets, chefs = donnees['projets'], donnees['chefs']
+    rng = np.random.default_rng(args.graine)
+
+    v = Verifications()
+    durees, baisses_pic, baisses_charge = [], [], []
+    for _ in range(args.simulations):
+        projet_id = str(rng.choice(projets['ID_Projet'].astype(object)))
+        chef_id = str(rng.choice(chefs['ID_Chef'].astype(object)))
+        debut = time.perf_counter()
+        resultat = service.simuler({'affectations': [{'projet_id': projet_id, 'chef_id': chef_id}]})
+        durees.append(time.perf_counter() - debut)
+        cible = next(chef for chef in resultat['chefs'] if chef['chef_id'] == chef_id)
+        if cible['pic_hebdo_h_apres'] < cible['pic_hebdo_h_avant'] - 1e-9:
+            baisses_pic.append((projet_id, chef_id))
+        if cible['charge_h_apres'] < cible['charge_h_avant'] - 1e-9:
+            baisses_charge.append((projet_id, chef_id))
+
+    print(f"\n▶ {args.simulations} simulations aléatoires")
+    v.verifier(not baisses_pic, f"pic hebdomadaire du chef cible jamais en baisse ({baisses_pic[:3]})")
+    v.verifier(not baisses_charge, f"charge totale du chef cible jamais en baisse ({baisses_charge[:3]})")
+
+    print("\n▶ projet non affecté dans l'horizon")
+    candidats = projets[projets_dans_horizon(projets)]
+    v.verifier(len(candidats) > 0, f"{len(candidats)} projet(s) candidat(s)")
+    if len(candidats):
+        projet_id = str(candidats['ID_Projet'].iloc[0])
+        chef_id = str(chefs['ID_Chef'].iloc[0])
+        avant = MatriceCharge.depuis_projets(projets, HORIZON_SEMAINES, chefs=[chef_id])
+        seul = modifiable(candidats.iloc[:1].copy(), 'Chef_Affecte', 'Statut') \
+            .assign(Chef_Affecte=chef_id, Statut='Planifié')
+        projet_seul = MatriceCharge.depuis_projets(
+            seul, HORIZON_SEMAINES, chefs=[chef_id], semaines=avant.semaines
+        )
+        attendu = float((avant.charge(chef_id) + projet_seul.charge(chef_id)).max(initial=0))
+        resultat = service.simuler({'affectations': [{'projet_id': projet_id, 'chef_id': chef_id}]})
+        cible = resultat['chefs'][0]
+        v.verifier(abs(cible['pic_hebdo_h_apres'] - attendu) < 1e-6,
+                   f"{projet_id} -> {chef_id} : pic {cible['pic_hebdo_h_avant']:.1f} h "
+                   f"-> {cible['pic_hebdo_h_apres']:.1f} h (attendu {attendu:.1f} h)")
+        v.verifier(cible['charge_h_apres'] > cible['charge_h_avant'],
+                   f"charge {cible['charge_h_avant']:.1f} h -> {cible['charge_h_apres']:.1f} h")
+
+    durees_ms = sorted(d * 1000 for d in durees)
+    print(f"\nDurée /simuler : médiane {statistics.median(durees_ms):.1f} ms · "
+          f"p95 {durees_ms[int(len(durees_ms) * 0.95) - 1]:.1f} ms")
+    print(f"\n{'✅ Toutes les vérifications passent' if not v.echecs else f'❌ {v.echecs} vérification(s) en échec'}")
+    return 1 if v.echecs else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,401 @@
+"""
+Charge V4 - Matrice de charge chefs × semaines
+===============================================
+
+Représentation dense de la charge hebdomadaire (Charge_H) de chaque
+chef sur un horizon de semaines, construite :
+- depuis la planification (Planification_Hebdo)
+- ou directement depuis les intervalles projets (tableau de différences)
+
+et balayage vectorisé des surcharges selon les paliers d'alerte
+CRITIQUE / ATTENTION / INFO de valider_affectation.
+
+IndexDisponibilite répond à "quels chefs peuvent absorber X h/semaine
+pendant les semaines A–B" sans parcourir les semaines.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from algorithme_v4 import NIVEAUX_ALERTE, HEURES_SEMAINE_PLAFOND
+from planification_v4 import grille_semaines, projets_planifiables
+from tracage_v4 import instrumenter, ALGORITHME
+
+
+# ========================================
+# MATRICE DE CHARGE
+# ========================================
+
+@instrumenter(ALGORITHME)
+class MatriceCharge:
+    """
+    Charge en heures/semaine : une ligne par chef, une colonne par semaine.
+
+    Attributs:
+        chefs: pd.Index des ID_Chef (ordre des lignes)
+        semaines: grille (Date, Semaine, Annee) des colonnes
+        valeurs: np.ndarray float64 de forme (nb_chefs, nb_semaines)
+    """
+
+    def __init__(self, chefs: pd.Index, semaines: pd.DataFrame, valeurs: np.ndarray):
+        self.chefs = pd.Index(chefs)
+        self.semaines = semaines.reset_index(drop=True)
+        self.valeurs = valeurs
+
+    # ----------------------------------------
+    # Construction
+    # ----------------------------------------
+
+    @staticmethod
+    def _index_chefs(ids_observes, chefs: Optional[List[str]]) -> pd.Index:
+        """Chefs fournis (tous, même sans charge) complétés des chefs observés."""
+        base = pd.Index(chefs if chefs is not None else [], dtype=object)
+        observes = pd.Index(pd.unique(np.asarray(ids_observes, dtype=object)))
+        return base.append(observes.difference(base, sort=False)) if len(observes) else base
+
+    @classmethod
+    def depuis_planification(
+        cls,
+        planning_df: pd.DataFrame,
+        chefs: Optional[List[str]] = None,
+        semaines: Optional[pd.DataFrame] = None
+    ) -> 'MatriceCharge':
+        """
+        Agrège une planification (une ligne par projet et par semaine).
+
+        Args:
+            planning_df: DataFrame planification (Date, Chef_ID, Charge_H)
+            chefs: Chefs à inclure même sans charge (ordre des lignes)
+            semaines: Grille des colonnes (défaut : dates présentes)
+
+        Returns:
+            MatriceCharge
+        """
+        if len(planning_df) == 0:
+            grille = semaines if semaines is not None else grille_semaines(0)
+            index = cls._index_chefs([], chefs)
+            return cls(index, grille, np.zeros((len(index), len(grille))))
+
+        dates = pd.to_datetime(planning_df['Date'])
+        if semaines is None:
+            uniques = pd.DatetimeIndex(dates.drop_duplicates().sort_values())
+            semaines = pd.DataFrame({
+                'Date': uniques,
+                'Semaine': uniques.isocalendar().week.to_numpy(dtype='int64'),
+                'Annee': uniques.year.to_numpy(dtype='int64')
+            })
+
+        index = cls._index_chefs(planning_df['Chef_ID'].to_numpy(), chefs)
+        i_chef = index.get_indexer(planning_df['Chef_ID'])
+        i_semaine = pd.DatetimeIndex(semaines['Date']).get_indexer(dates)
+        garde = i_semaine >= 0
+
+        valeurs = np.zeros((len(index), len(semaines)))
+        np.add.at(
+            valeurs,
+            (i_chef[garde], i_semaine[garde]),
+            pd.to_numeric(planning_df['Charge_H'], errors='coerce').fillna(0).to_numpy(dtype=float)[garde]
+        )
+        return cls(index, semaines, valeurs)
+
+    @classmethod
+    def depuis_projets(
+        cls,
+        projets_df: pd.DataFrame,
+        nb_semaines: int = 12,
+        date_reference: Optional[datetime] = None,
+        chefs: Optional[List[str]] = None,
+        semaines: Optional[pd.DataFrame] = None
+    ) -> 'MatriceCharge':
+        """
+        Construit la matrice directement depuis les intervalles projets.
+
+        Chaque projet ajoute ICM_H_Semaine sur [première, dernière] semaine
+        active via un tableau de différences puis une somme cumulée :
+        O(projets + chefs × semaines), sans expansion ligne par ligne.
+
+        Args:
+            projets_df: DataFrame projets (mêmes règles que la planification)
+            nb_semaines: Horizon en semaines (si `semaines` absent)
+            date_reference: Date de la semaine 0 (défaut : maintenant)
+            chefs: Chefs à inclure même sans charge
+            semaines: Grille explicite (prioritaire sur nb_semaines)
+
+        Returns:
+            MatriceCharge
+        """
+        if semaines is None:
+            semaines = grille_semaines(nb_semaines, date_reference)
+        projets = projets_planifiables(projets_df)
+        index = cls._index_chefs(
+            projets['Chef_Affecte'].to_numpy() if len(projets) else [], chefs
+        )
+        nb = len(semaines)
+        valeurs = np.zeros((len(index), nb + 1))
+
+        if len(projets) and nb:
+            dates = semaines['Date'].to_numpy(dtype='datetime64[ns]')
+            premiere, derniere = intervalles_semaines(projets, dates)
+            garde = premiere <= derniere
+            i_chef = index.get_indexer(projets['Chef_Affecte'])[garde]
+            heures = charge_h_projets(projets)[garde]
+            np.add.at(valeurs, (i_chef, premiere[garde]), heures)
+            np.add.at(valeurs, (i_chef, derniere[garde] + 1), -heures)
+
+        return cls(index, semaines, np.cumsum(valeurs, axis=1)[:, :nb])
+
+    # ----------------------------------------
+    # Accès
+    # ----------------------------------------
+
+    def charge(self, chef_id: str) -> np.ndarray:
+        """Charge hebdomadaire d'un chef (zéros si inconnu)."""
+        position = self.chefs.get_indexer([chef_id])[0]
+        if position < 0:
+            return np.zeros(len(self.semaines))
+        return self.valeurs[position]
+
+    def vers_dataframe(self) -> pd.DataFrame:
+        """Matrice sous forme de DataFrame (index chefs, colonnes dates)."""
+        return pd.DataFrame(
+            self.valeurs,
+            index=self.chefs,
+            columns=pd.DatetimeIndex(self.semaines['Date'])
+        )
+
+    # ----------------------------------------
+    # Surcharges
+    # ----------------------------------------
+
+    def scanner_surcharges(self, seuil_min: Optional[float] = None) -> pd.DataFrame:
+        """
+        Liste toutes les cellules (chef, semaine) au-dessus d'un palier d'alerte.
+
+        Paliers (niveau le plus grave retenu) : CRITIQUE > 40h,
+        ATTENTION > 36h, INFO > 30h. Un seul passage vectorisé.
+
+        Args:
+            seuil_min: Ne garder que les charges > seuil_min
+                (défaut : plus petit palier, 30h)
+
+        Returns:
+            DataFrame Chef_ID, Date, Semaine, Annee, Charge_H, Niveau,
+            Depassement_H (au-delà du plafond de 40h), dans l'ordre chefs puis semaines
+        """
+        if seuil_min is None:
+            seuil_min = min(seuil for _, seuil in NIVEAUX_ALERTE)
+
+        i_chef, i_semaine = np.nonzero(self.valeurs > seuil_min)
+        charges = self.valeurs[i_chef, i_semaine]
+        niveaux = np.select(
+            [charges > seuil for _, seuil in NIVEAUX_ALERTE],
+            [niveau for niveau, _ in NIVEAUX_ALERTE],
+            default=''
+        )
+        return pd.DataFrame({
+            'Chef_ID': self.chefs.to_numpy()[i_chef],
+            'Date': self.semaines['Date'].to_numpy()[i_semaine],
+            'Semaine': self.semaines['Semaine'].to_numpy()[i_semaine],
+            'Annee': self.semaines['Annee'].to_numpy()[i_semaine],
+            'Charge_H': np.round(charges, 1),
+            'Niveau': niveaux,
+            'Depassement_H': np.round(np.maximum(charges - HEURES_SEMAINE_PLAFOND, 0), 1)
+        })
+
+    def synthese_surcharges(self) -> pd.DataFrame:
+        """
+        Nombre de semaines par palier et pic de charge, par chef alerté.
+
+        Returns:
+            DataFrame indexé par Chef_ID : CRITIQUE, ATTENTION, INFO, Pic_H
+        """
+        alertes = self.scanner_surcharges()
+        niveaux = [niveau for niveau, _ in NIVEAUX_ALERTE]
+        if len(alertes) == 0:
+            return pd.DataFrame(columns=niveaux + ['Pic_H'])
+        comptes = pd.crosstab(alertes['Chef_ID'], alertes['Niveau']).reindex(columns=niveaux, fill_value=0)
+        comptes['Pic_H'] = alertes.groupby('Chef_ID')['Charge_H'].max()
+        return comptes.sort_values(niveaux, ascending=False)
+
+
+# ========================================
+# INDEX DE DISPONIBILITÉ
+# ========================================
+
+@instrumenter(ALGORITHME)
+class IndexDisponibilite:
+    """
+    Capacité résiduelle (capacité − charge) par chef et par semaine,
+    indexée par une table clairsemée de minima (sparse table).
+
+    niveaux[k][c, s] = min des marges du chef c sur les semaines
+    [s, s + 2^k[ ; le minimum sur [a, b] s'obtient en O(1) par chef à
+    partir de deux fenêtres de niveau k = ⌊log2(b − a + 1)⌋, pour tous
+    les chefs en une seule opération vectorisée.
+    """
+
+    def __init__(self, matrice: MatriceCharge, capacites: Optional[pd.Series] = None):
+        """
+        Args:
+            matrice: Charge hebdomadaire chefs × semaines
+            capacites: Capacité h/semaine par ID_Chef (défaut : plafond 40h)
+        """
+        self.chefs = matrice.chefs
+        self.semaines = matrice.semaines
+        capacite = np.full(len(self.chefs), float(HEURES_SEMAINE_PLAFOND))
+        if capacites is not None:
+            capacite = pd.Series(capacites).reindex(self.chefs).fillna(HEURES_SEMAINE_PLAFOND) \
+                .to_numpy(dtype=float)
+        self.capacites = capacite
+        self.marges = capacite[:, None] - matrice.valeurs
+        self.niveaux = self._construire(self.marges)
+
+    @staticmethod
+    def _construire(marges: np.ndarray) -> List[np.ndarray]:
+        """Niveaux de la table clairsemée (O(chefs × semaines × log semaines))."""
+        niveaux = [marges.copy()]
+        longueur = 1
+        while 2 * longueur <= marges.shape[-1]:
+            precedent = niveaux[-1]
+            niveaux.append(np.minimum(precedent[..., :-longueur], precedent[..., longueur:]))
+            longueur *= 2
+        return niveaux
+
+    def _indice_semaine(self, semaine, fin: bool) -> int:
+        """Indice de grille d'une semaine (entier) ou d'une date."""
+        if isinstance(semaine, (int, np.integer)):
+            return int(semaine)
+        dates = self.semaines['Date'].to_numpy(dtype='datetime64[ns]')
+        valeur = np.datetime64(pd.Timestamp(semaine), 'ns')
+        if fin:
+            return int(np.searchsorted(dates, valeur, side='right')) - 1
+        return int(np.searchsorted(dates, valeur, side='left'))
+
+    def _plage(self, debut, fin) -> Tuple[int, int]:
+        """Indices [a, b] de la plage bornée à la grille (a > b si vide)."""
+        a = max(self._indice_semaine(debut, fin=False), 0)
+        b = min(self._indice_semaine(fin, fin=True), len(self.semaines) - 1)
+        return a, b
+
+    def marge_min(self, debut, fin) -> np.ndarray:
+        """
+        Marge minimale de chaque chef sur les semaines [debut, fin].
+
+        Args:
+            debut: Première semaine (indice de grille ou date)
+            fin: Dernière semaine incluse (indice de grille ou date)
+
+        Returns:
+            Tableau (nb_chefs,) en heures/semaine ; +inf si la plage est
+            vide ou hors grille (ex. projet terminé avant la première
+            semaine) : aucune contrainte connue, pas une marge illimitée
+        """
+        a, b = self._plage(debut, fin)
+        if a > b:
+            return np.full(len(self.chefs), np.inf)
+        k = (b - a + 1).bit_length() - 1
+        niveau = self.niveaux[k]
+        return np.minimum(niveau[:, a], niveau[:, b - (1 << k) + 1])
+
+    def chefs_disponibles(self, heures: float, debut, fin) -> Optional[pd.DataFrame]:
+        """
+        Chefs pouvant absorber `heures` h/semaine sur toute la plage.
+
+        Args:
+            heures: Charge supplémentaire (h/semaine)
+            debut: Première semaine (indice de grille ou date)
+            fin: Dernière semaine incluse (indice de grille ou date)
+
+        Returns:
+            DataFrame Chef_ID, Marge_Min_H trié par marge décroissante ;
+            None si la plage n'intersecte pas la grille (pas de pré-filtre
+            possible : tous les chefs paraîtraient disponibles)
+        """
+        a, b = self._plage(debut, fin)
+        if a > b:
+            return None
+        marges = self.marge_min(a, b)
+        garde = marges >= heures
+        return pd.DataFrame({
+            'Chef_ID': self.chefs.to_numpy()[garde],
+            'Marge_Min_H': marges[garde]
+        }).sort_values('Marge_Min_H', ascending=False, kind='stable').reset_index(drop=True)
+
+    def mettre_a_jour_chef(self, chef_id: str, charge: np.ndarray) -> None:
+        """
+        Remplace la charge hebdomadaire d'un chef et reconstruit sa ligne.
+
+        Args:
+            chef_id: ID du chef (ajouté s'il est inconnu)
+            charge: Charge h/semaine sur toute la grille
+        """
+        position = self.chefs.get_indexer([chef_id])[0]
+        if position < 0:
+            self.chefs = self.chefs.append(pd.Index([chef_id]))
+            self.capacites = np.append(self.capacites, float(HEURES_SEMAINE_PLAFOND))
+            self.marges = np.vstack([self.marges, np.zeros(len(self.semaines))])
+            self.niveaux = [np.vstack([n, np.zeros(n.shape[1])]) for n in self.niveaux]
+            position = len(self.chefs) - 1
+
+        self.marges[position] = self.capacites[position] - np.asarray(charge, dtype=float)
+        for niveau, ligne in zip(self.niveaux, self._construire(self.marges[position])):
+            niveau[position] = ligne
+
+    def ajouter_charge(self, chef_id: str, debut, fin, heures: float) -> None:
+        """
+        Ajoute `heures` h/semaine à un chef sur [debut, fin] (ex. après affectation).
+
+        Args:
+            chef_id: ID du chef
+            debut: Première semaine (indice de grille ou date)
+            fin: Dernière semaine incluse (indice de grille ou date)
+            heures: Charge ajoutée (négative pour retirer)
+        """
+        position = self.chefs.get_indexer([chef_id])[0]
+        charge = np.zeros(len(self.semaines)) if position < 0 \
+            else self.capacites[position] - self.marges[position]
+        a, b = self._plage(debut, fin)
+        if a <= b:
+            charge = charge.copy()
+            charge[a:b + 1] += heures
+        self.mettre_a_jour_chef(chef_id, charge)
+
+
+# ========================================
+# HELPERS INTERVALLES
+# ========================================
+
+def intervalles_semaines(
+    projets: pd.DataFrame,
+    dates: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Première et dernière semaine de la grille où chaque projet est actif.
+
+    Args:
+        projets: Projets planifiables (Date_Debut, Date_Fin_Prev valides)
+        dates: Dates de la grille (datetime64, croissantes)
+
+    Returns:
+        (premiere, derniere) indices de semaine ; premiere > derniere si
+        le projet n'intersecte pas l'horizon
+    """
+    debut = pd.to_datetime(projets['Date_Debut']).to_numpy(dtype='datetime64[ns]')
+    fin = pd.to_datetime(projets['Date_Fin_Prev']).to_numpy(dtype='datetime64[ns]')
+    premiere = np.searchsorted(dates, debut, side='left')
+    derniere = np.searchsorted(dates, fin, side='right') - 1
+    return premiere, derniere
+
+
+def charge_h_projets(projets: pd.DataFrame) -> np.ndarray:
+    """Charge hebdomadaire de chaque projet (ICM_H_Semaine, 0 si absente)."""
+    if 'ICM_H_Semaine' not in projets.columns:
+        return np.zeros(len(projets))
+    return pd.to_numeric(projets['ICM_H_Semaine'], errors='coerce').fillna(0).to_numpy(dtype=float)
@@ -0,0 +1,259 @@
+"""
+CLI V4 - Recalcul nocturne des indices (sans Streamlit)
+========================================================
+
+Recalcule en lot l'ICM des projets et l'ICC des chefs avec les
+pondérations courantes, régénère la planification hebdomadaire, puis
+n'écrit que les cellules qui ont changé (une écriture groupée par feuille).
+
+Usage :
+    python cli_v4.py recalculer --sqlite pmo.db
+    python cli_v4.py recalculer --credentials credentials.json --simulation
+
+Exemple cron (tous les jours à 2h) :
+    0 2 * * * cd /opt/pmo && python cli_v4.py recalculer >> recalcul.log 2>&1
+
+Codes de sortie : 0 succès, 1 erreur de stockage ou d'écriture.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import argparse
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from algorithme_v4 import AlgorithmeAffectationV4, RATIO_CONVERSION
+from data_manager_v4 import DataManagerV4, init_data_manager
+from storage_v4 import ErreurStockage, FEUILLE_PROJETS, FEUILLE_CHEFS, COLONNES_ID
+
+
+# Horizon de la planification régénérée (semaines)
+NB_SEMAINES_DEFAUT = 12
+
+# Écart en dessous duquel une cellule est considérée inchangée
+TOLERANCE = 1e-6
+
+
+# ========================================
+# RECALCUL
+# ========================================
+
+def cellules_modifiees(
+    df: pd.DataFrame,
+    colonne_id: str,
+    nouvelles: Dict[str, pd.Series]
+) -> List[Tuple[str, str, float]]:
+    """
+    Cellules dont la valeur recalculée diffère de la valeur stockée.
+
+    Args:
+        df: Lignes telles que lues (typées)
+        colonne_id: Colonne identifiant
+        nouvelles: {colonne: valeurs recalculées alignées sur df}
+            (NaN = non calculable, cellule laissée telle quelle)
+
+    Returns:
+        Liste de (identifiant, colonne, nouvelle valeur)
+    """
+    cellules = []
+    for colonne, valeurs in nouvelles.items():
+        apres = valeurs.to_numpy(dtype=float)
+        avant = pd.to_numeric(df[colonne], errors='coerce').to_numpy(dtype=float) \
+            if colonne in df.columns else np.full(len(df), np.nan)
+        change = ~np.isnan(apres) & (np.isnan(avant) | (np.abs(apres - avant) > TOLERANCE))
+        cellules += [
+            (identifiant, colonne, float(valeur))
+            for identifiant, valeur in zip(df[colonne_id].to_numpy()[change], apres[change])
+        ]
+    return cellules
+
+
+def verifier_donnees(donnees: Dict) -> None:
+    """
+    Vérifie que les feuilles nécessaires au recalcul ont été lues.
+
+    DataManagerV4 renvoie un DataFrame vide quand une lecture échoue :
+    sans ce contrôle, le recalcul échouerait plus loin (KeyError) ou
+    s'appliquerait à une feuille incomplète.
+
+    Args:
+        donnees: Dict avec projets, chefs, ponderations
+
+    Raises:
+        ErreurStockage: feuille vide ou sans colonne identifiant
+    """
+    problemes = [
+        f"{feuille} vide ou sans colonne {COLONNES_ID[feuille]}"
+        for feuille, nom in [(FEUILLE_PROJETS, 'projets'), (FEUILLE_CHEFS, 'chefs')]
+        if len(donnees[nom]) == 0 or COLONNES_ID[feuille] not in donnees[nom].columns
+    ]
+    if not donnees['ponderations'] or not donnees['ponderations'].get('charge'):
+        problemes.append("pondérations absentes")
+    if problemes:
+        raise ErreurStockage(f"Lecture incomplète : {', '.join(problemes)}")
+
+
+def recalculer_indices(dm: DataManagerV4, ecrire: bool = True) -> Dict:
+    """
+    Recalcule ICM / ICC et réécrit les seules cellules modifiées.
+
+    Args:
+        dm: Gestionnaire de données
+        ecrire: False pour une simulation (aucune écriture)
+
+    Returns:
+        Dict avec projets (DataFrame recalculé), cellules par feuille,
+        non_calculables par feuille et ok (False si une écriture a échoué)
+
+    Raises:
+        ErreurStockage: feuilles illisibles (voir verifier_donnees)
+    """
+    donnees = dm.charger_donnees(['projets', 'chefs', 'ponderations'])
+    verifier_donnees(donnees)
+    projets = donnees['projets']
+    chefs = donnees['chefs']
+    algo = AlgorithmeAffectationV4(donnees['ponderations'])
+
+    icm = algo.calculer_icm_lot(projets)
+    icc = algo.calculer_icc_lot(chefs)
+    recalculs = {
+        FEUILLE_PROJETS: (projets, icm, {
+            'Indice_Charge': icm,
+            'ICM_H_Semaine': (icm * RATIO_CONVERSION).round(2)
+        }),
+        FEUILLE_CHEFS: (chefs, icc, {
+            'Capacite_Max': icc,
+            'ICC_H_Semaine': (icc * RATIO_CONVERSION).round(2)
+        })
+    }
+
+    resultat = {'cellules': {}, 'non_calculables': {}, 'ok': True}
+    for feuille, (df, indice, valeurs) in recalculs.items():
+        cellules = cellules_modifiees(df, COLONNES_ID[feuille], valeurs)
+        resultat['cellules'][feuille] = cellules
+        resultat['non_calculables'][feuille] = int(indice.isna().sum())
+        if ecrire and dm.mettre_a_jour_cellules(feuille, cellules) is None:
+            resultat['ok'] = False
+
+    # Projets à jour pour la planification (ICM non calculable conservé)
+    projets_recalcules = projets.copy()
+    for colonne, valeurs in recalculs[FEUILLE_PROJETS][2].items():
+        projets_recalcules[colonne] = valeurs.fillna(projets.get(colonne, np.nan))
+    resultat['projets'] = projets_recalcules
+    return resultat
+
+
+# ========================================
+# LIGNE DE COMMANDE
+# ========================================
+
+def _creer_data_manager(args: argparse.Namespace) -> DataManagerV4:
+    """DataManager selon les options (SQLite local ou Google Sheets)."""
+    if args.sqlite:
+        return init_data_manager(sqlite_path=args.sqlite)
+    return init_data_manager(
+        credentials_file=args.credentials,
+        sheet_id=args.sheet_id,
+        miroir_path=args.miroir
+    )
+
+
+def commande_recalculer(args: argparse.Namespace) -> int:
+    """Sous-commande `recalculer` ; renvoie le code de sortie."""
+    try:
+        dm = _creer_data_manager(args)
+    except ErreurStockage as e:
+        print(f"❌ Stockage inaccessible : {e}")
+        return 1
+
+    ecrire = not args.simulation
+    try:
+        resultat = recalculer_indices(dm, ecrire=ecrire)
+    except Exception as e:
+        print(f"❌ Recalcul impossible, aucune cellule écrite : {str(e)}")
+        return 1
+    for feuille, cellules in resultat['cellules'].items():
+        print(f"{'✅' if ecrire else '🔎'} {feuille} : {len(cellules)} cellule(s) modifiée(s)"
+              f"{'' if ecrire else ' (simulation)'}")
+        if resultat['non_calculables'][feuille]:
+            print(f"⚠️ {feuille} : {resultat['non_calculables'][feuille]} ligne(s) "
+                  f"non calculable(s) (paramètre manquant ou illisible), laissée(s) telle(s) quelle(s)")
+
+    if not args.sans_planification:
+        diff = dm.recalculer_planification_hebdo(
+            args.semaines, projets_df=resultat['projets'], sauvegarder=ecrire
+        )
+        if diff is None:
+            resultat['ok'] = False
+        else:
+            print(f"{'✅' if ecrire else '🔎'} Planification : {diff.resume()}"
+                  f"{'' if ecrire else ' (simulation)'}")
+
+    return 0 if resultat['ok'] else 1
+
+
+def _ajouter_options_stockage(parser: argparse.ArgumentParser, defauts: bool = True) -> None:
+    """
+    Options de choix du stockage.
+
+    Args:
+        parser: Parser recevant le groupe d'options
+        defauts: Renseigner les valeurs par défaut ; False pour les
+            sous-commandes, qui ne doivent pas écraser une option donnée
+            avant le nom de la commande
+    """
+    def defaut(valeur):
+        return valeur if defauts else argparse.SUPPRESS
+
+    stockage = parser.add_argument_group('stockage')
+    stockage.add_argument('--sqlite', default=defaut(os.environ.get('PMO_SQLITE_DB')),
+                          help="Base SQLite locale (défaut : $PMO_SQLITE_DB)")
+    stockage.add_argument('--credentials', default=defaut(os.environ.get('PMO_CREDENTIALS')),
+                          help="Fichier credentials.json du compte de service (défaut : $PMO_CREDENTIALS)")
+    stockage.add_argument('--sheet-id', default=defaut(os.environ.get('PMO_SHEET_ID')),
+                          help="ID du Google Sheet (défaut : $PMO_SHEET_ID)")
+    stockage.add_argument('--miroir', default=defaut(None),
+                          help="Miroir SQLite local du Google Sheet (optionnel)")
+
+
+def construire_parser() -> argparse.ArgumentParser:
+    """Parser des arguments de la ligne de commande."""
+    parser = argparse.ArgumentParser(
+        prog='cli_v4.py',
+        description="PMO Orchestre V4 - traitements sans interface"
+    )
+    # Options de stockage acceptées avant ou après la sous-commande
+    _ajouter_options_stockage(parser)
+    stockage = argparse.ArgumentParser(add_help=False)
+    _ajouter_options_stockage(stockage, defauts=False)
+
+    commandes = parser.add_subparsers(dest='commande', required=True)
+    recalculer = commandes.add_parser(
+        'recalculer',
+        parents=[stockage],
+        help="Recalcule ICM/ICC, régénère la planification, écrit les cellules modifiées"
+    )
+    recalculer.add_argument('--semaines', type=int, default=NB_SEMAINES_DEFAUT,
+                            help=f"Horizon de la planification (défaut : {NB_SEMAINES_DEFAUT})")
+    recalculer.add_argument('--sans-planification', action='store_true',
+                            help="Ne pas régénérer Planification_Hebdo")
+    recalculer.add_argument('--simulation', action='store_true',
+                            help="Afficher les changements sans rien écrire")
+    recalculer.set_defaults(executer=commande_recalculer)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Point d'entrée de la ligne de commande."""
+    args = construire_parser().parse_args(argv)
+    return args.executer(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
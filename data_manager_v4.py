@@ -4,63 +4,290 @@ Data Manager V4 - Gestion des données Google Sheets
 
 VERSION 4 : Support structure V4 (5 plages, Engagement_Client unique)
 
+Stockage interchangeable : Google Sheets ou SQLite local (storage_v4).
+
 Auteur : PFE - ENCG Settat
 Projet : PMO Orchestre
 Date : Novembre 2025
 """
 
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import pandas as pd
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
-import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, List, Dict, Optional, Tuple
+
+from storage_v4 import (
+    StorageBackend, SQLiteBackend,
+    obtenir_backend_sheets,
+    FEUILLE_PROJETS, FEUILLE_CHEFS, FEUILLE_CLIENTS,
+    FEUILLE_PONDERATIONS, FEUILLE_PLANIFICATION, FEUILLES
+)
+from miroir_v4 import obtenir_miroir
+from planification_v4 import (
+    generer_planification, iterer_planification, TAILLE_BLOC_DEFAUT,
+    PlanificateurIncremental, DiffPlanification, calculer_diff
+)
+from sorties_v4 import SortiePlanification, SortieStockage, ecrire_blocs
+from snapshot_v4 import SnapshotCharge
+from noms_v4 import ResolveurNoms
+from schema_v4 import (
+    parser_tableau, RapportValidation, SCHEMAS, SCHEMA_PROJETS, SCHEMA_CHEFS, SCHEMA_CLIENTS
+)
+from tracage_v4 import instrumenter, propager, DONNEES
+
+
+# Lectures de feuilles exécutées en parallèle (pool partagé par le processus)
+MAX_LECTURES_PARALLELES = 4
+
+_POOL_LECTURES: Optional[ThreadPoolExecutor] = None
+_VERROU_POOL = threading.Lock()
+
+
+def _pool_lectures() -> ThreadPoolExecutor:
+    """Pool de threads borné partagé par toutes les sessions du processus."""
+    global _POOL_LECTURES
+    with _VERROU_POOL:
+        if _POOL_LECTURES is None:
+            _POOL_LECTURES = ThreadPoolExecutor(
+                max_workers=MAX_LECTURES_PARALLELES,
+                thread_name_prefix='pmo-lecture'
+            )
+        return _POOL_LECTURES
+
+
+# ========================================
+# VERSIONS DES DONNÉES
+# ========================================
 
+# Version de chaque feuille, incrémentée à chaque écriture faite par ce
+# processus : clé d'invalidation des caches de l'interface
+_VERSIONS: Dict[str, int] = {}
+_VERROU_VERSIONS = threading.Lock()
+
+# Fonctions appelées après chaque invalidation (rafraîchissement en fond)
+_ABONNES_INVALIDATION: List[Callable[[], None]] = []
+
+# Feuilles dont dépend chaque jeu de charger_donnees
+SOURCES_JEUX = {
+    'projets': (FEUILLE_PROJETS,),
+    'projets_non_affectes': (FEUILLE_PROJETS,),
+    'projets_en_cours': (FEUILLE_PROJETS,),
+    'chefs': (FEUILLE_CHEFS,),
+    'clients': (FEUILLE_CLIENTS,),
+    'ponderations': (FEUILLE_PONDERATIONS,),
+    'planification': (FEUILLE_PLANIFICATION,),
+    'charge': (FEUILLE_PROJETS, FEUILLE_CHEFS),
+    'noms': (FEUILLE_CHEFS, FEUILLE_CLIENTS)
+}
+
+# Jeux calculés à partir d'autres jeux du même chargement
+JEUX_DERIVES = {
+    'charge': (('projets', 'chefs'), lambda d: SnapshotCharge.construire(d['projets'], d['chefs'])),
+    'noms': (('chefs', 'clients'), lambda d: ResolveurNoms(d['chefs'], d['clients']))
+}
+
+
+def version_donnees(noms: List[str]) -> Tuple[int, ...]:
+    """
+    Versions des feuilles sources des jeux demandés.
+
+    Args:
+        noms: Jeux de données (clés de SOURCES_JEUX)
+
+    Returns:
+        Tuple de versions, dans l'ordre des feuilles de FEUILLES
+    """
+    feuilles = {feuille for nom in noms for feuille in SOURCES_JEUX[nom]}
+    with _VERROU_VERSIONS:
+        return tuple(_VERSIONS.get(f, 0) for f in FEUILLES if f in feuilles)
 
+
+def invalider_donnees(*feuilles: str) -> None:
+    """Incrémente la version des feuilles données (toutes si aucune)."""
+    with _VERROU_VERSIONS:
+        for feuille in feuilles or FEUILLES:
+            _VERSIONS[feuille] = _VERSIONS.get(feuille, 0) + 1
+        abonnes = list(_ABONNES_INVALIDATION)
+    for rappel in abonnes:
+        rappel()
+
+
+def abonner_invalidation(rappel: Callable[[], None]) -> None:
+    """Enregistre une fonction appelée après chaque invalider_donnees."""
+    with _VERROU_VERSIONS:
+        _ABONNES_INVALIDATION.append(rappel)
+
+
+@instrumenter(DONNEES)
 class DataManagerV4:
     """
-    Gestionnaire de données V4 pour Google Sheets.
+    Gestionnaire de données V4.
     
-    Gère la connexion et les opérations CRUD sur les feuilles :
+    Gère les opérations CRUD sur les feuilles :
     - Projets
     - Chefs_Projet  
     - Ponderations
     - Planification_Hebdo
+    
+    Le stockage est délégué à un backend (Google Sheets par défaut,
+    SQLite local possible) : voir storage_v4.
     """
     
-    def __init__(self, credentials_file: str, sheet_id: str):
+    def __init__(
+        self,
+        credentials_file: str = None,
+        sheet_id: str = None,
+        backend: Optional[StorageBackend] = None,
+        credentials_info: Optional[Dict] = None
+    ):
         """
-        Initialise la connexion à Google Sheets.
+        Initialise la connexion au stockage.
+        
+        Sans backend explicite, la connexion Google Sheets partagée du
+        processus est réutilisée (authentification unique).
         
         Args:
             credentials_file: Chemin vers le fichier credentials.json
             sheet_id: ID du Google Sheet
+            backend: Backend de stockage déjà construit (prioritaire)
+            credentials_info: Compte de service sous forme de dict
+                (à la place de credentials_file)
+        
+        Raises:
+            ErreurStockage: si la connexion échoue
         """
         self.credentials_file = credentials_file
         self.sheet_id = sheet_id
-        self.client = None
-        self.spreadsheet = None
-        self._connect()
-    
-    def _connect(self):
-        """Établit la connexion avec Google Sheets."""
-        try:
-            scope = [
-                'https://spreadsheets.google.com/feeds',
-                'https://www.googleapis.com/auth/drive'
-            ]
-            credentials = ServiceAccountCredentials.from_json_keyfile_name(
-                self.credentials_file, 
-                scope
+        if backend is None:
+            backend = obtenir_backend_sheets(
+                sheet_id, credentials_file, credentials_info
             )
-            self.client = gspread.authorize(credentials)
-            self.spreadsheet = self.client.open_by_key(self.sheet_id)
-            print("✅ Connexion Google Sheets établie")
-        except Exception as e:
-            print(f"❌ Erreur de connexion : {str(e)}")
-            print(f"   Vérifiez : credentials_file='{self.credentials_file}'")
-            print(f"   Vérifiez : sheet_id='{self.sheet_id}'")
-            sys.exit(1)
+        self.backend = backend
+        # Dernier rapport de validation de chaque feuille lue en entier
+        self._rapports_validation: Dict[str, RapportValidation] = {}
+    
+    @property
+    def spreadsheet(self):
+        """Spreadsheet gspread (None hors backend Google Sheets)."""
+        return getattr(self.backend, 'spreadsheet', None)
+    
+    @property
+    def client(self):
+        """Client gspread (None hors backend Google Sheets)."""
+        return getattr(self.backend, 'client', None)
+    
+    def synchroniser(self, invalider: bool = True) -> bool:
+        """
+        Réconcilie le miroir local avec le Google Sheet (si miroir actif)
+        et invalide les données en cache.
+        
+        Args:
+            invalider: Incrémenter les versions de toutes les feuilles
+                (False pour le rafraîchissement en fond, qui recharge déjà)
+        
+        Returns:
+            True si les données servies sont à jour
+        """
+        a_jour = self.backend.synchroniser() if hasattr(self.backend, 'synchroniser') else True
+        if invalider:
+            invalider_donnees()
+        return a_jour
+    
+    def metriques_stockage(self) -> Dict:
+        """
+        Métriques d'accès au stockage (quota Google Sheets).
+        
+        Returns:
+            Dict (en_attente, limitees, reessais, coalescees...) ou {} si sans objet
+        """
+        return self.backend.metriques()
+    
+    # ========================================
+    # LECTURE ET VALIDATION
+    # ========================================
+    
+    def _lire_feuille(self, feuille: str) -> pd.DataFrame:
+        """
+        Lit une feuille entière et la type selon son schéma (schema_v4).
+        
+        Les cellules illisibles sont consignées dans le rapport de
+        validation de la feuille au lieu d'être remplacées en silence.
+        
+        Args:
+            feuille: Nom de la feuille (clé de SCHEMAS)
+        
+        Returns:
+            DataFrame typé
+        """
+        df, rapport = parser_tableau(self.backend.lire_table(feuille), SCHEMAS[feuille], feuille)
+        self._rapports_validation[feuille] = rapport
+        if len(rapport):
+            print(f"⚠️ {rapport.resume()}")
+        return df
+    
+    def rapport_validation(self) -> pd.DataFrame:
+        """
+        Anomalies de saisie relevées à la dernière lecture de chaque feuille.
+        
+        Returns:
+            DataFrame (feuille, ligne, identifiant, colonne, valeur, motif)
+        """
+        rapports = [rapport.dataframe() for rapport in list(self._rapports_validation.values()) if len(rapport)]
+        if not rapports:
+            return pd.DataFrame(columns=RapportValidation.COLONNES)
+        return pd.concat(rapports, ignore_index=True)
+    
+    # ========================================
+    # CHARGEMENT GROUPÉ
+    # ========================================
+    
+    def charger_donnees(self, noms: List[str]) -> Dict:
+        """
+        Charge plusieurs jeux de données en parallèle.
+        
+        Les lectures indépendantes passent par un pool de threads borné :
+        la durée totale est proche de la lecture la plus lente au lieu
+        de la somme des lectures.
+        
+        Args:
+            noms: Jeux à charger parmi 'projets', 'chefs', 'clients',
+                'ponderations', 'planification', 'projets_non_affectes',
+                'projets_en_cours', et les jeux dérivés du même chargement :
+                'charge' (SnapshotCharge), 'noms' (ResolveurNoms)
+        
+        Returns:
+            Dict {nom: résultat de la méthode get_* correspondante}
+        """
+        demandes = [nom for nom in noms if nom in JEUX_DERIVES]
+        if demandes:
+            lectures = [nom for nom in noms if nom not in JEUX_DERIVES]
+            for nom in demandes:
+                lectures += [source for source in JEUX_DERIVES[nom][0] if source not in lectures]
+            donnees = self.charger_donnees(lectures)
+            for nom in demandes:
+                donnees[nom] = JEUX_DERIVES[nom][1](donnees)
+            return {nom: donnees[nom] for nom in noms}
+        
+        lecteurs = {
+            'projets': self.get_projets,
+            'chefs': self.get_chefs,
+            'clients': self.get_clients,
+            'ponderations': self.get_ponderations,
+            'planification': self.get_planification_hebdo,
+            'projets_non_affectes': self.get_projets_non_affectes,
+            'projets_en_cours': self.get_projets_en_cours
+        }
+        inconnus = [nom for nom in noms if nom not in lecteurs]
+        if inconnus:
+            raise ValueError(f"Jeux de données inconnus : {inconnus}")
+        
+        if len(noms) == 1:
+            return {noms[0]: lecteurs[noms[0]]()}
+        
+        pool = _pool_lectures()
+        futures = {nom: pool.submit(propager(lecteurs[nom])) for nom in noms}
+        return {nom: future.result() for nom, future in futures.items()}
     
     # ========================================
     # GESTION DES PROJETS
@@ -80,35 +307,16 @@ class DataManagerV4:
                 CPI, SPI, KPI Facturation
         """
         try:
-            ws = self.spreadsheet.worksheet('Projets')
-            data = ws.get_all_records()
-            df = pd.DataFrame(data)
-            
-            # Nettoyer les lignes vides
-            if 'ID_Projet' in df.columns:
-                df = df[df['ID_Projet'] != '']
-            
-            # Convertir types numériques
-            colonnes_numeriques = [
-                'Budget_MAD', 'Charge_JH', 'Nb_Intervenants',
-                'Indice_Charge', 'ICM_H_Semaine', 'Duree_Semaines',
-                'CPI', 'SPI', 'KPI Facturation'
-            ]
-            for col in colonnes_numeriques:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-            
-            # Convertir dates
-            colonnes_dates = ['Date_Debut', 'Date_Fin_Prev']
-            for col in colonnes_dates:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
-            
-            return df
+            return self._lire_feuille(FEUILLE_PROJETS)
         except Exception as e:
             print(f"❌ Erreur lecture projets : {str(e)}")
             return pd.DataFrame()
     
+    @staticmethod
+    def _typer_projets(df: pd.DataFrame) -> pd.DataFrame:
+        """Type des lignes brutes de la feuille Projets (lectures partielles)."""
+        return parser_tableau(df, SCHEMA_PROJETS, FEUILLE_PROJETS)[0]
+    
     def get_projet_by_id(self, projet_id: str) -> Optional[Dict]:
         """
         Récupère un projet par son ID.
@@ -119,8 +327,13 @@ class DataManagerV4:
         Returns:
             Dict avec données projet ou None
         """
-        df = self.get_projets()
-        projet = df[df['ID_Projet'] == projet_id]
+        try:
+            projet = self._typer_projets(
+                self.backend.lire_par_id(FEUILLE_PROJETS, projet_id)
+            )
+        except Exception as e:
+            print(f"❌ Erreur lecture projet {projet_id} : {str(e)}")
+            return None
         
         if len(projet) > 0:
             return projet.iloc[0].to_dict()
@@ -128,17 +341,23 @@ class DataManagerV4:
     
     def get_projets_non_affectes(self) -> pd.DataFrame:
         """Récupère les projets sans chef affecté."""
-        df = self.get_projets()
-        return df[
-            (df['Chef_Affecte'].isna()) | 
-            (df['Chef_Affecte'] == '') |
-            (df['Chef_Affecte'] == 'Non affecté')
-        ]
+        try:
+            df = self.backend.lire_filtre(
+                FEUILLE_PROJETS, 'Chef_Affecte', ['Non affecté'], inclure_vides=True
+            )
+            return self._typer_projets(df)
+        except Exception as e:
+            print(f"❌ Erreur lecture projets non affectés : {str(e)}")
+            return pd.DataFrame()
     
     def get_projets_en_cours(self) -> pd.DataFrame:
         """Récupère les projets en cours."""
-        df = self.get_projets()
-        return df[df['Statut'] == 'En cours']
+        try:
+            df = self.backend.lire_filtre(FEUILLE_PROJETS, 'Statut', ['En cours'])
+            return self._typer_projets(df)
+        except Exception as e:
+            print(f"❌ Erreur lecture projets en cours : {str(e)}")
+            return pd.DataFrame()
     
     def affecter_projet(self, projet_id: str, chef_id: str) -> bool:
         """
@@ -152,37 +371,49 @@ class DataManagerV4:
             True si succès, False sinon
         """
         try:
-            ws = self.spreadsheet.worksheet('Projets')
-            
-            # Trouver la ligne du projet
-            cell = ws.find(projet_id)
-            if cell is None:
-                print(f"❌ Projet {projet_id} introuvable")
-                return False
-            
-            row = cell.row
-            
-            # Trouver les colonnes dynamiquement
-            headers = ws.row_values(1)
-            
-            try:
-                col_chef = headers.index('Chef_Affecte') + 1
-                col_statut = headers.index('Statut') + 1
-            except ValueError as e:
-                print(f"❌ Colonne introuvable : {str(e)}")
-                return False
-            
-            # Mettre à jour Chef ET Statut
-            ws.update_cell(row, col_chef, chef_id)
-            ws.update_cell(row, col_statut, 'Actif')
-            
+            self.backend.affecter_projet(projet_id, chef_id)
+            invalider_donnees(FEUILLE_PROJETS)
             print(f"✅ Projet {projet_id} affecté à {chef_id} (Statut: Actif)")
             return True
             
         except Exception as e:
             print(f"❌ Erreur affectation : {str(e)}")
             return False
-    
+
+    def affecter_projets(
+        self,
+        affectations: List[Tuple[str, str]],
+        lever_erreurs: bool = False
+    ) -> Dict[str, Optional[str]]:
+        """
+        Affecte plusieurs projets en une écriture groupée.
+
+        Args:
+            affectations: Liste de (ID_Projet, ID_Chef)
+            lever_erreurs: Propager l'échec de l'écriture groupée (reprise
+                par l'appelant, ex. écriture différée) au lieu de le
+                reporter sur chaque projet
+
+        Returns:
+            Dict {ID_Projet: None si affecté, sinon message d'erreur}
+            (tous en erreur si l'écriture groupée échoue)
+        """
+        if not affectations:
+            return {}
+        try:
+            resultats = self.backend.affecter_projets(affectations)
+        except Exception as e:
+            print(f"❌ Erreur affectation groupée : {str(e)}")
+            if lever_erreurs:
+                raise
+            return {projet_id: str(e) for projet_id, _ in affectations}
+
+        nb_ok = sum(1 for erreur in resultats.values() if erreur is None)
+        if nb_ok:
+            invalider_donnees(FEUILLE_PROJETS)
+        print(f"✅ {nb_ok}/{len(affectations)} projets affectés (Statut: Actif)")
+        return resultats
+
     # ========================================
     # GESTION DES CLIENTS
     # ========================================
@@ -196,15 +427,7 @@ class DataManagerV4:
                 ID_Client, Nom_Client, Chef_Favori, etc.
         """
         try:
-            ws = self.spreadsheet.worksheet('Clients')
-            data = ws.get_all_records()
-            df = pd.DataFrame(data)
-            
-            # Nettoyer les lignes vides
-            if 'ID_Client' in df.columns:
-                df = df[df['ID_Client'] != '']
-            
-            return df
+            return self._lire_feuille(FEUILLE_CLIENTS)
         except Exception as e:
             print(f"❌ Erreur lecture clients : {str(e)}")
             return pd.DataFrame()
@@ -219,8 +442,13 @@ class DataManagerV4:
         Returns:
             Dict avec données client ou None
         """
-        df = self.get_clients()
-        client = df[df['ID_Client'] == client_id]
+        try:
+            client = parser_tableau(
+                self.backend.lire_par_id(FEUILLE_CLIENTS, client_id), SCHEMA_CLIENTS, FEUILLE_CLIENTS
+            )[0]
+        except Exception as e:
+            print(f"❌ Erreur lecture client {client_id} : {str(e)}")
+            return None
         
         if len(client) > 0:
             return client.iloc[0].to_dict()
@@ -244,33 +472,16 @@ class DataManagerV4:
                 Date_Embauche, Commentaires
         """
         try:
-            ws = self.spreadsheet.worksheet('Chefs_Projets')
-            data = ws.get_all_records()
-            df = pd.DataFrame(data)
-            
-            # Nettoyer les lignes vides
-            if 'ID_Chef' in df.columns:
-                df = df[df['ID_Chef'] != '']
-            
-            # Convertir types numériques
-            colonnes_numeriques = [
-                'Annees_Experience', 'Nb_Projets_Geres',
-                'Capacite_Max', 'ICC_H_Semaine', 'Capacite_Plafond_H',
-                'Charge_Actuelle', 'Taux_Charge_Pct', 'Projets_Actifs'
-            ]
-            for col in colonnes_numeriques:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-            
-            # Convertir dates
-            if 'Date_Embauche' in df.columns:
-                df['Date_Embauche'] = pd.to_datetime(df['Date_Embauche'], errors='coerce')
-            
-            return df
+            return self._lire_feuille(FEUILLE_CHEFS)
         except Exception as e:
             print(f"❌ Erreur lecture chefs : {str(e)}")
             return pd.DataFrame()
     
+    @staticmethod
+    def _typer_chefs(df: pd.DataFrame) -> pd.DataFrame:
+        """Type des lignes brutes de la feuille Chefs_Projets (lectures partielles)."""
+        return parser_tableau(df, SCHEMA_CHEFS, FEUILLE_CHEFS)[0]
+    
     def get_chef_by_id(self, chef_id: str) -> Optional[Dict]:
         """
         Récupère un chef par son ID.
@@ -281,8 +492,11 @@ class DataManagerV4:
         Returns:
             Dict avec données chef ou None
         """
-        df = self.get_chefs()
-        chef = df[df['ID_Chef'] == chef_id]
+        try:
+            chef = self._typer_chefs(self.backend.lire_par_id(FEUILLE_CHEFS, chef_id))
+        except Exception as e:
+            print(f"❌ Erreur lecture chef {chef_id} : {str(e)}")
+            return None
         
         if len(chef) > 0:
             return chef.iloc[0].to_dict()
@@ -317,9 +531,7 @@ class DataManagerV4:
             }
         """
         try:
-            ws = self.spreadsheet.worksheet('Ponderations')
-            data = ws.get_all_records()
-            df = pd.DataFrame(data)
+            df = self._lire_feuille(FEUILLE_PONDERATIONS)
             
             # Structure retour
             ponderations = {
@@ -388,75 +600,120 @@ class DataManagerV4:
                 Projet_Nom, ICM, Charge_H
         """
         try:
-            ws = self.spreadsheet.worksheet('Planification_Hebdo')
-            data = ws.get_all_records()
-            df = pd.DataFrame(data)
-            
-            # Convertir types
-            if 'Date' in df.columns:
-                df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-            
-            colonnes_num = ['Semaine', 'Annee', 'ICM', 'Charge_H']
-            for col in colonnes_num:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            return df
+            return self._lire_feuille(FEUILLE_PLANIFICATION)
         except Exception as e:
             print(f"⚠️ Planification_Hebdo non accessible : {str(e)}")
             return pd.DataFrame()
     
     def generer_planification_hebdo(
         self, 
-        nb_semaines: int = 12
+        nb_semaines: int = 12,
+        date_reference: Optional[datetime] = None
     ) -> pd.DataFrame:
         """
         Génère la planification pour les N prochaines semaines.
         
+        Expansion vectorisée des intervalles projets sur la grille des
+        semaines (voir planification_v4).
+        
         Args:
             nb_semaines: Nombre de semaines à générer
+            date_reference: Date de la semaine 0 (défaut : maintenant)
         
         Returns:
             DataFrame planification
         """
-        projets_df = self.get_projets()
-        planning = []
-        today = datetime.today()
+        return generer_planification(self.get_projets(), nb_semaines, date_reference)
+    
+    def mettre_a_jour_planification_hebdo(
+        self,
+        planificateur: PlanificateurIncremental,
+        projets_modifies: List[str],
+        sauvegarder: bool = True
+    ) -> Optional[DiffPlanification]:
+        """
+        Recalcule la planification des seuls projets modifiés.
         
-        # Filtrer projets en cours ou à venir
-        projets_actifs = projets_df[
-            projets_df['Statut'].isin(['En cours', 'Planifié'])
-        ].copy()
+        Args:
+            planificateur: Planificateur déjà initialisé (plan courant)
+            projets_modifies: IDs des projets ajoutés, modifiés ou supprimés
+            sauvegarder: Appliquer aussi la différence au stockage
         
-        for i in range(nb_semaines):
-            semaine_date = today + timedelta(weeks=i)
-            semaine_num = semaine_date.isocalendar()[1]
-            annee = semaine_date.year
-            
-            for _, projet in projets_actifs.iterrows():
-                # Vérifier si projet actif cette semaine
-                date_debut = pd.to_datetime(projet.get('Date_Debut'))
-                date_fin = pd.to_datetime(projet.get('Date_Fin_Prev'))
-                
-                if pd.isna(date_debut) or pd.isna(date_fin):
-                    continue
-                
-                if date_debut <= semaine_date <= date_fin:
-                    chef_id = projet.get('Chef_Affecte', '')
-                    if chef_id and chef_id != '' and chef_id != 'Non affecté':
-                        planning.append({
-                            'Semaine': semaine_num,
-                            'Annee': annee,
-                            'Date': semaine_date,
-                            'Chef_ID': chef_id,
-                            'Projet_ID': projet['ID_Projet'],
-                            'Projet_Nom': projet['Nom_Projet'],
-                            'ICM': projet.get('Indice_Charge', 0),
-                            'Charge_H': projet.get('ICM_H_Semaine', 0)
-                        })
-        
-        return pd.DataFrame(planning)
+        Returns:
+            DiffPlanification appliquée, ou None en cas d'erreur de stockage
+        """
+        diff = planificateur.mettre_a_jour(self.get_projets(), projets_modifies)
+        if not sauvegarder or diff.est_vide():
+            return diff
+        
+        try:
+            self.backend.appliquer_diff_planification(diff)
+            invalider_donnees(FEUILLE_PLANIFICATION)
+            print(f"✅ Planification mise à jour {diff.resume()}")
+            return diff
+        except Exception as e:
+            print(f"❌ Erreur mise à jour planification : {str(e)}")
+            return None
     
+    def mettre_a_jour_cellules(self, table: str, cellules: List[Tuple[str, str, object]]) -> Optional[int]:
+        """
+        Réécrit des cellules isolées en une écriture groupée.
+
+        Args:
+            table: Feuille (FEUILLE_PROJETS, FEUILLE_CHEFS...)
+            cellules: Liste de (identifiant, colonne, nouvelle valeur)
+
+        Returns:
+            Nombre de cellules écrites, ou None en cas d'erreur
+        """
+        if not cellules:
+            return 0
+        try:
+            nb = self.backend.mettre_a_jour_cellules(table, cellules)
+            invalider_donnees(table)
+            print(f"✅ {table} : {nb} cellule(s) mise(s) à jour")
+            return nb
+        except Exception as e:
+            print(f"❌ Erreur mise à jour {table} : {str(e)}")
+            return None
+
+    def recalculer_planification_hebdo(
+        self,
+        nb_semaines: int = 12,
+        date_reference: Optional[datetime] = None,
+        projets_df: Optional[pd.DataFrame] = None,
+        sauvegarder: bool = True
+    ) -> Optional[DiffPlanification]:
+        """
+        Régénère toute la planification et n'écrit que la différence
+        avec la feuille Planification_Hebdo.
+
+        Args:
+            nb_semaines: Horizon en semaines
+            date_reference: Date de la semaine 0 (défaut : maintenant)
+            projets_df: Projets à planifier (défaut : relus du stockage)
+            sauvegarder: Appliquer aussi la différence au stockage
+
+        Returns:
+            DiffPlanification, ou None en cas d'erreur de stockage
+        """
+        projets = self.get_projets() if projets_df is None else projets_df
+        # Dates stockées sans heure : grille à minuit pour comparer les clés
+        date_reference = pd.Timestamp(date_reference or datetime.today()).normalize()
+        nouveau = generer_planification(projets, nb_semaines, date_reference)
+        diff = calculer_diff(self.get_planification_hebdo(), nouveau)
+        if not sauvegarder or diff.est_vide():
+            return diff
+
+        try:
+            self.backend.appliquer_diff_planification(diff)
+            invalider_donnees(FEUILLE_PLANIFICATION)
+            print(f"✅ Planification recalculée {diff.resume()}")
+            return diff
+        except Exception as e:
+            print(f"❌ Erreur recalcul planification : {str(e)}")
+            return None
+
     def sauvegarder_planification_hebdo(self, planning_df: pd.DataFrame) -> bool:
         """
         Sauvegarde la planification dans Google Sheets.
@@ -468,31 +725,8 @@ class DataManagerV4:
             True si succès
         """
         try:
-            ws = self.spreadsheet.worksheet('Planification_Hebdo')
-            
-            # Effacer contenu existant (sauf en-têtes)
-            ws.clear()
-            
-            # Écrire en-têtes
-            headers = [
-                'Semaine', 'Annee', 'Date', 'Chef_ID', 
-                'Projet_ID', 'Projet_Nom', 'ICM', 'Charge_H'
-            ]
-            ws.append_row(headers)
-            
-            # Écrire données
-            for _, row in planning_df.iterrows():
-                ws.append_row([
-                    int(row['Semaine']),
-                    int(row['Annee']),
-                    row['Date'].strftime('%Y-%m-%d') if pd.notna(row['Date']) else '',
-                    str(row['Chef_ID']),
-                    str(row['Projet_ID']),
-                    str(row['Projet_Nom']),
-                    float(row['ICM']),
-                    float(row['Charge_H'])
-                ])
-            
+            self.backend.sauvegarder_planification(planning_df)
+            invalider_donnees(FEUILLE_PLANIFICATION)
             print(f"✅ Planification sauvegardée ({len(planning_df)} lignes)")
             return True
             
@@ -500,17 +734,57 @@ class DataManagerV4:
             print(f"❌ Erreur sauvegarde planification : {str(e)}")
             return False
     
+    def exporter_planification_hebdo(
+        self,
+        sortie: Optional[SortiePlanification] = None,
+        nb_semaines: int = 12,
+        date_reference: Optional[datetime] = None,
+        taille_bloc: int = TAILLE_BLOC_DEFAUT
+    ) -> Optional[int]:
+        """
+        Génère et écrit la planification bloc par bloc (horizons longs).
+        
+        Aucun bloc n'est conservé après écriture : la mémoire reste
+        constante quel que soit nb_semaines.
+        
+        Args:
+            sortie: Destination (SortieCSV, SortieParquet, SortieStockage) ;
+                défaut : feuille Planification_Hebdo du backend
+            nb_semaines: Nombre de semaines à générer
+            date_reference: Date de la semaine 0 (défaut : maintenant)
+            taille_bloc: Lignes par bloc
+        
+        Returns:
+            Nombre de lignes écrites, ou None en cas d'erreur
+        """
+        if sortie is None:
+            sortie = SortieStockage(self.backend)
+        
+        try:
+            blocs = iterer_planification(
+                self.get_projets(), nb_semaines, date_reference, taille_bloc
+            )
+            nb_lignes = ecrire_blocs(blocs, sortie)
+            if isinstance(sortie, SortieStockage):
+                invalider_donnees(FEUILLE_PLANIFICATION)
+            print(f"✅ Planification exportée ({nb_lignes} lignes, {sortie.nb_blocs} blocs)")
+            return nb_lignes
+            
+        except Exception as e:
+            print(f"❌ Erreur export planification : {str(e)}")
+            return None
+    
     # ========================================
     # UTILITAIRES
     # ========================================
     
     def refresh_connection(self):
-        """Rafraîchit la connexion Google Sheets."""
-        self._connect()
+        """Rafraîchit la connexion au stockage."""
+        self.backend.reconnecter()
     
     def get_spreadsheet_url(self) -> str:
-        """Retourne l'URL du Google Sheet."""
-        return f"https://docs.google.com/spreadsheets/d/{self.sheet_id}"
+        """Retourne l'URL du Google Sheet (ou la description du stockage local)."""
+        return self.backend.description()
     
     def test_connection(self) -> bool:
         """Teste la connexion et l'accès aux feuilles."""
@@ -519,10 +793,10 @@ class DataManagerV4:
             print(f"   URL: {self.get_spreadsheet_url()}")
             
             # Lister feuilles
-            worksheets = self.spreadsheet.worksheets()
-            print(f"\n✅ Feuilles disponibles ({len(worksheets)}) :")
-            for ws in worksheets:
-                print(f"   • {ws.title}")
+            feuilles = self.backend.lister_tables()
+            print(f"\n✅ Feuilles disponibles ({len(feuilles)}) :")
+            for feuille in feuilles:
+                print(f"   • {feuille}")
             
             # Test lecture
             print("\n📊 Test lecture données...")
@@ -546,23 +820,43 @@ class DataManagerV4:
 # FONCTIONS UTILITAIRES
 # ========================================
 
-def init_data_manager(credentials_file: str = None, sheet_id: str = None) -> DataManagerV4:
+def init_data_manager(
+    credentials_file: str = None,
+    sheet_id: str = None,
+    sqlite_path: str = None,
+    miroir_path: str = None,
+    credentials_info: Dict = None
+) -> DataManagerV4:
     """
     Initialise le DataManager avec credentials par défaut si non fournis.
     
     Args:
         credentials_file: Chemin credentials.json (optionnel)
         sheet_id: ID Google Sheet (optionnel)
+        sqlite_path: Base SQLite locale à utiliser à la place du Google Sheet
+        miroir_path: Miroir SQLite local du Google Sheet (démarrage rapide,
+            lecture hors-ligne, réconciliation en arrière-plan)
+        credentials_info: Compte de service sous forme de dict (ex. st.secrets)
     
     Returns:
         Instance DataManagerV4
     """
+    if sqlite_path is not None:
+        return DataManagerV4(backend=SQLiteBackend(sqlite_path))
+    
     # Valeurs par défaut (à adapter)
-    if credentials_file is None:
+    if credentials_file is None and credentials_info is None:
         credentials_file = '/home/claude/credentials.json'
     
     if sheet_id is None:
         # Votre SHEET_ID par défaut
         sheet_id = '1TFCyjjWZirBQG45xXnJ8vzHMo5YrhkiIwHdHaMx7lfs'
     
-    return DataManagerV4(credentials_file, sheet_id)
+    if miroir_path:
+        backend = obtenir_miroir(
+            lambda: obtenir_backend_sheets(sheet_id, credentials_file, credentials_info),
+            miroir_path
+        )
+        return DataManagerV4(credentials_file, sheet_id, backend=backend)
+    
+    return DataManagerV4(credentials_file, sheet_id, credentials_info=credentials_info)
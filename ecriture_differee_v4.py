@@ -0,0 +1,422 @@
+"""
+Écriture différée V4 - Affectations journalisées, écrites par lots
+===================================================================
+
+Mode optionnel ("write-behind") pour les affectations de chefs :
+1. l'affectation est consignée dans un journal SQLite local (durable)
+2. elle est appliquée tout de suite à l'instantané en mémoire et aux
+   index de charge (surcouche du rafraîchisseur) : l'utilisateur n'attend
+   aucune requête Google Sheets
+3. un thread vide le journal toutes les `intervalle_s` secondes en une
+   seule écriture groupée (DataManagerV4.affecter_projets) ; un échec
+   de l'écriture est retenté avec un délai croissant, sans perte
+
+Au démarrage, les affectations restées en attente (arrêt brutal du
+processus) sont réappliquées à l'instantané puis écrites au premier
+vidage.
+
+Usage (app) : variable d'environnement PMO_JOURNAL_ECRITURES = chemin du
+journal (mode désactivé si absente).
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from data_manager_v4 import DataManagerV4, JEUX_DERIVES, invalider_donnees
+from rafraichissement_v4 import RafraichisseurDonnees
+from schema_v4 import en_categorie, modifiable
+from snapshot_v4 import STATUT_ACTIF
+from storage_v4 import FEUILLE_PROJETS
+
+
+# Période de vidage du journal vers le stockage (secondes)
+INTERVALLE_ECRITURE_S = 5
+
+# Délai maximal entre deux essais après des échecs consécutifs (x intervalle)
+FACTEUR_ATTENTE_MAX = 16
+
+# États d'une entrée du journal
+EN_ATTENTE = 'en_attente'
+ECRITE = 'ecrite'
+REMPLACEE = 'remplacee'   # Affectation plus récente du même projet écrite à sa place
+REJETEE = 'rejetee'       # Refusée par le stockage (ex. projet introuvable)
+
+ETATS = [EN_ATTENTE, ECRITE, REMPLACEE, REJETEE]
+
+
+# ========================================
+# JOURNAL
+# ========================================
+
+class JournalAffectations:
+    """
+    Journal SQLite des affectations à écrire (une ligne par demande).
+
+    Les lignes ne sont jamais supprimées : leur état passe de
+    "en_attente" à "ecrite", "remplacee" ou "rejetee".
+    """
+
+    def __init__(self, chemin_db: str):
+        """
+        Ouvre (ou crée) le journal.
+
+        Args:
+            chemin_db: Chemin du fichier SQLite
+        """
+        self.chemin_db = chemin_db
+        self._verrou = threading.Lock()
+        with self._connexion() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS journal_affectations ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, projet_id TEXT NOT NULL, '
+                'chef_id TEXT NOT NULL, demandee_le TEXT NOT NULL, etat TEXT NOT NULL, '
+                'echecs INTEGER NOT NULL DEFAULT 0, erreur TEXT, traitee_le TEXT)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_journal_etat ON journal_affectations (etat)'
+            )
+
+    @contextmanager
+    def _connexion(self):
+        """Connexion courte (une par opération, sûre entre threads)."""
+        conn = sqlite3.connect(self.chemin_db, timeout=30)
+        # Chaque affectation acceptée survit à un arrêt brutal
+        conn.execute('PRAGMA synchronous=FULL')
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def ajouter(self, affectations: List[Tuple[str, str]]) -> List[int]:
+        """
+        Consigne des affectations en attente d'écriture.
+
+        Args:
+            affectations: Liste de (ID_Projet, ID_Chef)
+
+        Returns:
+            Identifiants des entrées créées
+        """
+        maintenant = datetime.now().isoformat(timespec='seconds')
+        with self._verrou, self._connexion() as conn:
+            return [
+                conn.execute(
+                    'INSERT INTO journal_affectations (projet_id, chef_id, demandee_le, etat) '
+                    'VALUES (?, ?, ?, ?)',
+                    (str(projet_id), str(chef_id), maintenant, EN_ATTENTE)
+                ).lastrowid
+                for projet_id, chef_id in affectations
+            ]
+
+    def en_attente(self) -> List[Tuple[int, str, str]]:
+        """Entrées en attente (id, ID_Projet, ID_Chef), de la plus ancienne à la plus récente."""
+        with self._connexion() as conn:
+            return conn.execute(
+                'SELECT id, projet_id, chef_id FROM journal_affectations '
+                'WHERE etat = ? ORDER BY id', (EN_ATTENTE,)
+            ).fetchall()
+
+    def affectations_en_attente(self) -> Dict[str, str]:
+        """{ID_Projet: ID_Chef} en attente (la demande la plus récente l'emporte)."""
+        return {projet_id: chef_id for _, projet_id, chef_id in self.en_attente()}
+
+    def marquer(self, ids: List[int], etat: str, erreur: Optional[str] = None) -> None:
+        """Passe des entrées dans l'état donné (ecrite, remplacee, rejetee)."""
+        if not ids:
+            return
+        maintenant = datetime.now().isoformat(timespec='seconds')
+        with self._verrou, self._connexion() as conn:
+            conn.executemany(
+                'UPDATE journal_affectations SET etat = ?, erreur = ?, traitee_le = ? WHERE id = ?',
+                [(etat, erreur, maintenant, id_entree) for id_entree in ids]
+            )
+
+    def noter_echec(self, ids: List[int], erreur: str) -> None:
+        """Compte un essai d'écriture échoué (les entrées restent en attente)."""
+        if not ids:
+            return
+        with self._verrou, self._connexion() as conn:
+            conn.executemany(
+                'UPDATE journal_affectations SET echecs = echecs + 1, erreur = ? WHERE id = ?',
+                [(erreur, id_entree) for id_entree in ids]
+            )
+
+    def compter(self) -> Dict[str, int]:
+        """Nombre d'entrées par état (tous les états présents, 0 par défaut)."""
+        with self._connexion() as conn:
+            lignes = conn.execute(
+                'SELECT etat, COUNT(*) FROM journal_affectations GROUP BY etat'
+            ).fetchall()
+        return {**{etat: 0 for etat in ETATS}, **dict(lignes)}
+
+    def dernieres(self, nombre: int = 20) -> pd.DataFrame:
+        """Entrées les plus récentes (toutes colonnes), de la plus récente à la plus ancienne."""
+        with self._connexion() as conn:
+            curseur = conn.execute(
+                'SELECT * FROM journal_affectations ORDER BY id DESC LIMIT ?', (nombre,)
+            )
+            colonnes = [d[0] for d in curseur.description]
+            return pd.DataFrame(curseur.fetchall(), columns=colonnes)
+
+
+# ========================================
+# SURCOUCHE DE L'INSTANTANÉ
+# ========================================
+
+def appliquer_affectations(donnees: Dict, affectations: Dict[str, str]) -> Dict:
+    """
+    Applique des affectations à un jeu de données chargé (sans le modifier).
+
+    Projets : Chef_Affecte et Statut "Actif", comme l'écriture réelle ;
+    les listes de projets non affectés / en cours et les jeux dérivés
+    des projets (charge par chef) sont recalculés.
+
+    Args:
+        donnees: Dict {jeu: données} d'un instantané
+        affectations: {ID_Projet: ID_Chef}
+
+    Returns:
+        Nouveau dict (inchangé si les affectations y figurent déjà)
+    """
+    if not affectations or 'projets' not in donnees or len(donnees['projets']) == 0:
+        return donnees
+    projets = donnees['projets']
+    cibles = projets['ID_Projet'].map(affectations)
+    concernes = cibles.notna()
+    appliquees = concernes \
+        & (projets['Chef_Affecte'].astype(object) == cibles) \
+        & (projets['Statut'].astype(object) == STATUT_ACTIF)
+    if not concernes.any() or appliquees.equals(concernes):
+        return donnees
+
+    categoriels = [colonne for colonne in ['Chef_Affecte', 'Statut']
+                   if isinstance(projets[colonne].dtype, pd.CategoricalDtype)]
+    projets = modifiable(projets.copy(), 'Chef_Affecte', 'Statut')
+    projets.loc[concernes, 'Chef_Affecte'] = cibles[concernes]
+    projets.loc[concernes, 'Statut'] = STATUT_ACTIF
+    for colonne in categoriels:
+        projets[colonne] = en_categorie(projets[colonne])
+
+    resultat = dict(donnees)
+    resultat['projets'] = projets
+    ids = list(affectations)
+    for nom in ['projets_non_affectes', 'projets_en_cours']:
+        if nom in resultat and 'ID_Projet' in resultat[nom].columns:
+            resultat[nom] = resultat[nom][~resultat[nom]['ID_Projet'].isin(ids)]
+    for nom, (sources, construire) in JEUX_DERIVES.items():
+        if nom in resultat and 'projets' in sources:
+            resultat[nom] = construire(resultat)
+    return resultat
+
+
+# ========================================
+# ÉCRIVAIN DIFFÉRÉ
+# ========================================
+
+class EcrivainDiffere:
+    """Thread de vidage du journal d'affectations (un par journal et par processus)."""
+
+    def __init__(
+        self,
+        data_manager: DataManagerV4,
+        rafraichisseur: RafraichisseurDonnees,
+        journal: JournalAffectations,
+        intervalle_s: float = INTERVALLE_ECRITURE_S
+    ):
+        """
+        Args:
+            data_manager: Gestionnaire de données (écriture groupée)
+            rafraichisseur: Rafraîchisseur dont l'instantané reçoit les
+                affectations en attente
+            journal: Journal durable des affectations
+            intervalle_s: Période de vidage (secondes)
+        """
+        self.data_manager = data_manager
+        self.rafraichisseur = rafraichisseur
+        self.journal = journal
+        self.intervalle_s = intervalle_s
+        self.derniere_erreur: Optional[str] = None
+        self.dernier_vidage: Optional[datetime] = None
+
+        self._echecs_consecutifs = 0
+        self._verrou_vidage = threading.Lock()
+        self._reveil = threading.Event()
+        self._arret = False
+        self._thread: Optional[threading.Thread] = None
+
+    # ----------------------------------------
+    # Cycle de vie
+    # ----------------------------------------
+
+    def demarrer(self) -> 'EcrivainDiffere':
+        """Branche la surcouche et lance le thread (sans effet s'il tourne déjà)."""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        reprises = len(self.journal.en_attente())
+        if reprises:
+            print(f"↻ {reprises} affectation(s) du journal en attente d'écriture : reprise")
+        self.rafraichisseur.ajouter_surcouche(self._surcouche)
+        self._arret = False
+        self._thread = threading.Thread(
+            target=self._boucle,
+            name='pmo-ecriture-differee',
+            daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def arreter(self, timeout: Optional[float] = None) -> None:
+        """Arrête le thread après un dernier vidage."""
+        self._arret = True
+        self._reveil.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _boucle(self) -> None:
+        while True:
+            # Échecs consécutifs : délai doublé à chaque fois (plafonné)
+            attente = self.intervalle_s * min(2 ** self._echecs_consecutifs, FACTEUR_ATTENTE_MAX)
+            self._reveil.wait(attente)
+            self._reveil.clear()
+            self.vider()
+            if self._arret:
+                return
+
+    def _surcouche(self, donnees: Dict) -> Dict:
+        return appliquer_affectations(donnees, self.journal.affectations_en_attente())
+
+    # ----------------------------------------
+    # Affectation et vidage
+    # ----------------------------------------
+
+    def affecter(self, affectations: List[Tuple[str, str]]) -> Dict[str, Optional[str]]:
+        """
+        Journalise des affectations et les applique à l'instantané.
+
+        Retour immédiat : l'écriture dans le stockage a lieu au prochain
+        vidage.
+
+        Args:
+            affectations: Liste de (ID_Projet, ID_Chef)
+
+        Returns:
+            Dict {ID_Projet: None} (même forme que DataManagerV4.affecter_projets)
+        """
+        if not affectations:
+            return {}
+        self.journal.ajouter(affectations)
+        self.rafraichisseur.reappliquer()
+        print(f"📝 {len(affectations)} affectation(s) journalisée(s), écriture différée")
+        return {projet_id: None for projet_id, _ in affectations}
+
+    def vider(self) -> Dict[str, int]:
+        """
+        Écrit les affectations en attente en une écriture groupée.
+
+        Pour un même projet, seule la demande la plus récente est écrite.
+        Un échec de l'écriture laisse les entrées en attente (nouvel essai
+        au vidage suivant) ; un projet refusé par le stockage est rejeté.
+
+        Returns:
+            Dict {ecrites, rejetees, en_attente}
+        """
+        with self._verrou_vidage:
+            entrees = self.journal.en_attente()
+            if not entrees:
+                return {'ecrites': 0, 'rejetees': 0, 'en_attente': 0}
+
+            # Dernière demande de chaque projet, les précédentes sont remplacées
+            ids_par_projet: Dict[str, List[int]] = {}
+            derniere: Dict[str, Tuple[int, str]] = {}
+            for id_entree, projet_id, chef_id in entrees:
+                ids_par_projet.setdefault(projet_id, []).append(id_entree)
+                derniere[projet_id] = (id_entree, chef_id)
+            affectations = [(projet_id, chef_id) for projet_id, (_, chef_id) in derniere.items()]
+
+            try:
+                resultats = self.data_manager.affecter_projets(affectations, lever_erreurs=True)
+            except Exception as e:
+                self._echecs_consecutifs += 1
+                self.derniere_erreur = str(e)
+                self.journal.noter_echec([id_entree for id_entree, _, _ in entrees], str(e))
+                print(f"⚠️ Écriture différée impossible, nouvel essai plus tard : {str(e)}")
+                return {'ecrites': 0, 'rejetees': 0, 'en_attente': len(affectations)}
+
+            ecrites, rejetees = [], []
+            for projet_id, (id_entree, _) in derniere.items():
+                erreur = resultats.get(projet_id)
+                if erreur is None:
+                    ecrites.append(id_entree)
+                    self.journal.marquer(ids_par_projet[projet_id][:-1], REMPLACEE)
+                else:
+                    rejetees.append(id_entree)
+                    self.journal.marquer(ids_par_projet[projet_id], REJETEE, erreur)
+            self.journal.marquer(ecrites, ECRITE)
+
+            self._echecs_consecutifs = 0
+            self.derniere_erreur = None
+            self.dernier_vidage = datetime.now()
+            if rejetees:
+                # L'instantané affiche encore les affectations rejetées
+                invalider_donnees(FEUILLE_PROJETS)
+            print(f"✅ Écriture différée : {len(ecrites)} affectation(s) écrite(s), "
+                  f"{len(rejetees)} rejetée(s)")
+            return {'ecrites': len(ecrites), 'rejetees': len(rejetees), 'en_attente': 0}
+
+    def etat(self) -> Dict:
+        """
+        État de l'écriture différée.
+
+        Returns:
+            Dict avec en_attente, ecrites, rejetees, dernier_vidage, erreur
+        """
+        comptes = self.journal.compter()
+        return {
+            'en_attente': comptes[EN_ATTENTE],
+            'ecrites': comptes[ECRITE] + comptes[REMPLACEE],
+            'rejetees': comptes[REJETEE],
+            'dernier_vidage': self.dernier_vidage,
+            'erreur': self.derniere_erreur
+        }
+
+
+# ========================================
+# REGISTRE PROCESSUS
+# ========================================
+
+_ECRIVAINS: Dict[str, EcrivainDiffere] = {}
+_VERROU_ECRIVAINS = threading.Lock()
+
+
+def obtenir_ecrivain_differe(
+    data_manager: DataManagerV4,
+    rafraichisseur: RafraichisseurDonnees,
+    chemin_journal: str,
+    intervalle_s: float = INTERVALLE_ECRITURE_S
+) -> EcrivainDiffere:
+    """
+    Renvoie l'écrivain différé partagé du processus pour ce journal.
+
+    Un seul thread de vidage par journal, quel que soit le nombre de
+    sessions Streamlit ; les affectations en attente au démarrage sont
+    reprises.
+    """
+    with _VERROU_ECRIVAINS:
+        ecrivain = _ECRIVAINS.get(chemin_journal)
+        if ecrivain is None:
+            ecrivain = EcrivainDiffere(
+                data_manager, rafraichisseur, JournalAffectations(chemin_journal), intervalle_s
+            )
+            _ECRIVAINS[chemin_journal] = ecrivain
+        return ecrivain.demarrer()
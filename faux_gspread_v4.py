@@ -0,0 +1,598 @@
+"""
+Faux gspread V4 - Client Google Sheets en mémoire pour les benchmarks
+======================================================================
+
+Implémente le sous-ensemble de gspread utilisé par SheetsBackend, sur
+des onglets en mémoire, sans compte Google :
+- Client : open_by_key
+- Spreadsheet : worksheet, worksheets, add_worksheet, get_lastUpdateTime
+- Worksheet : get_all_records, get_all_values, get_values, row_values,
+  col_values, find, update_cell, update, append_row, append_rows,
+  clear, delete_rows, et les équivalents groupés batch_get,
+  batch_update, batch_clear
+
+Chaque appel compte pour une requête API, comme avec gspread :
+- latence injectée (fixe + gigue aléatoire)
+- quota glissant (requêtes par fenêtre) : 429 au-delà, sans attente
+- échecs aléatoires (429 / 503) ou programmés (injecter_echec)
+- journal de tous les appels (méthode, onglet, durée, statut) pour
+  vérifier dans les benchmarks le nombre exact de requêtes
+
+Les cellules sont stockées en texte, comme les valeurs affichées du
+Sheet ; get_all_records numérise les nombres comme gspread.
+
+Usage :
+    client = FauxClientGspread({'Projets': projets_df}, latence_s=0.2)
+    backend = SheetsBackend(None, 'faux-sheet', client=client)
+    ...
+    assert client.nb_appels('batch_update') == 1
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+
+# ========================================
+# ERREURS
+# ========================================
+
+class ErreurAPISimulee(Exception):
+    """
+    Réponse d'erreur de l'API simulée.
+
+    Porte `response.status_code` et `code`, lus par
+    ordonnanceur_v4.code_http comme pour une APIError gspread.
+    """
+
+    def __init__(self, statut: int, message: str):
+        super().__init__(f"{statut} {message} (simulé)")
+        self.code = statut
+        self.response = SimpleNamespace(status_code=statut)
+
+
+class OngletIntrouvable(Exception):
+    """Équivalent de gspread.exceptions.WorksheetNotFound."""
+
+
+# ========================================
+# CONVERSIONS
+# ========================================
+
+_A1 = re.compile(r'^([A-Z]+)(\d+)$')
+
+
+def formater_cellule(valeur) -> str:
+    """Texte affiché d'une valeur écrite (nombres entiers sans décimale)."""
+    if valeur is None or (not isinstance(valeur, str) and pd.api.types.is_scalar(valeur) and pd.isna(valeur)):
+        return ''
+    if isinstance(valeur, bool):
+        return 'TRUE' if valeur else 'FALSE'
+    if isinstance(valeur, float):
+        return str(int(valeur)) if valeur.is_integer() else repr(valeur)
+    if isinstance(valeur, (pd.Timestamp, datetime, date)):
+        return valeur.strftime('%Y-%m-%d')
+    if hasattr(valeur, 'item'):
+        return formater_cellule(valeur.item())
+    return str(valeur)
+
+
+def numeriser(valeur: str):
+    """Comme gspread.utils.numericise : int, puis float, sinon texte."""
+    if valeur == '':
+        return ''
+    try:
+        return int(valeur)
+    except ValueError:
+        pass
+    try:
+        return float(valeur)
+    except ValueError:
+        return valeur
+
+
+def a1_vers_ligne_colonne(cellule: str) -> Tuple[int, int]:
+    """'AB12' -> (12, 28)."""
+    correspondance = _A1.match(cellule.upper())
+    if correspondance is None:
+        raise ValueError(f"Référence A1 invalide : {cellule}")
+    lettres, ligne = correspondance.groups()
+    colonne = 0
+    for lettre in lettres:
+        colonne = colonne * 26 + ord(lettre) - ord('A') + 1
+    return int(ligne), colonne
+
+
+def _plage(plage: str) -> Tuple[int, int, Optional[int], Optional[int]]:
+    """'A2:H5' -> (2, 1, 5, 8) ; 'A2' -> (2, 1, 2, 1) (bornes incluses)."""
+    plage = plage.split('!')[-1]
+    debut, _, fin = plage.partition(':')
+    ligne, colonne = a1_vers_ligne_colonne(debut)
+    if not fin:
+        return ligne, colonne, ligne, colonne
+    ligne_fin, colonne_fin = a1_vers_ligne_colonne(fin)
+    return ligne, colonne, ligne_fin, colonne_fin
+
+
+def _grille(contenu) -> List[List[str]]:
+    """Grille texte depuis un DataFrame, une liste de dicts ou de lignes."""
+    if contenu is None:
+        return []
+    if isinstance(contenu, pd.DataFrame):
+        lignes = [list(contenu.columns)] + contenu.astype(object).values.tolist()
+    elif contenu and isinstance(contenu[0], dict):
+        entetes = list(dict.fromkeys(cle for ligne in contenu for cle in ligne))
+        lignes = [entetes] + [[ligne.get(cle, '') for cle in entetes] for ligne in contenu]
+    else:
+        lignes = [list(ligne) for ligne in contenu]
+    return [[formater_cellule(valeur) for valeur in ligne] for ligne in lignes]
+
+
+# ========================================
+# JOURNAL
+# ========================================
+
+class AppelAPI:
+    """
+    Une requête simulée.
+
+    Attributs:
+        methode: Méthode gspread appelée (ex. 'batch_update')
+        onglet: Onglet visé (None pour les appels classeur)
+        debut: Horodatage perf_counter du début
+        duree_s: Durée, latence comprise
+        statut: 200, ou code de l'erreur renvoyée
+        taille: Lignes lues ou écrites (selon la méthode)
+    """
+
+    def __init__(self, methode: str, onglet: Optional[str], debut: float):
+        self.methode = methode
+        self.onglet = onglet
+        self.debut = debut
+        self.duree_s = 0.0
+        self.statut = 200
+        self.taille = 0
+
+    def __repr__(self) -> str:
+        return (f"AppelAPI({self.methode}, {self.onglet}, statut={self.statut}, "
+                f"taille={self.taille}, {self.duree_s * 1000:.0f} ms)")
+
+
+# ========================================
+# CLIENT
+# ========================================
+
+class FauxClientGspread:
+    """Client gspread en mémoire (un seul classeur, quelle que soit la clé)."""
+
+    def __init__(
+        self,
+        feuilles: Optional[Dict] = None,
+        latence_s: float = 0.0,
+        gigue_s: float = 0.0,
+        requetes_par_fenetre: Optional[int] = None,
+        fenetre_s: float = 60.0,
+        taux_429: float = 0.0,
+        taux_5xx: float = 0.0,
+        graine: int = 0
+    ):
+        """
+        Args:
+            feuilles: {onglet: DataFrame | liste de dicts | liste de lignes
+                (la première = en-têtes)}
+            latence_s: Latence fixe de chaque requête (secondes)
+            gigue_s: Latence supplémentaire tirée entre 0 et gigue_s
+            requetes_par_fenetre: Quota (None = illimité) ; réponses 429 au-delà
+            fenetre_s: Fenêtre glissante du quota (60 s pour l'API réelle)
+            taux_429: Probabilité d'une réponse 429 hors quota
+            taux_5xx: Probabilité d'une réponse 503
+            graine: Graine des tirages (latence, échecs)
+        """
+        self.latence_s = latence_s
+        self.gigue_s = gigue_s
+        self.requetes_par_fenetre = requetes_par_fenetre
+        self.fenetre_s = fenetre_s
+        self.taux_429 = taux_429
+        self.taux_5xx = taux_5xx
+        self.journal: List[AppelAPI] = []
+        self.spreadsheet = FauxSpreadsheet(self, feuilles or {})
+
+        self._aleatoire = random.Random(graine)
+        self._fenetre: deque = deque()
+        self._echecs_programmes: Dict[str, deque] = {}
+        self._verrou = threading.Lock()
+
+    # ----------------------------------------
+    # API gspread
+    # ----------------------------------------
+
+    def open_by_key(self, key: str) -> 'FauxSpreadsheet':
+        with self.requete('open_by_key'):
+            return self.spreadsheet
+
+    # ----------------------------------------
+    # Simulation
+    # ----------------------------------------
+
+    def injecter_echec(self, methode: str, statut: int = 503, fois: int = 1) -> None:
+        """
+        Programme les `fois` prochains appels de `methode` en échec.
+
+        Args:
+            methode: Méthode gspread (ex. 'batch_update', '*' pour toutes)
+            statut: Code HTTP renvoyé (429, 500, 503...)
+            fois: Nombre d'appels concernés
+        """
+        with self._verrou:
+            self._echecs_programmes.setdefault(methode, deque()).extend([statut] * fois)
+
+    def _tirer_echec(self, methode: str, maintenant: float) -> Optional[int]:
+        """Statut d'erreur de cette requête (None = succès). Verrou tenu."""
+        for cle in (methode, '*'):
+            programmes = self._echecs_programmes.get(cle)
+            if programmes:
+                return programmes.popleft()
+
+        if self.requetes_par_fenetre is not None:
+            while self._fenetre and self._fenetre[0] <= maintenant - self.fenetre_s:
+                self._fenetre.popleft()
+            if len(self._fenetre) >= self.requetes_par_fenetre:
+                return 429
+            self._fenetre.append(maintenant)
+
+        tirage = self._aleatoire.random()
+        if tirage < self.taux_429:
+            return 429
+        if tirage < self.taux_429 + self.taux_5xx:
+            return 503
+        return None
+
+    def requete(self, methode: str, onglet: Optional[str] = None) -> '_Requete':
+        """Contexte d'une requête : latence, quota, échecs, journal."""
+        return _Requete(self, methode, onglet)
+
+    # ----------------------------------------
+    # Journal et inspection (sans requête)
+    # ----------------------------------------
+
+    def appels(self, methode: Optional[str] = None, onglet: Optional[str] = None) -> List[AppelAPI]:
+        """Appels journalisés, filtrés par méthode et/ou onglet."""
+        with self._verrou:
+            appels = list(self.journal)
+        return [
+            appel for appel in appels
+            if (methode is None or appel.methode == methode)
+            and (onglet is None or appel.onglet == onglet)
+        ]
+
+    def nb_appels(self, methode: Optional[str] = None, onglet: Optional[str] = None) -> int:
+        """Nombre de requêtes journalisées (échecs compris)."""
+        return len(self.appels(methode, onglet))
+
+    def resume_journal(self) -> pd.DataFrame:
+        """
+        Synthèse du journal.
+
+        Returns:
+            DataFrame (methode, onglet, appels, echecs, duree_s) trié par appels
+        """
+        appels = self.appels()
+        if not appels:
+            return pd.DataFrame(columns=['methode', 'onglet', 'appels', 'echecs', 'duree_s'])
+        df = pd.DataFrame([{
+            'methode': appel.methode,
+            'onglet': appel.onglet or '',
+            'echec': appel.statut != 200,
+            'duree_s': appel.duree_s
+        } for appel in appels])
+        return df.groupby(['methode', 'onglet'], as_index=False).agg(
+            appels=('echec', 'size'),
+            echecs=('echec', 'sum'),
+            duree_s=('duree_s', 'sum')
+        ).sort_values('appels', ascending=False, ignore_index=True)
+
+    def reinitialiser_journal(self) -> None:
+        with self._verrou:
+            self.journal.clear()
+
+    def valeurs(self, onglet: str) -> List[List[str]]:
+        """Contenu d'un onglet (copie, sans requête ni journal)."""
+        return self.spreadsheet.worksheet_sans_requete(onglet).valeurs()
+
+    def dataframe(self, onglet: str) -> pd.DataFrame:
+        """Contenu d'un onglet en DataFrame texte (sans requête ni journal)."""
+        valeurs = self.valeurs(onglet)
+        if not valeurs:
+            return pd.DataFrame()
+        return pd.DataFrame(valeurs[1:], columns=valeurs[0])
+
+
+class _Requete:
+    """Contexte d'une requête simulée (voir FauxClientGspread.requete)."""
+
+    def __init__(self, client: FauxClientGspread, methode: str, onglet: Optional[str]):
+        self.client = client
+        self.appel = AppelAPI(methode, onglet, time.perf_counter())
+
+    def __enter__(self) -> AppelAPI:
+        client = self.client
+        with client._verrou:
+            statut = client._tirer_echec(self.appel.methode, self.appel.debut)
+            latence = client.latence_s + (client._aleatoire.uniform(0, client.gigue_s) if client.gigue_s else 0)
+        # Latence hors verrou : les requêtes concurrentes se chevauchent
+        if latence:
+            time.sleep(latence)
+        if statut is not None:
+            self.appel.statut = statut
+            self._journaliser()
+            raise ErreurAPISimulee(statut, 'Quota exceeded' if statut == 429 else 'Service unavailable')
+        return self.appel
+
+    def __exit__(self, type_exc, exc, tb) -> bool:
+        if exc is not None:
+            self.appel.statut = getattr(exc, 'code', 400) if isinstance(exc, ErreurAPISimulee) else 400
+        self._journaliser()
+        return False
+
+    def _journaliser(self) -> None:
+        self.appel.duree_s = time.perf_counter() - self.appel.debut
+        with self.client._verrou:
+            self.client.journal.append(self.appel)
+
+
+# ========================================
+# CLASSEUR
+# ========================================
+
+class FauxSpreadsheet:
+    """Classeur en mémoire."""
+
+    def __init__(self, client: FauxClientGspread, feuilles: Dict):
+        self.client = client
+        self.id = 'faux-sheet'
+        self._onglets: Dict[str, FauxWorksheet] = {
+            titre: FauxWorksheet(self, titre, _grille(contenu))
+            for titre, contenu in feuilles.items()
+        }
+        self._derniere_modification = datetime.now()
+        self._verrou = threading.Lock()
+
+    def worksheet_sans_requete(self, title: str) -> 'FauxWorksheet':
+        with self._verrou:
+            ws = self._onglets.get(title)
+        if ws is None:
+            raise OngletIntrouvable(title)
+        return ws
+
+    def marquer_modification(self) -> None:
+        self._derniere_modification = datetime.now()
+
+    def worksheet(self, title: str) -> 'FauxWorksheet':
+        with self.client.requete('worksheet', title):
+            return self.worksheet_sans_requete(title)
+
+    def worksheets(self) -> List['FauxWorksheet']:
+        with self.client.requete('worksheets'):
+            with self._verrou:
+                return list(self._onglets.values())
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26) -> 'FauxWorksheet':
+        with self.client.requete('add_worksheet', title):
+            with self._verrou:
+                if title in self._onglets:
+                    raise ErreurAPISimulee(400, f"Onglet {title} déjà présent")
+                ws = FauxWorksheet(self, title, [])
+                self._onglets[title] = ws
+            self.marquer_modification()
+            return ws
+
+    def get_lastUpdateTime(self) -> str:
+        with self.client.requete('get_lastUpdateTime'):
+            return self._derniere_modification.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+# ========================================
+# ONGLET
+# ========================================
+
+class FauxWorksheet:
+    """Onglet en mémoire (cellules texte, lignes et colonnes numérotées à partir de 1)."""
+
+    def __init__(self, spreadsheet: FauxSpreadsheet, title: str, cellules: List[List[str]]):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self._cellules = cellules
+        self._verrou = threading.Lock()
+
+    def _requete(self, methode: str):
+        return self.spreadsheet.client.requete(methode, self.title)
+
+    # ----------------------------------------
+    # Grille (verrou tenu par l'appelant)
+    # ----------------------------------------
+
+    def valeurs(self) -> List[List[str]]:
+        """Grille utile : lignes vides de fin retirées, lignes complétées à la même largeur."""
+        with self._verrou:
+            lignes = [list(ligne) for ligne in self._cellules]
+        while lignes and not any(lignes[-1]):
+            lignes.pop()
+        largeur = max((self._largeur(ligne) for ligne in lignes), default=0)
+        return [(ligne + [''] * largeur)[:largeur] for ligne in lignes]
+
+    @staticmethod
+    def _largeur(ligne: List[str]) -> int:
+        largeur = len(ligne)
+        while largeur and ligne[largeur - 1] == '':
+            largeur -= 1
+        return largeur
+
+    def _ecrire(self, ligne: int, colonne: int, valeurs: List[List]) -> None:
+        for i, rangee in enumerate(valeurs):
+            numero = ligne - 1 + i
+            while len(self._cellules) <= numero:
+                self._cellules.append([])
+            cible = self._cellules[numero]
+            for j, valeur in enumerate(rangee):
+                indice = colonne - 1 + j
+                if len(cible) <= indice:
+                    cible.extend([''] * (indice + 1 - len(cible)))
+                cible[indice] = formater_cellule(valeur)
+
+    def _derniere_ligne(self) -> int:
+        derniere = len(self._cellules)
+        while derniere and not any(self._cellules[derniere - 1]):
+            derniere -= 1
+        return derniere
+
+    def _extraire(self, plage: str) -> List[List[str]]:
+        ligne, colonne, ligne_fin, colonne_fin = _plage(plage)
+        lignes = self._cellules[ligne - 1:ligne_fin]
+        extrait = [
+            [(rangee[j] if j < len(rangee) else '') for j in range(colonne - 1, colonne_fin)]
+            for rangee in lignes
+        ]
+        while extrait and not any(extrait[-1]):
+            extrait.pop()
+        return [rangee[:self._largeur(rangee)] for rangee in extrait]
+
+    # ----------------------------------------
+    # Lectures
+    # ----------------------------------------
+
+    def get_all_values(self) -> List[List[str]]:
+        with self._requete('get_all_values') as appel:
+            valeurs = self.valeurs()
+            appel.taille = len(valeurs)
+            return valeurs
+
+    def get_values(self, range_name: Optional[str] = None) -> List[List[str]]:
+        with self._requete('get_values') as appel:
+            if range_name is None:
+                valeurs = self.valeurs()
+            else:
+                with self._verrou:
+                    valeurs = self._extraire(range_name)
+            appel.taille = len(valeurs)
+            return valeurs
+
+    def get_all_records(self, head: int = 1) -> List[Dict]:
+        with self._requete('get_all_records') as appel:
+            valeurs = self.valeurs()
+            appel.taille = max(len(valeurs) - head, 0)
+            if len(valeurs) < head:
+                return []
+            entetes = valeurs[head - 1]
+            return [
+                dict(zip(entetes, (numeriser(valeur) for valeur in ligne)))
+                for ligne in valeurs[head:]
+            ]
+
+    def row_values(self, row: int) -> List[str]:
+        with self._requete('row_values'):
+            with self._verrou:
+                ligne = list(self._cellules[row - 1]) if row <= len(self._cellules) else []
+            return ligne[:self._largeur(ligne)]
+
+    def col_values(self, col: int) -> List[str]:
+        with self._requete('col_values') as appel:
+            with self._verrou:
+                colonne = [ligne[col - 1] if col <= len(ligne) else '' for ligne in self._cellules]
+            while colonne and colonne[-1] == '':
+                colonne.pop()
+            appel.taille = len(colonne)
+            return colonne
+
+    def find(self, query: str, in_row: Optional[int] = None, in_column: Optional[int] = None):
+        with self._requete('find'):
+            with self._verrou:
+                for i, ligne in enumerate(self._cellules, start=1):
+                    if in_row is not None and i != in_row:
+                        continue
+                    for j, valeur in enumerate(ligne, start=1):
+                        if (in_column is None or j == in_column) and valeur == str(query):
+                            return SimpleNamespace(row=i, col=j, value=valeur)
+            return None
+
+    def batch_get(self, ranges: List[str]) -> List[List[List[str]]]:
+        with self._requete('batch_get') as appel:
+            with self._verrou:
+                resultats = [self._extraire(plage) for plage in ranges]
+            appel.taille = sum(len(valeurs) for valeurs in resultats)
+            return resultats
+
+    # ----------------------------------------
+    # Écritures
+    # ----------------------------------------
+
+    def update_cell(self, row: int, col: int, value) -> None:
+        with self._requete('update_cell') as appel:
+            with self._verrou:
+                self._ecrire(row, col, [[value]])
+            appel.taille = 1
+            self.spreadsheet.marquer_modification()
+
+    def update(self, range_name: str, values: List[List]) -> None:
+        with self._requete('update') as appel:
+            ligne, colonne, _, _ = _plage(range_name)
+            with self._verrou:
+                self._ecrire(ligne, colonne, values)
+            appel.taille = len(values)
+            self.spreadsheet.marquer_modification()
+
+    def batch_update(self, data: List[Dict]) -> None:
+        with self._requete('batch_update') as appel:
+            with self._verrou:
+                for bloc in data:
+                    ligne, colonne, _, _ = _plage(bloc['range'])
+                    self._ecrire(ligne, colonne, bloc['values'])
+            appel.taille = sum(len(bloc['values']) for bloc in data)
+            self.spreadsheet.marquer_modification()
+
+    def append_row(self, values: List) -> None:
+        with self._requete('append_row') as appel:
+            with self._verrou:
+                self._ecrire(self._derniere_ligne() + 1, 1, [values])
+            appel.taille = 1
+            self.spreadsheet.marquer_modification()
+
+    def append_rows(self, values: List[List]) -> None:
+        with self._requete('append_rows') as appel:
+            with self._verrou:
+                self._ecrire(self._derniere_ligne() + 1, 1, values)
+            appel.taille = len(values)
+            self.spreadsheet.marquer_modification()
+
+    def clear(self) -> None:
+        with self._requete('clear'):
+            with self._verrou:
+                self._cellules = []
+            self.spreadsheet.marquer_modification()
+
+    def batch_clear(self, ranges: List[str]) -> None:
+        with self._requete('batch_clear'):
+            with self._verrou:
+                for plage in ranges:
+                    ligne, colonne, ligne_fin, colonne_fin = _plage(plage)
+                    vides = [[''] * (colonne_fin - colonne + 1)] * (ligne_fin - ligne + 1)
+                    self._ecrire(ligne, colonne, vides)
+            self.spreadsheet.marquer_modification()
+
+    def delete_rows(self, start_index: int, end_index: Optional[int] = None) -> None:
+        with self._requete('delete_rows') as appel:
+            fin = end_index if end_index is not None else start_index
+            with self._verrou:
+                del self._cellules[start_index - 1:fin]
+            appel.taille = fin - start_index + 1
+            self.spreadsheet.marquer_modification()
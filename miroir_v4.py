@@ -0,0 +1,396 @@
+"""
+Miroir Local V4 - Démarrage rapide hors Google Sheets
+======================================================
+
+Copie locale SQLite du dernier état connu du Google Sheet :
+- les lectures sont servies immédiatement depuis le miroir
+- la réconciliation avec le stockage distant tourne en arrière-plan
+- seules les lignes modifiées sont réécrites dans le miroir
+- si le distant est injoignable, le miroir reste la source de lecture
+- chaque feuille est synchronisée séparément : une feuille en échec
+  garde sa dernière copie sans bloquer les autres (erreur par feuille)
+
+Remarque : l'API Sheets ne permet pas de lire "les lignes modifiées
+depuis X". Le marqueur de révision (date de modification Drive) évite
+tout téléchargement quand rien n'a changé ; sinon les feuilles sont
+relues puis comparées ligne à ligne avant application au miroir.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from storage_v4 import (
+    StorageBackend, SheetsBackend, SQLiteBackend, ErreurStockage,
+    FEUILLES, COLONNES_ID, FEUILLE_PROJETS, FEUILLE_PLANIFICATION,
+    COLONNES_PLANIFICATION
+)
+
+
+META_REVISION = 'revision_distante'
+META_SYNCHRONISATION = 'derniere_synchronisation'
+
+# Feuilles facultatives : absentes (ou vides) du classeur, elles sont
+# répliquées vides avec leurs colonnes, comme hors miroir
+# (DataManagerV4.get_planification_hebdo)
+COLONNES_TABLES_OPTIONNELLES = {
+    FEUILLE_PLANIFICATION: COLONNES_PLANIFICATION
+}
+
+
+# ========================================
+# COMPARAISON DE LIGNES
+# ========================================
+
+def _empreintes(df: pd.DataFrame, colonne_id: str) -> pd.Series:
+    """Empreinte de chaque ligne (valeurs converties en texte), indexée par ID."""
+    texte = df.astype(str)
+    empreintes = pd.util.hash_pandas_object(texte, index=False)
+    empreintes.index = texte[colonne_id].values
+    return empreintes
+
+
+def calculer_delta(
+    local: pd.DataFrame,
+    distant: pd.DataFrame,
+    colonne_id: str
+) -> Optional[Dict]:
+    """
+    Compare deux versions d'une feuille identifiée par `colonne_id`.
+
+    Args:
+        local: Contenu actuel du miroir
+        distant: Contenu du stockage distant
+        colonne_id: Colonne identifiant
+
+    Returns:
+        Dict {'lignes': DataFrame à insérer/modifier, 'supprimes': [ids]},
+        ou None si un remplacement complet est nécessaire (colonnes
+        différentes, identifiants dupliqués, lignes réordonnées).
+    """
+    if list(local.columns) != list(distant.columns) or colonne_id not in distant.columns:
+        return None
+
+    ids_local = local[colonne_id].astype(str)
+    ids_distant = distant[colonne_id].astype(str)
+    if ids_local.duplicated().any() or ids_distant.duplicated().any():
+        return None
+
+    supprimes = ids_local[~ids_local.isin(ids_distant)]
+    nouveaux = ids_distant[~ids_distant.isin(ids_local)]
+
+    # Le miroir ajoute les nouvelles lignes en fin de table :
+    # l'ordre distant doit être "anciennes lignes puis nouvelles"
+    anciens_distant = ids_distant[ids_distant.isin(ids_local)].tolist()
+    anciens_local = ids_local[~ids_local.isin(supprimes)].tolist()
+    if anciens_distant != anciens_local:
+        return None
+    if len(nouveaux) and ids_distant.tail(len(nouveaux)).tolist() != nouveaux.tolist():
+        return None
+
+    emp_local = _empreintes(local.assign(**{colonne_id: ids_local}), colonne_id)
+    emp_distant = _empreintes(distant.assign(**{colonne_id: ids_distant}), colonne_id)
+    communs = emp_distant.index.intersection(emp_local.index)
+    modifies = communs[emp_distant[communs].values != emp_local[communs].values]
+
+    a_ecrire = ids_distant.isin(modifies) | ids_distant.isin(nouveaux)
+    return {
+        'lignes': distant[a_ecrire.values],
+        'supprimes': local.loc[supprimes.index, colonne_id].tolist()
+    }
+
+
+# ========================================
+# BACKEND MIROIR
+# ========================================
+
+class MiroirBackend(StorageBackend):
+    """
+    Backend lisant un miroir SQLite local, synchronisé avec un backend distant.
+
+    Le backend distant est construit paresseusement (authentification
+    Google comprise) par le thread de synchronisation, pour que le
+    premier affichage ne l'attende pas.
+    """
+
+    nom = 'Miroir local'
+
+    def __init__(
+        self,
+        fabrique_distant: Callable[[], StorageBackend],
+        chemin_miroir: str,
+        tables: Optional[List[str]] = None,
+        synchroniser_en_fond: bool = True
+    ):
+        """
+        Ouvre le miroir et lance la réconciliation.
+
+        Args:
+            fabrique_distant: Fonction construisant le backend distant
+            chemin_miroir: Fichier SQLite du miroir
+            tables: Feuilles répliquées (défaut : toutes)
+            synchroniser_en_fond: Réconcilier dans un thread (sinon bloquant)
+
+        Raises:
+            ErreurStockage: si le miroir est vide et le distant injoignable
+        """
+        self.fabrique_distant = fabrique_distant
+        self.local = SQLiteBackend(chemin_miroir)
+        self.tables = tables or FEUILLES
+        self.distant: Optional[StorageBackend] = None
+        self.derniere_erreur: Optional[str] = None
+        self.erreurs_tables: Dict[str, str] = {}
+        self._verrou_distant = threading.Lock()
+        self._verrou_sync = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        if not self._miroir_complet():
+            # Premier démarrage : rien à servir, synchronisation bloquante
+            self.synchroniser()
+            if not self._miroir_complet():
+                raise ErreurStockage(
+                    f"Miroir vide et stockage distant injoignable : {self.derniere_erreur}"
+                )
+        elif synchroniser_en_fond:
+            self.synchroniser_en_fond()
+        else:
+            self.synchroniser()
+
+    # ----------------------------------------
+    # Synchronisation
+    # ----------------------------------------
+
+    def _miroir_complet(self) -> bool:
+        """Toutes les feuilles indispensables sont présentes dans le miroir."""
+        return all(
+            self.local.colonnes_table(t) for t in self.tables
+            if t not in COLONNES_TABLES_OPTIONNELLES
+        )
+
+    def _obtenir_distant(self) -> StorageBackend:
+        with self._verrou_distant:
+            if self.distant is None:
+                self.distant = self.fabrique_distant()
+            return self.distant
+
+    def synchroniser(self) -> bool:
+        """
+        Réconcilie le miroir avec le stockage distant.
+
+        Une feuille en échec garde sa copie précédente (erreur dans
+        erreurs_tables) ; la révision n'est alors pas enregistrée, pour
+        que la synchronisation suivante la relise.
+
+        Returns:
+            True si toutes les feuilles sont à jour, False sinon
+        """
+        with self._verrou_sync:
+            try:
+                distant = self._obtenir_distant()
+                revision = distant.revision()
+            except Exception as e:
+                self.derniere_erreur = str(e)
+                print(f"⚠️ Synchronisation miroir impossible, lecture locale : {str(e)}")
+                return False
+
+            if revision is not None and revision == self.local.lire_meta(META_REVISION) \
+                    and self._miroir_complet():
+                self._marquer_synchronise(revision)
+                print("✅ Miroir à jour (révision inchangée)")
+                return True
+
+            resume, erreurs = {}, {}
+            for table in self.tables:
+                try:
+                    resume[table] = self._synchroniser_table(distant, table)
+                except Exception as e:
+                    erreurs[table] = str(e)
+
+            self.erreurs_tables = erreurs
+            if erreurs:
+                self.derniere_erreur = '; '.join(f"{table} : {erreur}" for table, erreur in erreurs.items())
+                print(f"⚠️ Miroir partiellement synchronisé {resume}, "
+                      f"copie locale conservée pour : {self.derniere_erreur}")
+                self.local.ecrire_meta(META_SYNCHRONISATION, datetime.now().isoformat())
+                return False
+
+            self._marquer_synchronise(revision)
+            print(f"✅ Miroir synchronisé : {resume}")
+            return True
+
+    def _marquer_synchronise(self, revision: Optional[str]) -> None:
+        self.local.ecrire_meta(META_REVISION, revision)
+        self.local.ecrire_meta(META_SYNCHRONISATION, datetime.now().isoformat())
+        self.derniere_erreur = None
+        self.erreurs_tables = {}
+
+    def _lire_distant(self, distant: StorageBackend, table: str) -> pd.DataFrame:
+        """Lit une feuille distante ; une feuille facultative absente est lue vide."""
+        colonnes = COLONNES_TABLES_OPTIONNELLES.get(table)
+        try:
+            if isinstance(distant, SheetsBackend):
+                # Pas de repli sur une lecture précédente : l'échec doit
+                # rester visible (erreurs_tables, révision non enregistrée)
+                df = distant.lire_table(table, repli=False)
+            else:
+                df = distant.lire_table(table)
+        except Exception:
+            if colonnes is None or table in distant.lister_tables():
+                raise
+            print(f"⚠️ Feuille {table} absente du stockage distant : répliquée vide")
+            return pd.DataFrame(columns=colonnes)
+        if colonnes is not None and len(df.columns) == 0:
+            return pd.DataFrame(columns=colonnes)
+        return df
+
+    def _synchroniser_table(self, distant: StorageBackend, table: str) -> str:
+        """Applique au miroir les changements d'une feuille ; renvoie un résumé."""
+        df_distant = self._lire_distant(distant, table)
+
+        if table in COLONNES_ID and self.local.colonnes_table(table):
+            delta = calculer_delta(
+                self.local.lire_table(table), df_distant, COLONNES_ID[table]
+            )
+            if delta is not None:
+                if len(delta['lignes']) or delta['supprimes']:
+                    self.local.appliquer_delta(table, delta['lignes'], delta['supprimes'])
+                return f"{len(delta['lignes'])} maj, {len(delta['supprimes'])} suppr"
+
+        self.local.importer_table(table, df_distant)
+        return f"{len(df_distant)} lignes"
+
+    def synchroniser_en_fond(self) -> None:
+        """Lance une réconciliation dans un thread (ignoré si une est en cours)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self.synchroniser,
+            name='pmo-miroir-sync',
+            daemon=True
+        )
+        self._thread.start()
+
+    def etat(self) -> Dict:
+        """
+        État du miroir.
+
+        Returns:
+            Dict avec revision, derniere_synchronisation, en_cours, erreur,
+            erreurs_tables ({feuille: erreur} de la dernière synchronisation)
+        """
+        return {
+            'revision': self.local.lire_meta(META_REVISION),
+            'derniere_synchronisation': self.local.lire_meta(META_SYNCHRONISATION),
+            'en_cours': self._thread is not None and self._thread.is_alive(),
+            'erreur': self.derniere_erreur,
+            'erreurs_tables': dict(self.erreurs_tables)
+        }
+
+    # ----------------------------------------
+    # Lecture (miroir)
+    # ----------------------------------------
+
+    def lire_table(self, table: str) -> pd.DataFrame:
+        return self.local.lire_table(table)
+
+    def lire_par_id(self, table: str, valeur: str) -> pd.DataFrame:
+        return self.local.lire_par_id(table, valeur)
+
+    def lire_filtre(
+        self,
+        table: str,
+        colonne: str,
+        valeurs: List,
+        inclure_vides: bool = False
+    ) -> pd.DataFrame:
+        return self.local.lire_filtre(table, colonne, valeurs, inclure_vides)
+
+    # ----------------------------------------
+    # Écriture (distant puis miroir)
+    # ----------------------------------------
+
+    def affecter_projet(self, projet_id: str, chef_id: str) -> None:
+        self._obtenir_distant().affecter_projet(projet_id, chef_id)
+        if FEUILLE_PROJETS in self.tables:
+            self.local.affecter_projet(projet_id, chef_id)
+
+    def affecter_projets(self, affectations: List[Tuple[str, str]]) -> Dict[str, Optional[str]]:
+        resultats = self._obtenir_distant().affecter_projets(affectations)
+        if FEUILLE_PROJETS in self.tables:
+            self.local.affecter_projets([
+                (projet_id, chef_id) for projet_id, chef_id in affectations
+                if resultats.get(projet_id) is None
+            ])
+        return resultats
+
+    def mettre_a_jour_cellules(self, table: str, cellules: List[Tuple[str, str, object]]) -> int:
+        nb = self._obtenir_distant().mettre_a_jour_cellules(table, cellules)
+        if table in self.tables:
+            self.local.mettre_a_jour_cellules(table, cellules)
+        return nb
+
+    def sauvegarder_planification(self, planning_df: pd.DataFrame) -> None:
+        self._obtenir_distant().sauvegarder_planification(planning_df)
+        if FEUILLE_PLANIFICATION in self.tables:
+            self.local.sauvegarder_planification(planning_df)
+
+    def appliquer_diff_planification(self, diff) -> None:
+        self._obtenir_distant().appliquer_diff_planification(diff)
+        if FEUILLE_PLANIFICATION in self.tables:
+            self.local.appliquer_diff_planification(diff)
+
+    def ajouter_planification(self, planning_df: pd.DataFrame, remplacer: bool = False) -> None:
+        self._obtenir_distant().ajouter_planification(planning_df, remplacer)
+        if FEUILLE_PLANIFICATION in self.tables:
+            self.local.ajouter_planification(planning_df, remplacer)
+
+    def lister_tables(self) -> List[str]:
+        return self.local.lister_tables()
+
+    def reconnecter(self) -> None:
+        with self._verrou_distant:
+            distant = self.distant
+        if distant is not None:
+            distant.reconnecter()
+        self.synchroniser_en_fond()
+
+    def revision(self) -> Optional[str]:
+        return self.local.lire_meta(META_REVISION)
+
+    def metriques(self) -> Dict:
+        return self.distant.metriques() if self.distant is not None else {}
+
+    def description(self) -> str:
+        return f"{self.local.description()} (miroir)"
+
+
+# ========================================
+# REGISTRE PROCESSUS
+# ========================================
+
+_MIROIRS: Dict[str, MiroirBackend] = {}
+_VERROU_MIROIRS = threading.Lock()
+
+
+def obtenir_miroir(
+    fabrique_distant: Callable[[], StorageBackend],
+    chemin_miroir: str
+) -> MiroirBackend:
+    """
+    Renvoie le miroir partagé du processus pour `chemin_miroir`.
+
+    Un seul miroir (et un seul thread de synchronisation) par fichier,
+    quel que soit le nombre de sessions Streamlit.
+    """
+    with _VERROU_MIROIRS:
+        miroir = _MIROIRS.get(chemin_miroir)
+        if miroir is None:
+            miroir = MiroirBackend(fabrique_distant, chemin_miroir)
+            _MIROIRS[chemin_miroir] = miroir
+        return miroir
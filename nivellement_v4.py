@@ -0,0 +1,307 @@
+"""
+Nivellement V4 - Lissage de charge par décalage des dates de début
+===================================================================
+
+Propose de décaler Date_Debut (par semaines entières, dans une marge
+autorisée) des projets non démarrés ou non affectés pour aplanir la
+courbe de charge hebdomadaire de chaque chef.
+
+Heuristique gloutonne sur la matrice chefs × semaines (charge_v4) :
+1. charge de base = projets fixes (déjà démarrés)
+2. projets mobiles placés un par un, du plus lourd au plus léger,
+   au décalage qui ajoute le moins d'heures au-delà du plafond, puis
+   qui minimise la charge déjà présente sur la fenêtre (critère de
+   Burgess : somme des carrés), puis le plus petit décalage
+3. passes d'amélioration : chaque projet est retiré puis replacé
+4. garde-fou : un chef dont les heures au-delà du plafond augmenteraient
+   sur l'horizon garde ses dates d'origine (l'heuristique gloutonne ne
+   garantit pas seule ce non-recul)
+
+Chaque placement ne met à jour que la ligne du chef concerné.
+
+Les heures de surcharge ne peuvent que baisser ; le nombre de semaines
+en surcharge, lui, peut augmenter (surcharge étalée sur plus de
+semaines).
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from algorithme_v4 import HEURES_SEMAINE_PLAFOND
+from charge_v4 import MatriceCharge, charge_h_projets
+from planification_v4 import grille_semaines, projets_planifiables, CHEFS_NON_AFFECTES
+from schema_v4 import modifiable
+from tracage_v4 import mesure, ALGORITHME
+
+
+# ========================================
+# CONSTANTES
+# ========================================
+
+# Décalage maximal par défaut (semaines, avant ou après)
+MARGE_DEFAUT_SEMAINES = 4
+
+# Colonne optionnelle donnant la marge propre à chaque projet
+COLONNE_MARGE = 'Marge_Semaines'
+
+NB_PASSES_DEFAUT = 3
+
+
+# ========================================
+# RÉSULTAT
+# ========================================
+
+class ResultatNivellement:
+    """
+    Propositions de décalage et matrices de charge avant / après.
+
+    Attributs:
+        propositions: DataFrame ID_Projet, Chef_ID, Date_Debut,
+            Nouvelle_Date_Debut, Date_Fin_Prev, Nouvelle_Date_Fin,
+            Decalage_Semaines, Charge_H (projets décalés uniquement)
+        avant: MatriceCharge sans décalage
+        apres: MatriceCharge avec les décalages proposés
+    """
+
+    def __init__(self, propositions: pd.DataFrame, avant: MatriceCharge, apres: MatriceCharge):
+        self.propositions = propositions
+        self.avant = avant
+        self.apres = apres
+
+    def resume(self) -> Dict:
+        """
+        Indicateurs avant / après sur l'horizon.
+
+        heures_surcharge_apres <= heures_surcharge_avant ; en revanche
+        semaines_surcharge_apres peut dépasser semaines_surcharge_avant
+        (moins d'heures au-delà du plafond, réparties sur plus de semaines).
+
+        Returns:
+            Dict avec projets_decales, pic_avant_h, pic_apres_h,
+            semaines_surcharge_avant/apres, heures_surcharge_avant/apres
+        """
+        def _indicateurs(valeurs: np.ndarray):
+            exces = np.maximum(valeurs - HEURES_SEMAINE_PLAFOND, 0)
+            pic = float(valeurs.max()) if valeurs.size else 0.0
+            return round(pic, 1), int((exces > 0).sum()), round(float(exces.sum()), 1)
+
+        pic_avant, semaines_avant, heures_avant = _indicateurs(self.avant.valeurs)
+        pic_apres, semaines_apres, heures_apres = _indicateurs(self.apres.valeurs)
+        return {
+            'projets_decales': len(self.propositions),
+            'pic_avant_h': pic_avant,
+            'pic_apres_h': pic_apres,
+            'semaines_surcharge_avant': semaines_avant,
+            'semaines_surcharge_apres': semaines_apres,
+            'heures_surcharge_avant': heures_avant,
+            'heures_surcharge_apres': heures_apres
+        }
+
+    def appliquer(self, projets_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Copie des projets avec les dates proposées (simulation).
+
+        Args:
+            projets_df: DataFrame projets d'origine
+
+        Returns:
+            Nouveau DataFrame (Date_Debut / Date_Fin_Prev décalées)
+        """
+        resultat = projets_df.copy()
+        if len(self.propositions) == 0:
+            return resultat
+        nouvelles = self.propositions.set_index('ID_Projet')
+        cibles = resultat['ID_Projet'].isin(nouvelles.index)
+        ids = resultat.loc[cibles, 'ID_Projet']
+        resultat['Date_Debut'] = pd.to_datetime(resultat['Date_Debut'])
+        resultat['Date_Fin_Prev'] = pd.to_datetime(resultat['Date_Fin_Prev'])
+        resultat.loc[cibles, 'Date_Debut'] = nouvelles.loc[ids, 'Nouvelle_Date_Debut'].to_numpy()
+        resultat.loc[cibles, 'Date_Fin_Prev'] = nouvelles.loc[ids, 'Nouvelle_Date_Fin'].to_numpy()
+        return resultat
+
+    def __repr__(self) -> str:
+        return f"ResultatNivellement({self.resume()})"
+
+
+# ========================================
+# NIVELLEMENT
+# ========================================
+
+def _intervalles_relatifs(projets: pd.DataFrame, origine: np.datetime64):
+    """
+    Semaines actives de chaque projet, en indices relatifs à `origine`.
+
+    Contrairement à intervalles_semaines, les indices ne sont pas bornés
+    à la grille : un projet démarré avant la semaine 0 garde une première
+    semaine négative, ce qui rend les décalages exacts.
+    """
+    semaine = np.timedelta64(7, 'D').astype('timedelta64[ns]')
+    debut = pd.to_datetime(projets['Date_Debut']).to_numpy(dtype='datetime64[ns]')
+    fin = pd.to_datetime(projets['Date_Fin_Prev']).to_numpy(dtype='datetime64[ns]')
+    premiere = -np.floor_divide(-(debut - origine), semaine)
+    derniere = np.floor_divide(fin - origine, semaine)
+    return premiere.astype('int64'), derniere.astype('int64')
+
+
+@mesure(ALGORITHME)
+def niveler_charge(
+    projets_df: pd.DataFrame,
+    nb_semaines: int = 26,
+    date_reference: Optional[datetime] = None,
+    marge_semaines: int = MARGE_DEFAUT_SEMAINES,
+    affectations: Optional[Dict[str, str]] = None,
+    plafond_h: float = HEURES_SEMAINE_PLAFOND,
+    nb_passes: int = NB_PASSES_DEFAUT
+) -> ResultatNivellement:
+    """
+    Propose des décalages de Date_Debut pour lisser la charge des chefs.
+
+    Projets mobiles : projets planifiés dont Date_Debut est postérieure à
+    la date de référence, et projets non affectés pour lesquels
+    `affectations` propose un chef. Un projet n'est jamais avancé avant
+    la date de référence ; sa durée est conservée. Les heures au-delà
+    du plafond sur l'horizon n'augmentent pour aucun chef.
+
+    Args:
+        projets_df: DataFrame projets (typé par DataManagerV4)
+        nb_semaines: Horizon évalué (semaines)
+        date_reference: Date de la semaine 0 (défaut : maintenant)
+        marge_semaines: Décalage maximal, sauf colonne Marge_Semaines
+        affectations: {ID_Projet: ID_Chef} proposés pour les non affectés
+        plafond_h: Plafond hebdomadaire (h)
+        nb_passes: Nombre maximal de passes d'amélioration
+
+    Returns:
+        ResultatNivellement
+    """
+    if date_reference is None:
+        date_reference = datetime.today()
+    reference = pd.Timestamp(date_reference)
+
+    projets = modifiable(projets_df.copy(), 'Chef_Affecte')
+    mobiles_non_affectes = pd.Series(False, index=projets.index)
+    if affectations and 'Chef_Affecte' in projets.columns:
+        chef = projets['Chef_Affecte']
+        sans_chef = chef.isna() | chef.isin(CHEFS_NON_AFFECTES)
+        propose = projets['ID_Projet'].map(affectations)
+        mobiles_non_affectes = sans_chef & propose.notna()
+        projets.loc[mobiles_non_affectes, 'Chef_Affecte'] = propose[mobiles_non_affectes]
+
+    planifiables = projets_planifiables(projets)
+    debut = pd.to_datetime(planifiables['Date_Debut'])
+    mobile = (debut > reference) | mobiles_non_affectes.loc[planifiables.index]
+
+    # La grille couvre l'horizon plus la marge : un projet repoussé reste évalué
+    semaines = grille_semaines(nb_semaines + max(marge_semaines, 0), date_reference)
+    dates = semaines['Date'].to_numpy(dtype='datetime64[ns]')
+    chefs = pd.unique(planifiables['Chef_Affecte'].to_numpy(dtype=object))
+
+    fixes = planifiables[~mobile]
+    mobiles = planifiables[mobile]
+    matrice = MatriceCharge.depuis_projets(fixes, semaines=semaines, chefs=list(chefs))
+    charge = matrice.valeurs.copy()
+    nb = charge.shape[1]
+
+    # Caractéristiques des projets mobiles
+    premiere, derniere = _intervalles_relatifs(mobiles, dates[0])
+    heures = charge_h_projets(mobiles)
+    i_chef = matrice.chefs.get_indexer(mobiles['Chef_Affecte'])
+    semaines_avant_ref = np.floor(
+        (pd.to_datetime(mobiles['Date_Debut']) - reference).dt.days.to_numpy() / 7
+    ).astype('int64')
+    if COLONNE_MARGE in mobiles.columns:
+        marges = pd.to_numeric(mobiles[COLONNE_MARGE], errors='coerce') \
+            .fillna(marge_semaines).clip(lower=0).to_numpy(dtype='int64')
+    else:
+        marges = np.full(len(mobiles), marge_semaines, dtype='int64')
+    # Jamais avant la référence (décalage nul toujours permis)
+    decalage_min = np.minimum(0, np.maximum(-marges, -semaines_avant_ref))
+    decalage_max = marges
+
+    def _fenetre(k: int, d: int):
+        return max(premiere[k] + d, 0), min(derniere[k] + d + 1, nb)
+
+    def _meilleur_decalage(k: int) -> int:
+        longueur = derniere[k] - premiere[k] + 1
+        decalages = np.arange(decalage_min[k], decalage_max[k] + 1)
+        if longueur <= 0 or heures[k] == 0 or len(decalages) == 1:
+            return 0
+        ligne = charge[i_chef[k]]
+        # Semaines hors grille : charge moyenne du chef (neutre, évite de
+        # "cacher" un projet au-delà de l'horizon)
+        moyenne = ligne.mean()
+        idx = (premiere[k] + decalages)[:, None] + np.arange(longueur)[None, :]
+        dans_grille = (idx >= 0) & (idx < nb)
+        fenetres = np.where(dans_grille, ligne[np.clip(idx, 0, nb - 1)], moyenne)
+
+        exces_ajoute = (
+            np.maximum(fenetres + heures[k] - plafond_h, 0) - np.maximum(fenetres - plafond_h, 0)
+        ).sum(axis=1)
+        deja_charge = fenetres.sum(axis=1)
+        ordre = np.lexsort((np.abs(decalages), np.round(deja_charge, 6), np.round(exces_ajoute, 6)))
+        return int(decalages[ordre[0]])
+
+    def _ajouter(k: int, d: int, signe: float) -> None:
+        a, b = _fenetre(k, d)
+        if a < b:
+            charge[i_chef[k], a:b] += signe * heures[k]
+
+    # Placement initial : du plus lourd (heures × durée) au plus léger
+    volume = heures * np.maximum(derniere - premiere + 1, 0)
+    ordre = np.argsort(-volume, kind='stable')
+    decalages = np.zeros(len(mobiles), dtype='int64')
+    for k in ordre:
+        decalages[k] = _meilleur_decalage(k)
+        _ajouter(k, decalages[k], 1)
+
+    # Passes d'amélioration
+    for _ in range(max(nb_passes - 1, 0)):
+        changements = 0
+        for k in ordre:
+            _ajouter(k, decalages[k], -1)
+            nouveau = _meilleur_decalage(k)
+            changements += nouveau != decalages[k]
+            decalages[k] = nouveau
+            _ajouter(k, decalages[k], 1)
+        if changements == 0:
+            break
+
+    # Garde-fou : un chef dont la surcharge sur l'horizon augmenterait garde ses dates
+    avant = MatriceCharge.depuis_projets(planifiables, semaines=semaines, chefs=list(matrice.chefs))
+
+    def _exces(valeurs: np.ndarray) -> np.ndarray:
+        return np.maximum(valeurs[:, :nb_semaines] - plafond_h, 0).sum(axis=1)
+
+    degrades = np.flatnonzero(_exces(charge) > _exces(avant.valeurs) + 1e-6)
+    for k in np.flatnonzero(np.isin(i_chef, degrades) & (decalages != 0)):
+        _ajouter(k, decalages[k], -1)
+        decalages[k] = 0
+        _ajouter(k, 0, 1)
+
+    # Matrices restreintes à l'horizon demandé
+    horizon = semaines.iloc[:nb_semaines]
+    avant = MatriceCharge(avant.chefs, horizon, avant.valeurs[:, :nb_semaines])
+    apres = MatriceCharge(matrice.chefs, horizon, charge[:, :nb_semaines])
+
+    decales = decalages != 0
+    propositions = mobiles[decales]
+    delta = pd.to_timedelta(decalages[decales] * 7, unit='D')
+    propositions = pd.DataFrame({
+        'ID_Projet': propositions['ID_Projet'].to_numpy(),
+        'Chef_ID': propositions['Chef_Affecte'].to_numpy(),
+        'Date_Debut': pd.to_datetime(propositions['Date_Debut']).to_numpy(),
+        'Nouvelle_Date_Debut': (pd.to_datetime(propositions['Date_Debut']) + delta).to_numpy(),
+        'Date_Fin_Prev': pd.to_datetime(propositions['Date_Fin_Prev']).to_numpy(),
+        'Nouvelle_Date_Fin': (pd.to_datetime(propositions['Date_Fin_Prev']) + delta).to_numpy(),
+        'Decalage_Semaines': decalages[decales],
+        'Charge_H': heures[decales]
+    })
+
+    return ResultatNivellement(propositions, avant, apres)
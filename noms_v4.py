@@ -0,0 +1,101 @@
+"""
+Noms V4 - Résolution des noms clients et chefs
+===============================================
+
+Tables de correspondance ID → nom construites une fois par chargement
+(une Series par feuille) puis appliquées par colonne avec `map` :
+aucun appel au stockage par ligne affichée.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+from typing import Dict, Optional
+
+import pandas as pd
+
+
+class ResolveurNoms:
+    """
+    Correspondances ID_Chef → Nom_Prenom et ID_Client → Nom_Client.
+
+    Un ID inconnu est affiché tel quel (même règle que les pages).
+    """
+
+    def __init__(self, chefs: pd.DataFrame, clients: pd.DataFrame):
+        """
+        Args:
+            chefs: DataFrame chefs (ID_Chef, Nom_Prenom)
+            clients: DataFrame clients (ID_Client, Nom_Client, Chef_Favori...)
+        """
+        self.noms_par_chef = self._correspondance(chefs, 'ID_Chef', 'Nom_Prenom')
+        self.noms_par_client = self._correspondance(clients, 'ID_Client', 'Nom_Client')
+        # Lignes clients complètes (chef favori...), première occurrence par ID
+        if 'ID_Client' in clients.columns:
+            self._lignes_clients = clients.drop_duplicates('ID_Client').set_index('ID_Client', drop=False)
+        else:
+            self._lignes_clients = pd.DataFrame()
+
+    @staticmethod
+    def _correspondance(df: pd.DataFrame, colonne_id: str, colonne_nom: str) -> pd.Series:
+        if colonne_id not in df.columns or colonne_nom not in df.columns:
+            return pd.Series(dtype=object)
+        uniques = df.drop_duplicates(colonne_id)
+        return pd.Series(uniques[colonne_nom].to_numpy(), index=uniques[colonne_id].to_numpy())
+
+    # ----------------------------------------
+    # Valeurs isolées
+    # ----------------------------------------
+
+    def nom_chef(self, chef_id) -> str:
+        """Nom du chef (ID si inconnu)."""
+        return self.noms_par_chef.get(chef_id, chef_id)
+
+    def nom_client(self, client_id) -> str:
+        """Nom du client (ID si inconnu)."""
+        return self.noms_par_client.get(client_id, client_id)
+
+    def client(self, client_id) -> Optional[Dict]:
+        """Ligne complète du client, ou None (équivalent get_client_by_id)."""
+        if client_id not in self._lignes_clients.index:
+            return None
+        return self._lignes_clients.loc[client_id].to_dict()
+
+    # ----------------------------------------
+    # Colonnes
+    # ----------------------------------------
+
+    def noms_chefs(self, ids: pd.Series) -> pd.Series:
+        """Noms des chefs d'une colonne d'IDs (un seul map)."""
+        ids = ids.astype(object)
+        return ids.map(self.noms_par_chef).fillna(ids)
+
+    def noms_clients(self, ids: pd.Series) -> pd.Series:
+        """Noms des clients d'une colonne d'IDs (un seul map)."""
+        ids = ids.astype(object)
+        return ids.map(self.noms_par_client).fillna(ids)
+
+    def ajouter_noms(
+        self,
+        projets: pd.DataFrame,
+        colonne_chef: str = 'Chef_Affecte',
+        colonne_client: str = 'ID_Client'
+    ) -> pd.DataFrame:
+        """
+        Ajoute Nom_Chef et Nom_Client à un DataFrame de projets.
+
+        Args:
+            projets: DataFrame contenant les colonnes d'IDs
+            colonne_chef: Colonne ID chef (ignorée si absente)
+            colonne_client: Colonne ID client (ignorée si absente)
+
+        Returns:
+            Copie avec les colonnes Nom_Chef / Nom_Client
+        """
+        resultat = projets.copy()
+        if colonne_chef in resultat.columns:
+            resultat['Nom_Chef'] = self.noms_chefs(resultat[colonne_chef])
+        if colonne_client in resultat.columns:
+            resultat['Nom_Client'] = self.noms_clients(resultat[colonne_client])
+        return resultat
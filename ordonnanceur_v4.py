@@ -0,0 +1,264 @@
+"""
+Ordonnanceur de requêtes V4 - Quotas Google Sheets
+===================================================
+
+Placé devant le client gspread (voir SheetsBackend) :
+- seau à jetons calé sur le quota de l'API (lectures/minute)
+- regroupement des lectures identiques en vol (une seule requête
+  servie à toutes les sessions qui l'attendent)
+- nouvelles tentatives avec backoff exponentiel + jitter sur 429/5xx
+  (sur 429 seulement pour les écritures non idempotentes : un 5xx peut
+  arriver après que Sheets a appliqué l'écriture)
+- métriques : file d'attente, requêtes limitées, tentatives, échecs
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Optional
+
+from tracage_v4 import compter, REQUETES_SHEETS
+
+
+# ========================================
+# CONSTANTES
+# ========================================
+
+# Quota Sheets API : 60 requêtes/minute/utilisateur ; toutes les sessions
+# partagent le même compte de service, donc le même quota.
+REQUETES_PAR_MINUTE = 60
+RAFALE_MAX = 10
+
+MAX_TENTATIVES = 5
+DELAI_BASE_S = 1.0
+DELAI_MAX_S = 32.0
+
+CODES_REESSAYABLES = {429, 500, 502, 503, 504}
+
+# Requête refusée avant exécution : seul cas rejouable sans risque pour
+# une écriture non idempotente (append_rows, delete_rows...)
+CODES_REFUS_AVANT_EXECUTION = {429}
+
+
+def code_http(erreur: Exception) -> Optional[int]:
+    """
+    Code HTTP porté par une exception gspread (APIError) ou requests.
+
+    Returns:
+        Code HTTP ou None si l'erreur n'en porte pas
+    """
+    reponse = getattr(erreur, 'response', None)
+    code = getattr(reponse, 'status_code', None)
+    if code is None:
+        code = getattr(erreur, 'code', None)
+    return code if isinstance(code, int) else None
+
+
+def est_reessayable(erreur: Exception, idempotent: bool = True) -> bool:
+    """
+    Indique si l'appel peut être rejoué après cette erreur.
+
+    Args:
+        erreur: Exception levée par l'appel
+        idempotent: L'appel peut être rejoué même s'il a été appliqué
+
+    Returns:
+        True sur quota dépassé, ou panne serveur si l'appel est idempotent
+    """
+    codes = CODES_REESSAYABLES if idempotent else CODES_REFUS_AVANT_EXECUTION
+    return code_http(erreur) in codes
+
+
+# ========================================
+# SEAU À JETONS
+# ========================================
+
+class SeauJetons:
+    """Seau à jetons thread-safe (débit moyen + rafale maximale)."""
+
+    def __init__(self, par_minute: float, rafale: int):
+        """
+        Args:
+            par_minute: Débit moyen autorisé
+            rafale: Nombre de requêtes possibles d'affilée
+        """
+        self.debit = par_minute / 60.0
+        self.capacite = float(rafale)
+        self.jetons = float(rafale)
+        self._dernier = time.monotonic()
+        self._verrou = threading.Lock()
+
+    def _remplir(self) -> None:
+        maintenant = time.monotonic()
+        self.jetons = min(self.capacite, self.jetons + (maintenant - self._dernier) * self.debit)
+        self._dernier = maintenant
+
+    def prendre(self) -> float:
+        """
+        Prend un jeton, en attendant si nécessaire.
+
+        Returns:
+            Temps d'attente subi (secondes)
+        """
+        attente_totale = 0.0
+        while True:
+            with self._verrou:
+                self._remplir()
+                if self.jetons >= 1:
+                    self.jetons -= 1
+                    return attente_totale
+                attente = (1 - self.jetons) / self.debit
+            time.sleep(attente)
+            attente_totale += attente
+
+
+# ========================================
+# ORDONNANCEUR
+# ========================================
+
+class OrdonnanceurRequetes:
+    """Exécute les appels API en respectant le quota, avec regroupement et reprise."""
+
+    def __init__(
+        self,
+        requetes_par_minute: float = REQUETES_PAR_MINUTE,
+        rafale: int = RAFALE_MAX,
+        max_tentatives: int = MAX_TENTATIVES,
+        delai_base: float = DELAI_BASE_S,
+        delai_max: float = DELAI_MAX_S
+    ):
+        """
+        Args:
+            requetes_par_minute: Quota de l'API
+            rafale: Requêtes autorisées d'affilée
+            max_tentatives: Nombre total d'essais par requête
+            delai_base: Premier délai de backoff (secondes)
+            delai_max: Plafond du délai de backoff (secondes)
+        """
+        self.seau = SeauJetons(requetes_par_minute, rafale)
+        self.max_tentatives = max_tentatives
+        self.delai_base = delai_base
+        self.delai_max = delai_max
+        self._en_vol: Dict[Hashable, Future] = {}
+        self._verrou = threading.Lock()
+        self._compteurs = {
+            'requetes': 0,
+            'coalescees': 0,
+            'limitees': 0,
+            'reessais': 0,
+            'echecs': 0,
+            'attente_quota_s': 0.0,
+            'attente_backoff_s': 0.0
+        }
+        self._en_attente = 0
+        self._en_cours = 0
+
+    def _incrementer(self, cle: str, valeur: float = 1) -> None:
+        with self._verrou:
+            self._compteurs[cle] += valeur
+
+    def executer(
+        self,
+        fonction: Callable,
+        cle: Optional[Hashable] = None,
+        idempotent: bool = True
+    ):
+        """
+        Exécute un appel API.
+
+        Args:
+            fonction: Appel sans argument (ex. ws.get_all_records)
+            cle: Clé de regroupement ; les appels de même clé en vol
+                partagent un seul résultat (lectures uniquement)
+            idempotent: False pour une écriture qui ne doit pas être
+                appliquée deux fois (ajout, suppression de lignes) :
+                rejouée sur 429 uniquement, jamais sur 5xx
+
+        Returns:
+            Résultat de `fonction`
+
+        Raises:
+            L'exception d'origine après épuisement des tentatives
+        """
+        if cle is None:
+            return self._executer_avec_reprise(fonction, idempotent)
+
+        with self._verrou:
+            future = self._en_vol.get(cle)
+            meneur = future is None
+            if meneur:
+                future = Future()
+                self._en_vol[cle] = future
+            else:
+                self._compteurs['coalescees'] += 1
+
+        if not meneur:
+            return future.result()
+
+        try:
+            future.set_result(self._executer_avec_reprise(fonction))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._verrou:
+                self._en_vol.pop(cle, None)
+        return future.result()
+
+    def _executer_avec_reprise(self, fonction: Callable, idempotent: bool = True):
+        for tentative in range(self.max_tentatives):
+            self._prendre_jeton()
+            with self._verrou:
+                self._en_cours += 1
+                self._compteurs['requetes'] += 1
+            compter(REQUETES_SHEETS)
+            try:
+                return fonction()
+            except Exception as e:
+                erreur = e
+            finally:
+                with self._verrou:
+                    self._en_cours -= 1
+
+            if not est_reessayable(erreur, idempotent) or tentative == self.max_tentatives - 1:
+                self._incrementer('echecs')
+                raise erreur
+
+            # Backoff exponentiel, "full jitter"
+            delai = random.uniform(0, min(self.delai_max, self.delai_base * 2 ** tentative))
+            print(f"⚠️ API Sheets {code_http(erreur)} : nouvel essai dans {delai:.1f}s")
+            self._incrementer('reessais')
+            self._incrementer('attente_backoff_s', delai)
+            time.sleep(delai)
+
+    def _prendre_jeton(self) -> None:
+        with self._verrou:
+            self._en_attente += 1
+        try:
+            attente = self.seau.prendre()
+        finally:
+            with self._verrou:
+                self._en_attente -= 1
+        if attente > 0:
+            self._incrementer('limitees')
+            self._incrementer('attente_quota_s', attente)
+
+    def metriques(self) -> Dict:
+        """
+        Instantané des métriques.
+
+        Returns:
+            Dict avec en_attente (file), en_cours, en_vol_partagees,
+            jetons_disponibles et les compteurs cumulés
+        """
+        with self._verrou:
+            metriques = dict(self._compteurs)
+            metriques['en_attente'] = self._en_attente
+            metriques['en_cours'] = self._en_cours
+            metriques['en_vol_partagees'] = len(self._en_vol)
+        metriques['jetons_disponibles'] = round(self.seau.jetons, 2)
+        return metriques
@@ -0,0 +1,436 @@
+"""
+Planification V4 - Génération de la planification hebdomadaire
+===============================================================
+
+Expansion vectorisée des intervalles projets [Date_Debut, Date_Fin_Prev]
+sur une grille de semaines : une comparaison matricielle semaines × projets
+remplace la double boucle semaines / iterrows.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# ========================================
+# CONSTANTES
+# ========================================
+
+# Statuts pris en compte dans la planification
+STATUTS_PLANIFIES = ['En cours', 'Planifié']
+
+# Valeurs de Chef_Affecte signifiant "pas de chef"
+CHEFS_NON_AFFECTES = ['', 'Non affecté']
+
+
+# ========================================
+# GRILLE DE SEMAINES
+# ========================================
+
+def grille_semaines(
+    nb_semaines: int,
+    date_reference: Optional[datetime] = None,
+    premiere_semaine: int = 0
+) -> pd.DataFrame:
+    """
+    Construit la grille des semaines planifiées.
+
+    Args:
+        nb_semaines: Nombre de semaines
+        date_reference: Date de la semaine 0 (défaut : maintenant)
+        premiere_semaine: Décalage (en semaines) de la première ligne
+
+    Returns:
+        DataFrame avec colonnes Date, Semaine (n° ISO), Annee
+    """
+    if date_reference is None:
+        date_reference = datetime.today()
+
+    dates = pd.DatetimeIndex([
+        date_reference + timedelta(weeks=i)
+        for i in range(premiere_semaine, premiere_semaine + nb_semaines)
+    ])
+    return pd.DataFrame({
+        'Date': dates,
+        'Semaine': dates.isocalendar().week.to_numpy(dtype='int64'),
+        'Annee': dates.year.to_numpy(dtype='int64')
+    })
+
+
+# ========================================
+# EXPANSION DES INTERVALLES
+# ========================================
+
+def projets_planifiables(projets_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Filtre les projets à planifier : statut planifié, dates valides, chef affecté.
+
+    Args:
+        projets_df: DataFrame projets (typé par DataManagerV4)
+
+    Returns:
+        DataFrame filtré (ordre d'origine conservé)
+    """
+    if 'Statut' not in projets_df.columns:
+        return projets_df.iloc[0:0]
+
+    actifs = projets_df[projets_df['Statut'].isin(STATUTS_PLANIFIES)]
+    if 'Date_Debut' not in actifs.columns or 'Date_Fin_Prev' not in actifs.columns \
+            or 'Chef_Affecte' not in actifs.columns:
+        return actifs.iloc[0:0]
+
+    debut = pd.to_datetime(actifs['Date_Debut'])
+    fin = pd.to_datetime(actifs['Date_Fin_Prev'])
+    chef = actifs['Chef_Affecte']
+
+    # Même règle que `if chef_id and chef_id != 'Non affecté'`
+    chef_valide = chef.astype(object).map(bool) & ~chef.isin(CHEFS_NON_AFFECTES)
+
+    return actifs[debut.notna() & fin.notna() & chef_valide]
+
+
+def _colonne_ou_zero(df: pd.DataFrame, colonne: str) -> np.ndarray:
+    if colonne in df.columns:
+        return df[colonne].to_numpy()
+    return np.zeros(len(df), dtype='int64')
+
+
+def expandre_planification(
+    projets_df: pd.DataFrame,
+    semaines: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Construit la planification (une ligne par semaine et par projet actif).
+
+    Un projet est actif une semaine si Date_Debut <= Date <= Date_Fin_Prev.
+    Lignes triées par semaine puis dans l'ordre des projets.
+
+    Args:
+        projets_df: DataFrame projets (typé par DataManagerV4)
+        semaines: Grille issue de grille_semaines()
+
+    Returns:
+        DataFrame planification (Semaine, Annee, Date, Chef_ID, Projet_ID,
+        Projet_Nom, ICM, Charge_H), DataFrame vide sans colonnes si aucune ligne
+    """
+    projets = projets_planifiables(projets_df)
+    if len(projets) == 0 or len(semaines) == 0:
+        return pd.DataFrame()
+
+    debut = pd.to_datetime(projets['Date_Debut']).to_numpy(dtype='datetime64[ns]')
+    fin = pd.to_datetime(projets['Date_Fin_Prev']).to_numpy(dtype='datetime64[ns]')
+    dates = semaines['Date'].to_numpy(dtype='datetime64[ns]')
+
+    # Matrice semaines × projets, parcourue ligne par ligne (semaine d'abord)
+    actif = (debut[None, :] <= dates[:, None]) & (dates[:, None] <= fin[None, :])
+    i_semaine, i_projet = np.nonzero(actif)
+    if len(i_semaine) == 0:
+        return pd.DataFrame()
+
+    return _construire_lignes(projets, semaines, i_semaine, i_projet)
+
+
+def _construire_lignes(
+    projets: pd.DataFrame,
+    semaines: pd.DataFrame,
+    i_semaine: np.ndarray,
+    i_projet: np.ndarray
+) -> pd.DataFrame:
+    """Lignes de planification pour les couples (semaine, projet) actifs."""
+    return pd.DataFrame({
+        'Semaine': semaines['Semaine'].to_numpy()[i_semaine],
+        'Annee': semaines['Annee'].to_numpy()[i_semaine],
+        'Date': semaines['Date'].to_numpy(dtype='datetime64[ns]')[i_semaine],
+        'Chef_ID': projets['Chef_Affecte'].to_numpy()[i_projet],
+        'Projet_ID': projets['ID_Projet'].to_numpy()[i_projet],
+        'Projet_Nom': projets['Nom_Projet'].to_numpy()[i_projet],
+        'ICM': _colonne_ou_zero(projets, 'Indice_Charge')[i_projet],
+        'Charge_H': _colonne_ou_zero(projets, 'ICM_H_Semaine')[i_projet]
+    })
+
+
+def generer_planification(
+    projets_df: pd.DataFrame,
+    nb_semaines: int = 12,
+    date_reference: Optional[datetime] = None
+) -> pd.DataFrame:
+    """
+    Génère la planification des N prochaines semaines.
+
+    Args:
+        projets_df: DataFrame projets
+        nb_semaines: Nombre de semaines à générer
+        date_reference: Date de la semaine 0 (défaut : maintenant)
+
+    Returns:
+        DataFrame planification
+    """
+    return expandre_planification(
+        projets_df,
+        grille_semaines(nb_semaines, date_reference)
+    )
+
+
+# ========================================
+# PLANIFICATION PAR BLOCS
+# ========================================
+
+# Lignes par bloc produit par iterer_planification
+TAILLE_BLOC_DEFAUT = 100_000
+
+# Taille maximale (cellules) du masque semaines × projets évalué d'un coup
+CELLULES_MASQUE_MAX = 4_000_000
+
+
+def iterer_planification(
+    projets_df: pd.DataFrame,
+    nb_semaines: int = 12,
+    date_reference: Optional[datetime] = None,
+    taille_bloc: int = TAILLE_BLOC_DEFAUT
+) -> Iterator[pd.DataFrame]:
+    """
+    Génère la planification par blocs de `taille_bloc` lignes.
+
+    Même contenu et même ordre que generer_planification, mais la grille
+    est parcourue par groupes de semaines : la mémoire utilisée dépend de
+    la taille des blocs et du nombre de projets, pas de l'horizon.
+
+    Args:
+        projets_df: DataFrame projets
+        nb_semaines: Nombre de semaines à générer
+        date_reference: Date de la semaine 0 (défaut : maintenant)
+        taille_bloc: Nombre de lignes par bloc (le dernier peut être plus court)
+
+    Yields:
+        DataFrame planification (colonnes COLONNES_PLANIFICATION)
+    """
+    if date_reference is None:
+        date_reference = datetime.today()
+
+    projets = projets_planifiables(projets_df)
+    if len(projets) == 0:
+        return
+
+    debut = pd.to_datetime(projets['Date_Debut']).to_numpy(dtype='datetime64[ns]')
+    fin = pd.to_datetime(projets['Date_Fin_Prev']).to_numpy(dtype='datetime64[ns]')
+    # Un groupe de semaines produit au plus (semaines × projets) lignes,
+    # soit au plus un bloc : la mémoire ne dépend pas de l'horizon
+    semaines_par_groupe = max(1, min(CELLULES_MASQUE_MAX, taille_bloc) // len(projets))
+
+    en_attente = []
+    nb_en_attente = 0
+    for premiere in range(0, nb_semaines, semaines_par_groupe):
+        semaines = grille_semaines(
+            min(semaines_par_groupe, nb_semaines - premiere), date_reference, premiere
+        )
+        dates = semaines['Date'].to_numpy(dtype='datetime64[ns]')
+        actif = (debut[None, :] <= dates[:, None]) & (dates[:, None] <= fin[None, :])
+        i_semaine, i_projet = np.nonzero(actif)
+        if len(i_semaine) == 0:
+            continue
+
+        en_attente.append(_construire_lignes(projets, semaines, i_semaine, i_projet))
+        nb_en_attente += len(i_semaine)
+        if nb_en_attente < taille_bloc:
+            continue
+
+        lignes = pd.concat(en_attente, ignore_index=True)
+        nb_complets = len(lignes) // taille_bloc * taille_bloc
+        for debut_bloc in range(0, nb_complets, taille_bloc):
+            yield lignes.iloc[debut_bloc:debut_bloc + taille_bloc].reset_index(drop=True)
+        reste = lignes.iloc[nb_complets:].reset_index(drop=True)
+        en_attente = [reste] if len(reste) else []
+        nb_en_attente = len(reste)
+
+    if nb_en_attente:
+        yield pd.concat(en_attente, ignore_index=True)
+
+
+# ========================================
+# PLANIFICATION INCRÉMENTALE
+# ========================================
+
+# Clé d'une ligne de planification : la Date identifie la semaine de la
+# grille (le couple Annee/Semaine ISO peut se répéter sur deux ans).
+CLE_PLANIFICATION = ['Projet_ID', 'Date']
+VALEURS_PLANIFICATION = ['Semaine', 'Annee', 'Chef_ID', 'Projet_Nom', 'ICM', 'Charge_H']
+
+
+class DiffPlanification:
+    """
+    Différence ligne à ligne entre deux planifications.
+
+    Attributs (DataFrames au format planification) :
+        inserees: lignes nouvelles
+        modifiees: lignes existantes dont une valeur a changé (nouvelles valeurs)
+        supprimees: lignes à retirer (anciennes valeurs)
+    """
+
+    def __init__(
+        self,
+        inserees: pd.DataFrame,
+        modifiees: pd.DataFrame,
+        supprimees: pd.DataFrame
+    ):
+        self.inserees = inserees
+        self.modifiees = modifiees
+        self.supprimees = supprimees
+
+    def est_vide(self) -> bool:
+        return len(self.inserees) == 0 and len(self.modifiees) == 0 and len(self.supprimees) == 0
+
+    def resume(self) -> dict:
+        return {
+            'inserees': len(self.inserees),
+            'modifiees': len(self.modifiees),
+            'supprimees': len(self.supprimees)
+        }
+
+    def __repr__(self) -> str:
+        return f"DiffPlanification({self.resume()})"
+
+
+def _indexer(plan: pd.DataFrame) -> pd.DataFrame:
+    """Indexe une planification par (Projet_ID, Date)."""
+    if len(plan) == 0:
+        return pd.DataFrame(
+            columns=CLE_PLANIFICATION + VALEURS_PLANIFICATION
+        ).set_index(CLE_PLANIFICATION)
+    return plan.set_index(CLE_PLANIFICATION)
+
+
+def _desindexer(plan: pd.DataFrame) -> pd.DataFrame:
+    """Revient au format planification (ordre de colonnes d'origine)."""
+    colonnes = ['Semaine', 'Annee', 'Date', 'Chef_ID', 'Projet_ID', 'Projet_Nom', 'ICM', 'Charge_H']
+    return plan.reset_index()[colonnes]
+
+
+def calculer_diff(ancien: pd.DataFrame, nouveau: pd.DataFrame) -> DiffPlanification:
+    """
+    Compare deux planifications ligne à ligne.
+
+    Args:
+        ancien: Planification de référence (format planification)
+        nouveau: Planification recalculée
+
+    Returns:
+        DiffPlanification
+    """
+    a = _indexer(ancien)
+    n = _indexer(nouveau)
+
+    inserees = n[~n.index.isin(a.index)]
+    supprimees = a[~a.index.isin(n.index)]
+
+    communs = n.index[n.index.isin(a.index)]
+    avant = a.loc[communs, VALEURS_PLANIFICATION]
+    apres = n.loc[communs, VALEURS_PLANIFICATION]
+    differe = ~((avant == apres) | (avant.isna() & apres.isna())).all(axis=1)
+    modifiees = apres[differe.to_numpy()]
+
+    return DiffPlanification(
+        _desindexer(inserees),
+        _desindexer(n.loc[modifiees.index]),
+        _desindexer(supprimees)
+    )
+
+
+def appliquer_diff(plan: pd.DataFrame, diff: DiffPlanification) -> pd.DataFrame:
+    """
+    Applique une différence à une planification en mémoire.
+
+    Args:
+        plan: Planification actuelle
+        diff: Différence à appliquer
+
+    Returns:
+        Nouvelle planification (lignes modifiées en place, insertions en fin)
+    """
+    p = _indexer(plan)
+    if len(diff.supprimees):
+        p = p.drop(index=_indexer(diff.supprimees).index)
+    if len(diff.modifiees):
+        m = _indexer(diff.modifiees)
+        p.loc[m.index, VALEURS_PLANIFICATION] = m[VALEURS_PLANIFICATION]
+    if len(diff.inserees):
+        p = pd.concat([p, _indexer(diff.inserees)]) if len(p) else _indexer(diff.inserees)
+    return _desindexer(p) if len(p) else pd.DataFrame()
+
+
+class PlanificateurIncremental:
+    """
+    Planification tenue à jour projet par projet.
+
+    La grille de semaines est figée à la création ; seuls les projets
+    signalés comme modifiés sont ré-expansés, et la différence obtenue
+    s'applique au plan en mémoire comme au stockage.
+    """
+
+    def __init__(self, nb_semaines: int = 12, date_reference: Optional[datetime] = None):
+        """
+        Args:
+            nb_semaines: Horizon en semaines
+            date_reference: Date de la semaine 0 (défaut : maintenant)
+        """
+        self.semaines = grille_semaines(nb_semaines, date_reference)
+        self.plan = pd.DataFrame()
+        self._ordre_projets = pd.Series(dtype='int64')
+
+    def initialiser(self, projets_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Calcule la planification complète (point de départ).
+
+        Args:
+            projets_df: DataFrame projets
+
+        Returns:
+            Planification complète
+        """
+        self._memoriser_ordre(projets_df)
+        self.plan = expandre_planification(projets_df, self.semaines)
+        return self.plan
+
+    def _memoriser_ordre(self, projets_df: pd.DataFrame) -> None:
+        ids = projets_df['ID_Projet'] if 'ID_Projet' in projets_df.columns else pd.Series(dtype=object)
+        self._ordre_projets = pd.Series(range(len(ids)), index=ids.to_numpy())
+
+    def mettre_a_jour(self, projets_df: pd.DataFrame, projets_modifies) -> DiffPlanification:
+        """
+        Recalcule les lignes des seuls projets modifiés.
+
+        Args:
+            projets_df: DataFrame projets à jour (tous les projets)
+            projets_modifies: IDs des projets ajoutés, modifiés ou supprimés
+
+        Returns:
+            DiffPlanification (déjà appliquée à self.plan)
+        """
+        ids = set(projets_modifies)
+        self._memoriser_ordre(projets_df)
+
+        concernes = projets_df[projets_df['ID_Projet'].isin(ids)] \
+            if 'ID_Projet' in projets_df.columns else projets_df.iloc[0:0]
+        nouveau = expandre_planification(concernes, self.semaines)
+        ancien = self.plan[self.plan['Projet_ID'].isin(ids)] \
+            if len(self.plan) else pd.DataFrame()
+
+        diff = calculer_diff(ancien, nouveau)
+        self.plan = appliquer_diff(self.plan, diff)
+        return diff
+
+    def planification(self) -> pd.DataFrame:
+        """
+        Planification courante dans l'ordre canonique (semaine, puis ordre
+        des projets), identique à une régénération complète.
+        """
+        if len(self.plan) == 0:
+            return pd.DataFrame()
+        rang = self.plan['Projet_ID'].map(self._ordre_projets)
+        ordre = np.lexsort((rang.to_numpy(), self.plan['Date'].to_numpy()))
+        return self.plan.iloc[ordre].reset_index(drop=True)
@@ -0,0 +1,438 @@
+"""
+Rafraîchissement V4 - Instantanés de données préparés en arrière-plan
+======================================================================
+
+Un thread par processus recharge les données (et les index dérivés)
+hors du chemin des requêtes :
+- périodiquement (réconciliation avec le Google Sheet)
+- juste après chaque écriture du processus (invalider_donnees)
+
+Le nouvel instantané remplace l'ancien d'une seule affectation : une
+page lit toujours un instantané complet et cohérent, sans attendre
+d'entrée/sortie (sauf au tout premier chargement).
+
+Après une écriture, seuls les jeux dont une feuille source a changé
+(version_donnees) sont relus ; les autres DataFrames, et les index qui
+n'en dépendent que, sont repris de l'instantané précédent. Le réveil
+périodique recharge tout.
+
+Des surcouches (ex. affectations en attente d'écriture, voir
+ecriture_differee_v4) sont appliquées aux données de chaque instantané
+avant la construction des index ; reappliquer() les rejoue sur
+l'instantané courant sans relire le stockage.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from data_manager_v4 import (
+    DataManagerV4, JEUX_DERIVES, version_donnees, abonner_invalidation
+)
+from schema_v4 import rapport_memoire
+from tracage_v4 import tracer, mesurer, DONNEES
+
+
+# Période de réconciliation avec le stockage distant (secondes)
+INTERVALLE_RAFRAICHISSEMENT_S = 60
+
+# Jeux de DataManagerV4.charger_donnees inclus dans chaque instantané
+JEUX_INSTANTANE = [
+    'projets', 'chefs', 'clients', 'ponderations',
+    'projets_non_affectes', 'charge', 'noms'
+]
+
+
+# ========================================
+# INSTANTANÉ
+# ========================================
+
+class InstantaneDonnees:
+    """
+    Données et index d'un même chargement (partagés en lecture seule).
+
+    Attributs:
+        donnees: Dict {jeu: données} (JEUX_INSTANTANE)
+        index: Dict {nom: structure dérivée} (constructeurs du rafraîchisseur)
+        versions: Versions des feuilles au début du chargement
+        horodatage: Fin du chargement
+        duree_s: Durée du chargement
+        memoire: Mémoire de chaque DataFrame (schema_v4.rapport_memoire)
+        brutes: Données lues, avant surcouches (reprises au cycle suivant)
+        versions_jeux: Dict {jeu: versions de ses feuilles sources}
+    """
+
+    def __init__(
+        self,
+        donnees: Dict,
+        index: Dict,
+        versions: Tuple[int, ...],
+        duree_s: float,
+        brutes: Optional[Dict] = None,
+        versions_jeux: Optional[Dict[str, Tuple[int, ...]]] = None
+    ):
+        self.donnees = donnees
+        self.index = index
+        self.versions = versions
+        self.duree_s = duree_s
+        self.brutes = donnees if brutes is None else brutes
+        self.versions_jeux = versions_jeux or {}
+        self.memoire = rapport_memoire(donnees)
+        self.horodatage = datetime.now()
+
+    def age_s(self) -> float:
+        """Âge de l'instantané (secondes)."""
+        return (datetime.now() - self.horodatage).total_seconds()
+
+
+# ========================================
+# RAFRAÎCHISSEUR
+# ========================================
+
+class RafraichisseurDonnees:
+    """Thread de préparation des instantanés (un par backend et par processus)."""
+
+    def __init__(
+        self,
+        data_manager: DataManagerV4,
+        constructeurs: Optional[Dict[str, Callable[[Dict], Any]]] = None,
+        intervalle_s: float = INTERVALLE_RAFRAICHISSEMENT_S,
+        jeux: Optional[List[str]] = None,
+        dependances: Optional[Dict[str, Tuple[str, ...]]] = None
+    ):
+        """
+        Args:
+            data_manager: Gestionnaire de données à recharger
+            constructeurs: Index dérivés {nom: fonction(donnees) -> structure}
+            intervalle_s: Période de réconciliation avec le stockage distant
+            jeux: Jeux chargés (défaut : JEUX_INSTANTANE)
+            dependances: Jeux lus par chaque index {nom: (jeu, ...)} ; un
+                index sans dépendances déclarées dépend de tous les jeux
+        """
+        self.data_manager = data_manager
+        self.constructeurs = constructeurs or {}
+        self.intervalle_s = intervalle_s
+        self.jeux = jeux or JEUX_INSTANTANE
+        self.dependances = dependances or {}
+        self.derniere_erreur: Optional[str] = None
+
+        self._instantane: Optional[InstantaneDonnees] = None
+        self._condition = threading.Condition()
+        self._reveil = threading.Event()
+        self._demandes = 0          # Demandes de rafraîchissement reçues
+        self._servies = 0           # Demandes couvertes par l'instantané courant
+        self._synchroniser = False  # Réconcilier avec le distant au prochain cycle
+        self._en_cours = False
+        self._arret = False
+        self._thread: Optional[threading.Thread] = None
+        self._surcouches: List[Callable[[Dict], Dict]] = []
+        self._generation = 0        # Incrémentée à chaque reappliquer()
+
+    # ----------------------------------------
+    # Cycle de vie
+    # ----------------------------------------
+
+    def demarrer(self) -> 'RafraichisseurDonnees':
+        """Lance le thread (sans effet s'il tourne déjà)."""
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._arret = False
+            self._thread = threading.Thread(
+                target=self._boucle,
+                name='pmo-rafraichissement',
+                daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def arreter(self, timeout: Optional[float] = None) -> None:
+        """Arrête le thread après le cycle en cours."""
+        with self._condition:
+            self._arret = True
+            thread = self._thread
+        self._reveil.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    def _boucle(self) -> None:
+        while True:
+            demande = self._reveil.wait(self.intervalle_s)
+            self._reveil.clear()
+            with self._condition:
+                if self._arret:
+                    return
+                # Réveil périodique : réconcilier avec le stockage distant
+                synchroniser = self._synchroniser or not demande
+                self._synchroniser = False
+                cible = self._demandes
+                self._en_cours = True
+            try:
+                # Tracé pour l'historique du panneau de diagnostic
+                with tracer('rafraichissement'):
+                    self._cycle(synchroniser)
+            finally:
+                with self._condition:
+                    self._en_cours = False
+                    self._servies = max(self._servies, cible)
+                    self._condition.notify_all()
+
+    def _cycle(self, synchroniser: bool) -> None:
+        """
+        Construit un instantané puis le substitue au précédent.
+
+        Args:
+            synchroniser: Réconciliation (réveil périodique ou demande
+                explicite) : tout recharger ; sinon seuls les jeux dont
+                une feuille source a changé depuis l'instantané précédent
+                sont relus
+        """
+        debut = time.perf_counter()
+        precedent = self._instantane
+        try:
+            if synchroniser:
+                self.data_manager.synchroniser(invalider=False)
+            versions = version_donnees(self.jeux)
+            versions_jeux = {jeu: version_donnees([jeu]) for jeu in self.jeux}
+            if synchroniser or precedent is None:
+                relus = self.jeux
+                brutes = self.data_manager.charger_donnees(self.jeux)
+                precedent = None
+            else:
+                relus = [jeu for jeu in self.jeux if versions_jeux[jeu] != precedent.versions_jeux.get(jeu)]
+                brutes = self._recharger(precedent.brutes, relus)
+            while True:
+                generation = self._generation
+                donnees, index = self._construire(brutes, precedent)
+                instantane = InstantaneDonnees(
+                    donnees, index, versions, time.perf_counter() - debut, brutes, versions_jeux
+                )
+                with self._condition:
+                    # Surcouche modifiée pendant la construction : rejouer
+                    if generation == self._generation:
+                        self._instantane = instantane
+                        self.derniere_erreur = None
+                        break
+        except Exception as e:
+            # L'instantané précédent reste servi
+            self.derniere_erreur = str(e)
+            print(f"⚠️ Rafraîchissement impossible, données précédentes conservées : {str(e)}")
+            return
+
+        detail = '' if relus is self.jeux else f", relu(s) : {', '.join(relus) or 'aucun'}"
+        print(f"✅ Instantané prêt ({instantane.duree_s:.2f}s{detail})")
+
+    def _recharger(self, brutes: Dict, relus: List[str]) -> Dict:
+        """
+        Relit les jeux indiqués et reprend les autres tels quels.
+
+        Args:
+            brutes: Données lues de l'instantané précédent
+            relus: Jeux dont une feuille source a changé
+
+        Returns:
+            Dict {jeu: données} pour self.jeux
+        """
+        donnees = dict(brutes)
+        derives = [jeu for jeu in relus if jeu in JEUX_DERIVES]
+        lectures = [jeu for jeu in relus if jeu not in JEUX_DERIVES]
+        for jeu in derives:
+            lectures += [source for source in JEUX_DERIVES[jeu][0]
+                         if source not in lectures and source not in donnees]
+        if lectures:
+            donnees.update(self.data_manager.charger_donnees(lectures))
+        for jeu in derives:
+            donnees[jeu] = JEUX_DERIVES[jeu][1](donnees)
+        return {jeu: donnees[jeu] for jeu in self.jeux}
+
+    def _construire(
+        self,
+        brutes: Dict,
+        precedent: Optional[InstantaneDonnees] = None
+    ) -> Tuple[Dict, Dict]:
+        """
+        Applique les surcouches puis construit les index dérivés.
+
+        Un index dont tous les jeux sources sont les mêmes objets que
+        dans l'instantané précédent est repris sans être reconstruit.
+
+        Args:
+            brutes: Données lues (avant surcouches)
+            precedent: Instantané dont les index peuvent être repris
+
+        Returns:
+            Tuple (données après surcouches, index)
+        """
+        donnees = brutes
+        for surcouche in list(self._surcouches):
+            donnees = surcouche(donnees)
+        index = {}
+        for nom, construire in self.constructeurs.items():
+            sources = self.dependances.get(nom, self.jeux)
+            if precedent is not None and nom in precedent.index \
+                    and all(donnees.get(jeu) is precedent.donnees.get(jeu) for jeu in sources):
+                index[nom] = precedent.index[nom]
+            else:
+                index[nom] = construire(donnees)
+        return donnees, index
+
+    # ----------------------------------------
+    # Surcouches
+    # ----------------------------------------
+
+    def ajouter_surcouche(self, surcouche: Callable[[Dict], Dict]) -> None:
+        """
+        Enregistre une surcouche appliquée aux données de chaque instantané.
+
+        Args:
+            surcouche: fonction(donnees) -> nouvelles données ; ne modifie
+                pas ses entrées (partagées avec l'instantané précédent)
+        """
+        self._surcouches.append(surcouche)
+        self.reappliquer()
+
+    def reappliquer(self) -> Optional[InstantaneDonnees]:
+        """
+        Rejoue les surcouches sur l'instantané courant, sans relire le
+        stockage (index reconstruits).
+
+        Returns:
+            Nouvel instantané (None si aucun n'est encore chargé)
+        """
+        with self._condition:
+            self._generation += 1
+        while True:
+            with self._condition:
+                courant = self._instantane
+                generation = self._generation
+            if courant is None:
+                return None
+            debut = time.perf_counter()
+            donnees, index = self._construire(courant.brutes, courant)
+            instantane = InstantaneDonnees(
+                donnees, index, courant.versions, courant.duree_s + time.perf_counter() - debut,
+                courant.brutes, courant.versions_jeux
+            )
+            instantane.horodatage = courant.horodatage
+            with self._condition:
+                if self._instantane is courant and self._generation == generation:
+                    self._instantane = instantane
+                    return instantane
+
+    # ----------------------------------------
+    # Accès
+    # ----------------------------------------
+
+    def rafraichir(
+        self,
+        attendre: bool = False,
+        synchroniser: bool = False,
+        timeout: Optional[float] = None,
+        rejoindre: bool = False
+    ) -> Optional[InstantaneDonnees]:
+        """
+        Demande un nouvel instantané.
+
+        Args:
+            attendre: Bloquer jusqu'à un instantané chargé après la demande
+            synchroniser: Réconcilier d'abord avec le stockage distant
+            timeout: Attente maximale (secondes, None = illimitée)
+            rejoindre: Se contenter de la dernière demande non encore
+                servie s'il y en a une (ex. celle d'invalider_donnees
+                après une écriture) plutôt qu'en ajouter une, qui
+                coûterait un second chargement complet
+
+        Returns:
+            Instantané courant (éventuellement antérieur si timeout)
+        """
+        with self._condition:
+            rejointe = rejoindre and self._demandes > self._servies
+            if not rejointe:
+                self._demandes += 1
+            demande = self._demandes
+            self._synchroniser = self._synchroniser or synchroniser
+        self.demarrer()
+        if not rejointe:
+            self._reveil.set()
+        if attendre:
+            with mesurer(DONNEES, 'attente_rafraichissement'), self._condition:
+                self._condition.wait_for(lambda: self._servies >= demande, timeout)
+        return self._instantane
+
+    def instantane(self, timeout: Optional[float] = None) -> Optional[InstantaneDonnees]:
+        """
+        Instantané courant, sans entrée/sortie.
+
+        Seul le tout premier appel attend le chargement initial.
+
+        Args:
+            timeout: Attente maximale du premier instantané (secondes)
+
+        Returns:
+            InstantaneDonnees, ou None si aucun n'a pu être chargé
+        """
+        instantane = self._instantane
+        if instantane is not None:
+            return instantane
+        self.demarrer()
+        with self._condition:
+            if self._demandes == 0:
+                self._demandes = 1
+                self._reveil.set()
+            self._condition.wait_for(
+                lambda: self._instantane is not None or self._servies > 0, timeout
+            )
+            return self._instantane
+
+    def etat(self) -> Dict:
+        """
+        État du rafraîchisseur.
+
+        Returns:
+            Dict avec age_s, duree_s, memoire_ko, en_cours, erreur
+        """
+        instantane = self._instantane
+        return {
+            'age_s': instantane.age_s() if instantane else None,
+            'duree_s': instantane.duree_s if instantane else None,
+            'memoire_ko': round(float(instantane.memoire['memoire_ko'].sum()), 1) if instantane else None,
+            'en_cours': self._en_cours,
+            'erreur': self.derniere_erreur
+        }
+
+
+# ========================================
+# REGISTRE PROCESSUS
+# ========================================
+
+_RAFRAICHISSEURS: Dict[str, RafraichisseurDonnees] = {}
+_VERROU_RAFRAICHISSEURS = threading.Lock()
+
+
+def obtenir_rafraichisseur(
+    data_manager: DataManagerV4,
+    constructeurs: Optional[Dict[str, Callable[[Dict], Any]]] = None,
+    intervalle_s: float = INTERVALLE_RAFRAICHISSEMENT_S,
+    dependances: Optional[Dict[str, Tuple[str, ...]]] = None
+) -> RafraichisseurDonnees:
+    """
+    Renvoie le rafraîchisseur partagé du processus pour ce stockage.
+
+    Un seul thread par backend, quel que soit le nombre de sessions
+    Streamlit ; il est relancé par chaque écriture du processus.
+    """
+    cle = data_manager.backend.description()
+    with _VERROU_RAFRAICHISSEURS:
+        rafraichisseur = _RAFRAICHISSEURS.get(cle)
+        if rafraichisseur is None:
+            rafraichisseur = RafraichisseurDonnees(
+                data_manager, constructeurs, intervalle_s, dependances=dependances
+            )
+            abonner_invalidation(rafraichisseur.rafraichir)
+            _RAFRAICHISSEURS[cle] = rafraichisseur
+        return rafraichisseur.demarrer()
@@ -0,0 +1,486 @@
+"""
+Schéma V4 - Types et validation des feuilles du Google Sheet
+=============================================================
+
+Chaque feuille a un schéma déclaratif {colonne: Colonne(type, requis,
+defaut)}. Le type logique fixe le dtype en mémoire :
+- IDENTIFIANT : texte tel quel (valeurs uniques)
+- TEXTE : texte libre ; catégoriel s'il se répète (noms d'équipe, secteurs)
+- CATEGORIE : catégoriel (Statut, Chef_Affecte, ID_Client...) : les
+  filtres `==` / isin comparent des codes entiers
+- ECHELLE : échelle 1-5 ; entiers compacts si la colonne est numérique,
+  catégoriel si elle contient des libellés "X=Texte"
+- NOMBRE : numérique, réduit à int16/int32 ou float32 quand la
+  conversion est sans perte (float64 sinon)
+- DATE : datetime64
+
+parser_tableau type les valeurs brutes d'une feuille (chaînes de
+get_values, ou valeurs SQLite) colonne par colonne, en un seul passage.
+Une cellule vide prend la valeur par défaut ; une cellule illisible la
+prend aussi mais est consignée dans un RapportValidation, de même que
+les lignes écartées faute d'une colonne obligatoire.
+
+Les colonnes absentes du schéma sont laissées telles quelles.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from storage_v4 import (
+    FEUILLE_PROJETS, FEUILLE_CHEFS, FEUILLE_CLIENTS,
+    FEUILLE_PONDERATIONS, FEUILLE_PLANIFICATION
+)
+
+
+# ========================================
+# TYPES LOGIQUES
+# ========================================
+
+IDENTIFIANT = 'identifiant'
+TEXTE = 'texte'
+CATEGORIE = 'categorie'
+ECHELLE = 'echelle'
+NOMBRE = 'nombre'
+DATE = 'date'
+
+# Un texte devient catégoriel si au plus cette part de ses valeurs est distincte
+RATIO_CATEGORIEL_MAX = 0.5
+
+# Entiers candidats, du plus compact au plus large (int8 déborderait dès x 8 h)
+ENTIERS = [np.int16, np.int32, np.int64]
+
+# Marge exigée avant de réduire un entier : les calculs en aval (x 8 h,
+# x 100 %) restent dans le dtype sans débordement silencieux
+MARGE_CALCUL = 100
+
+# Bornes des échelles de notation
+ECHELLE_MIN, ECHELLE_MAX = 1, 5
+
+
+class Colonne:
+    """
+    Définition d'une colonne de feuille.
+
+    Attributs:
+        type: Type logique (NOMBRE, DATE...)
+        requis: Ligne écartée (et signalée) si la cellule est vide
+        defaut: Valeur des cellules vides ou illisibles (None = manquant)
+    """
+
+    __slots__ = ('type', 'requis', 'defaut')
+
+    def __init__(self, type_colonne: str, requis: bool = False, defaut=None):
+        self.type = type_colonne
+        self.requis = requis
+        self.defaut = defaut
+
+    def __repr__(self) -> str:
+        return f"Colonne({self.type!r}, requis={self.requis}, defaut={self.defaut!r})"
+
+
+# ========================================
+# SCHÉMAS DES FEUILLES
+# ========================================
+
+SCHEMA_PROJETS = {
+    'ID_Projet': Colonne(IDENTIFIANT, requis=True),
+    'Nom_Projet': Colonne(TEXTE),
+    'ID_Client': Colonne(CATEGORIE),
+    'Statut': Colonne(CATEGORIE),
+    'Chef_Affecte': Colonne(CATEGORIE),
+    'Budget_MAD': Colonne(NOMBRE, defaut=0),
+    'Charge_JH': Colonne(NOMBRE, defaut=0),
+    'Complexite_Tech': Colonne(ECHELLE),
+    'Niveau_Risque': Colonne(ECHELLE),
+    'Nb_Intervenants': Colonne(NOMBRE, defaut=0),
+    'Engagement_Client': Colonne(ECHELLE),
+    'Freq_Instances': Colonne(ECHELLE),
+    'Dispersion_Geo': Colonne(ECHELLE),
+    'Indice_Charge': Colonne(NOMBRE, defaut=0),
+    'ICM_H_Semaine': Colonne(NOMBRE, defaut=0),
+    'Date_Debut': Colonne(DATE),
+    'Date_Fin_Prev': Colonne(DATE),
+    'Duree_Semaines': Colonne(NOMBRE, defaut=0),
+    'Commentaires': Colonne(TEXTE),
+    'CPI': Colonne(NOMBRE, defaut=0),
+    'SPI': Colonne(NOMBRE, defaut=0),
+    'KPI Facturation': Colonne(NOMBRE, defaut=0)
+}
+
+SCHEMA_CHEFS = {
+    'ID_Chef': Colonne(IDENTIFIANT, requis=True),
+    'Nom_Prenom': Colonne(TEXTE),
+    'Email': Colonne(IDENTIFIANT),
+    'Equipe': Colonne(CATEGORIE),
+    'Statut': Colonne(CATEGORIE),
+    'Annees_Experience': Colonne(NOMBRE, defaut=0),
+    'Nb_Projets_Geres': Colonne(NOMBRE, defaut=0),
+    'Competences_Tech': Colonne(ECHELLE),
+    'Competences_Mgmt': Colonne(ECHELLE),
+    'Utilisation_IA': Colonne(ECHELLE),
+    'Secteurs_Expertise': Colonne(TEXTE),
+    'Methodologies': Colonne(TEXTE),
+    'Capacite_Max': Colonne(NOMBRE, defaut=0),
+    'ICC_H_Semaine': Colonne(NOMBRE, defaut=0),
+    'Capacite_Plafond_H': Colonne(NOMBRE, defaut=0),
+    'Charge_Actuelle': Colonne(NOMBRE, defaut=0),
+    'Taux_Charge_Pct': Colonne(NOMBRE, defaut=0),
+    'Projets_Actifs': Colonne(NOMBRE, defaut=0),
+    'Date_Embauche': Colonne(DATE),
+    'Commentaires': Colonne(TEXTE)
+}
+
+SCHEMA_CLIENTS = {
+    'ID_Client': Colonne(IDENTIFIANT, requis=True),
+    'Nom_Client': Colonne(TEXTE),
+    'Chef_Favori': Colonne(TEXTE)
+}
+
+SCHEMA_PONDERATIONS = {
+    'Paramètre': Colonne(IDENTIFIANT, requis=True),
+    'Poids_Moyen': Colonne(NOMBRE, defaut=0)
+}
+
+# Identifiants laissés en texte : calculer_diff compare ces lignes à une
+# planification recalculée (objets)
+SCHEMA_PLANIFICATION = {
+    'Semaine': Colonne(NOMBRE),
+    'Annee': Colonne(NOMBRE),
+    'Date': Colonne(DATE),
+    'Chef_ID': Colonne(IDENTIFIANT),
+    'Projet_ID': Colonne(IDENTIFIANT, requis=True),
+    'Projet_Nom': Colonne(IDENTIFIANT),
+    'ICM': Colonne(NOMBRE),
+    'Charge_H': Colonne(NOMBRE)
+}
+
+SCHEMAS = {
+    FEUILLE_PROJETS: SCHEMA_PROJETS,
+    FEUILLE_CHEFS: SCHEMA_CHEFS,
+    FEUILLE_CLIENTS: SCHEMA_CLIENTS,
+    FEUILLE_PONDERATIONS: SCHEMA_PONDERATIONS,
+    FEUILLE_PLANIFICATION: SCHEMA_PLANIFICATION
+}
+
+
+# ========================================
+# RAPPORT DE VALIDATION
+# ========================================
+
+class RapportValidation:
+    """
+    Anomalies relevées en typant une feuille.
+
+    Chaque anomalie : ligne du Sheet (en-tête = ligne 1), identifiant de
+    la ligne, colonne, valeur brute et motif.
+    """
+
+    COLONNES = ['feuille', 'ligne', 'identifiant', 'colonne', 'valeur', 'motif']
+
+    def __init__(self, feuille: str = ''):
+        self.feuille = feuille
+        self.lignes_ecartees = 0
+        self._blocs: List[pd.DataFrame] = []
+
+    def ajouter(
+        self,
+        lignes: pd.Series,
+        identifiants: pd.Series,
+        colonne: Optional[str],
+        valeurs: pd.Series,
+        motif: str
+    ) -> None:
+        """
+        Consigne un lot d'anomalies d'une même colonne (séries alignées).
+
+        Args:
+            lignes: Numéros de ligne dans le Sheet
+            identifiants: Identifiants des lignes concernées
+            colonne: Colonne en cause
+            valeurs: Valeurs brutes refusées
+            motif: Motif lisible
+        """
+        if len(lignes) == 0:
+            return
+        self._blocs.append(pd.DataFrame({
+            'feuille': self.feuille,
+            'ligne': lignes.to_numpy(),
+            'identifiant': identifiants.astype(object).to_numpy(),
+            'colonne': colonne,
+            'valeur': valeurs.astype(object).to_numpy(),
+            'motif': motif
+        }))
+
+    def __len__(self) -> int:
+        return sum(len(bloc) for bloc in self._blocs)
+
+    def dataframe(self) -> pd.DataFrame:
+        """Anomalies (une ligne chacune, colonnes COLONNES)."""
+        if not self._blocs:
+            return pd.DataFrame(columns=self.COLONNES)
+        return pd.concat(self._blocs, ignore_index=True) \
+            .sort_values(['ligne', 'colonne'], ignore_index=True)
+
+    def resume(self) -> str:
+        """Résumé lisible (une ligne)."""
+        return (f"{self.feuille} : {len(self)} anomalie(s) de saisie, "
+                f"{self.lignes_ecartees} ligne(s) écartée(s)")
+
+
+# ========================================
+# CONVERSIONS
+# ========================================
+
+def reduire_numerique(valeurs: pd.Series) -> pd.Series:
+    """
+    Plus petit dtype sans perte : int16/int32/int64 pour des entiers
+    (avec une marge MARGE_CALCUL), float32 si chaque valeur y est
+    représentable exactement, sinon float64.
+
+    Args:
+        valeurs: Colonne déjà numérique (NaN autorisés)
+
+    Returns:
+        Colonne réduite (même index et nom)
+    """
+    tableau = valeurs.to_numpy(dtype=float)
+    finis = np.isfinite(tableau)
+    if finis.all() and np.array_equal(tableau, np.round(tableau)):
+        minimum, maximum = (tableau.min(), tableau.max()) if len(tableau) else (0, 0)
+        for entier in ENTIERS:
+            bornes = np.iinfo(entier)
+            if bornes.min <= minimum * MARGE_CALCUL and maximum * MARGE_CALCUL <= bornes.max:
+                return pd.Series(tableau.astype(entier), index=valeurs.index, name=valeurs.name)
+    compact = tableau.astype(np.float32)
+    if np.array_equal(compact.astype(float), tableau, equal_nan=True):
+        return pd.Series(compact, index=valeurs.index, name=valeurs.name)
+    return pd.Series(tableau, index=valeurs.index, name=valeurs.name)
+
+
+def en_categorie(valeurs: pd.Series) -> pd.Series:
+    """Catégoriel (vides conservés comme catégorie '')."""
+    if isinstance(valeurs.dtype, pd.CategoricalDtype):
+        return valeurs
+    return valeurs.astype('category')
+
+
+def cellules_vides(valeurs: pd.Series) -> pd.Series:
+    """Masque des cellules vides (None, NaN, chaîne vide ou blanche)."""
+    vides = valeurs.isna()
+    if valeurs.dtype.kind in 'biufcmM':
+        return vides
+    return vides | (valeurs.astype(str).str.strip() == '')
+
+
+def lire_nombres(valeurs: pd.Series) -> pd.Series:
+    """
+    Nombres d'une colonne brute (NaN si illisible).
+
+    Accepte aussi l'affichage du Sheet en locale française : espaces de
+    milliers ("1 200 000") et virgule décimale ("12,5").
+    """
+    nombres = pd.to_numeric(valeurs, errors='coerce')
+    a_relire = nombres.isna() & valeurs.notna()
+    if a_relire.any():
+        texte = valeurs[a_relire].astype(str).str.replace(r'\s', '', regex=True)
+        virgule = ~texte.str.contains('.', regex=False)
+        texte = texte.where(~virgule, texte.str.replace(',', '.', regex=False))
+        nombres = nombres.astype(float)
+        nombres[a_relire] = pd.to_numeric(texte, errors='coerce')
+    return nombres
+
+
+def lire_dates(valeurs: pd.Series) -> pd.Series:
+    """Dates d'une colonne brute : ISO 8601, sinon jour en premier (NaT si illisible)."""
+    if valeurs.dtype.kind == 'M':
+        return valeurs
+    dates = pd.to_datetime(valeurs, errors='coerce', format='ISO8601')
+    a_relire = dates.isna() & ~cellules_vides(valeurs)
+    if a_relire.any():
+        dates[a_relire] = pd.to_datetime(
+            valeurs[a_relire].astype(str), errors='coerce', dayfirst=True, format='mixed'
+        )
+    return dates
+
+
+def lire_echelle(valeurs: pd.Series) -> pd.Series:
+    """Notes d'une échelle "4" ou "4=Élevé" (NaN si illisible)."""
+    notes = pd.to_numeric(valeurs, errors='coerce')
+    textes = notes.isna() & valeurs.notna()
+    if textes.any():
+        tete = valeurs[textes].astype(str).str.split('=', n=1).str[0].str.strip()
+        notes = notes.astype(float)
+        notes[textes] = pd.to_numeric(tete, errors='coerce')
+    return notes
+
+
+# ========================================
+# PARSEUR
+# ========================================
+
+def _typer_colonne(
+    valeurs: pd.Series,
+    colonne: Colonne,
+    vides: pd.Series
+) -> Tuple[pd.Series, Optional[pd.Series], str]:
+    """
+    Type une colonne brute.
+
+    Returns:
+        Tuple (colonne typée, masque des cellules illisibles ou None, motif)
+    """
+    if colonne.type == NOMBRE:
+        nombres = lire_nombres(valeurs)
+        invalides = nombres.isna() & ~vides
+        if colonne.defaut is not None:
+            nombres = nombres.fillna(colonne.defaut)
+        return reduire_numerique(nombres), invalides, 'nombre illisible'
+
+    if colonne.type == DATE:
+        dates = lire_dates(valeurs)
+        invalides = dates.isna() & ~vides
+        if colonne.defaut is not None:
+            dates = dates.fillna(pd.Timestamp(colonne.defaut))
+        return dates, invalides, 'date illisible'
+
+    if colonne.type == ECHELLE:
+        notes = lire_echelle(valeurs)
+        invalides = ~vides & ~notes.between(ECHELLE_MIN, ECHELLE_MAX)
+        motif = f'note hors échelle {ECHELLE_MIN}-{ECHELLE_MAX}'
+        if (pd.to_numeric(valeurs, errors='coerce').notna() | vides).all():
+            if colonne.defaut is not None:
+                notes = notes.fillna(colonne.defaut)
+            return reduire_numerique(notes), invalides, motif
+        # Libellés "X=Texte" : une poignée de valeurs distinctes
+        return en_categorie(valeurs), invalides, motif
+
+    if colonne.defaut is not None:
+        valeurs = valeurs.where(~vides, colonne.defaut)
+
+    if colonne.type == CATEGORIE:
+        return en_categorie(valeurs), None, ''
+
+    if colonne.type == TEXTE and len(valeurs) \
+            and valeurs.nunique(dropna=False) <= RATIO_CATEGORIEL_MAX * len(valeurs):
+        return en_categorie(valeurs), None, ''
+
+    return valeurs, None, ''
+
+
+def parser_tableau(
+    df: pd.DataFrame,
+    schema: Dict[str, Colonne],
+    feuille: str = ''
+) -> Tuple[pd.DataFrame, RapportValidation]:
+    """
+    Type les valeurs brutes d'une feuille selon son schéma.
+
+    Les lignes entièrement vides sont ignorées ; celles dont une colonne
+    obligatoire est vide sont écartées et signalées. Les colonnes
+    absentes du schéma sont conservées telles quelles.
+
+    Args:
+        df: Valeurs brutes (lignes dans l'ordre du Sheet)
+        schema: {colonne: Colonne}
+        feuille: Nom de la feuille (rapport)
+
+    Returns:
+        Tuple (DataFrame typé, RapportValidation)
+    """
+    rapport = RapportValidation(feuille)
+    # Ligne du Sheet de chaque ligne lue (l'en-tête occupe la ligne 1)
+    lignes = pd.Series(np.arange(len(df)) + 2, index=df.index)
+    vides = {colonne: cellules_vides(df[colonne]) for colonne in df.columns}
+    gardees = ~pd.DataFrame(vides, index=df.index).all(axis=1) if vides \
+        else pd.Series(False, index=df.index)
+
+    colonne_id = next((nom for nom, colonne in schema.items() if colonne.requis), None)
+    identifiants = df[colonne_id] if colonne_id in df.columns else lignes
+
+    for nom, colonne in schema.items():
+        if not colonne.requis or nom not in df.columns:
+            continue
+        manquantes = gardees & vides[nom]
+        rapport.ajouter(lignes[manquantes], identifiants[manquantes], nom,
+                        df.loc[manquantes, nom], 'valeur obligatoire vide')
+        rapport.lignes_ecartees += int(manquantes.sum())
+        gardees &= ~manquantes
+
+    if not gardees.all():
+        df = df[gardees]
+        lignes, identifiants = lignes[gardees], identifiants[gardees]
+
+    colonnes = {}
+    for nom, colonne in schema.items():
+        if nom not in df.columns:
+            continue
+        typee, invalides, motif = _typer_colonne(df[nom], colonne, vides[nom][gardees])
+        if invalides is not None and invalides.any():
+            rapport.ajouter(lignes[invalides], identifiants[invalides], nom,
+                            df.loc[invalides, nom], motif)
+        colonnes[nom] = typee
+
+    return (df.assign(**colonnes) if colonnes else df), rapport
+
+
+def modifiable(df: pd.DataFrame, *colonnes: str) -> pd.DataFrame:
+    """
+    Repasse des colonnes catégorielles en objets avant d'y écrire des
+    valeurs hors catégories (ex. simulation d'une réaffectation).
+
+    Args:
+        df: DataFrame modifié sur place (copie attendue de l'appelant)
+        colonnes: Colonnes à rendre modifiables
+
+    Returns:
+        Le même DataFrame
+    """
+    for colonne in colonnes:
+        if colonne in df.columns and isinstance(df[colonne].dtype, pd.CategoricalDtype):
+            df[colonne] = df[colonne].astype(object)
+    return df
+
+
+# ========================================
+# MÉMOIRE
+# ========================================
+
+def memoire_octets(objet) -> int:
+    """Empreinte mémoire profonde d'un DataFrame ou d'une Series (0 sinon)."""
+    if isinstance(objet, pd.DataFrame):
+        return int(objet.memory_usage(deep=True).sum())
+    if isinstance(objet, pd.Series):
+        return int(objet.memory_usage(deep=True))
+    return 0
+
+
+def rapport_memoire(jeux: Dict[str, object]) -> pd.DataFrame:
+    """
+    Mémoire occupée par chaque DataFrame d'un jeu de données.
+
+    Args:
+        jeux: {nom: données} (les objets non tabulaires sont ignorés)
+
+    Returns:
+        DataFrame (jeu, lignes, colonnes, categorielles, memoire_ko),
+        du plus lourd au plus léger
+    """
+    lignes = [
+        {
+            'jeu': nom,
+            'lignes': len(df),
+            'colonnes': df.shape[1],
+            'categorielles': sum(isinstance(dtype, pd.CategoricalDtype) for dtype in df.dtypes),
+            'memoire_ko': round(memoire_octets(df) / 1024, 1)
+        }
+        for nom, df in jeux.items()
+        if isinstance(df, pd.DataFrame)
+    ]
+    rapport = pd.DataFrame(lignes, columns=['jeu', 'lignes', 'colonnes', 'categorielles', 'memoire_ko'])
+    return rapport.sort_values('memoire_ko', ascending=False, ignore_index=True)
@@ -0,0 +1,454 @@
+"""
+Service V4 - API JSON de recommandation (asyncio, sans dépendance)
+===================================================================
+
+Expose l'algorithme d'affectation aux outils de staffing :
+
+    GET  /sante        état du service et âge des données
+    POST /recommander  {"projet_id": "PRJ001", "top": 3, "disponibles_seulement": false}
+    POST /valider      {"chef_id": "CP001", "projet_id": "PRJ001"}  (ou "icm": 42)
+    POST /simuler      {"affectations": [{"projet_id": "...", "chef_id": "..."}]}
+    POST /affecter     {"affectations": [{"projet_id": "...", "chef_id": "..."}]}
+
+Les données sont lues dans l'instantané en mémoire tenu à jour en
+arrière-plan (rafraichissement_v4) : aucune relecture des feuilles par
+requête. Les calculs tournent dans le pool de threads de la boucle
+asyncio, les requêtes concurrentes ne se bloquent pas entre elles.
+
+Usage :
+    python service_v4.py --sqlite pmo.db --port 8765
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from datetime import date, datetime
+from http import HTTPStatus
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from algorithme_v4 import (
+    AlgorithmeAffectationV4, valider_affectation, icm_to_heures_semaine, HEURES_SEMAINE_PLAFOND
+)
+from charge_v4 import MatriceCharge, IndexDisponibilite
+from data_manager_v4 import DataManagerV4, init_data_manager
+from rafraichissement_v4 import (
+    RafraichisseurDonnees, InstantaneDonnees, obtenir_rafraichisseur
+)
+from schema_v4 import modifiable
+from planification_v4 import STATUTS_PLANIFIES
+from snapshot_v4 import SnapshotCharge
+from storage_v4 import ErreurStockage
+
+
+HOTE_DEFAUT = '127.0.0.1'
+PORT_DEFAUT = 8765
+
+# Taille maximale d'un corps de requête (octets)
+TAILLE_MAX_CORPS = 1_000_000
+
+# Horizon de l'index de disponibilité et des simulations (semaines)
+HORIZON_SEMAINES = 26
+
+# Attente maximale de l'instantané suivant après une affectation (secondes)
+DELAI_RELECTURE_S = 30
+
+
+class ErreurRequete(Exception):
+    """Requête invalide : renvoyée au client avec son code HTTP."""
+
+    def __init__(self, statut: int, message: str):
+        super().__init__(message)
+        self.statut = statut
+
+
+# ========================================
+# SÉRIALISATION
+# ========================================
+
+def _json_defaut(valeur):
+    """Types numpy / pandas vers JSON."""
+    if isinstance(valeur, np.generic):
+        return valeur.item()
+    if isinstance(valeur, (pd.Timestamp, datetime, date)):
+        return None if pd.isna(valeur) else valeur.isoformat()
+    if isinstance(valeur, np.ndarray):
+        return valeur.tolist()
+    raise TypeError(f"Type non sérialisable : {type(valeur).__name__}")
+
+
+def _nettoyer(valeur):
+    """Remplace NaN / NaT par None (JSON strict)."""
+    if isinstance(valeur, dict):
+        return {cle: _nettoyer(v) for cle, v in valeur.items()}
+    if isinstance(valeur, (list, tuple)):
+        return [_nettoyer(v) for v in valeur]
+    if isinstance(valeur, (float, np.floating)) and np.isnan(valeur):
+        return None
+    if valeur is pd.NaT:
+        return None
+    return valeur
+
+
+def encoder_json(donnees) -> bytes:
+    """Encode une réponse en JSON UTF-8."""
+    return json.dumps(_nettoyer(donnees), default=_json_defaut, ensure_ascii=False).encode('utf-8')
+
+
+# ========================================
+# SERVICE
+# ========================================
+
+def _construire_index_disponibilite(donnees: Dict) -> IndexDisponibilite:
+    return IndexDisponibilite(MatriceCharge.depuis_projets(
+        donnees['projets'], HORIZON_SEMAINES, chefs=donnees['chefs']['ID_Chef'].tolist()
+    ))
+
+
+class ServiceRecommandation:
+    """
+    Service JSON au-dessus d'un instantané de données en mémoire.
+
+    `traiter` est indépendant du transport (testable sans socket) ;
+    `demarrer` l'expose en HTTP/1.1 via asyncio.start_server.
+    """
+
+    def __init__(
+        self,
+        data_manager: DataManagerV4,
+        rafraichisseur: Optional[RafraichisseurDonnees] = None
+    ):
+        """
+        Args:
+            data_manager: Gestionnaire de données (écritures)
+            rafraichisseur: Source des instantanés (défaut : celui du processus)
+        """
+        self.data_manager = data_manager
+        self.rafraichisseur = rafraichisseur or obtenir_rafraichisseur(
+            data_manager, {'index_disponibilite': _construire_index_disponibilite},
+            dependances={'index_disponibilite': ('projets', 'chefs')}
+        )
+        self.routes: Dict[Tuple[str, str], Callable[[Dict], Dict]] = {
+            ('GET', '/sante'): self.sante,
+            ('POST', '/recommander'): self.recommander,
+            ('POST', '/valider'): self.valider,
+            ('POST', '/simuler'): self.simuler,
+            ('POST', '/affecter'): self.affecter
+        }
+
+    # ----------------------------------------
+    # Données
+    # ----------------------------------------
+
+    def _instantane(self) -> InstantaneDonnees:
+        instantane = self.rafraichisseur.instantane()
+        if instantane is None:
+            raise ErreurRequete(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                f"Données indisponibles : {self.rafraichisseur.derniere_erreur}"
+            )
+        return instantane
+
+    @staticmethod
+    def _champ(corps: Dict, nom: str):
+        if nom not in corps or corps[nom] in (None, ''):
+            raise ErreurRequete(HTTPStatus.BAD_REQUEST, f"Champ obligatoire manquant : {nom}")
+        return corps[nom]
+
+    @staticmethod
+    def _projet(instantane: InstantaneDonnees, projet_id: str) -> Dict:
+        projets = instantane.donnees['projets']
+        ligne = projets[projets['ID_Projet'] == projet_id]
+        if len(ligne) == 0:
+            raise ErreurRequete(HTTPStatus.NOT_FOUND, f"Projet {projet_id} introuvable")
+        return ligne.iloc[0].to_dict()
+
+    @staticmethod
+    def _verifier_chef(instantane: InstantaneDonnees, chef_id: str) -> None:
+        if chef_id not in instantane.donnees['noms'].noms_par_chef.index:
+            raise ErreurRequete(HTTPStatus.NOT_FOUND, f"Chef {chef_id} introuvable")
+
+    def _affectations(self, corps: Dict, instantane: InstantaneDonnees) -> List[Tuple[str, str]]:
+        affectations = self._champ(corps, 'affectations')
+        if not isinstance(affectations, list):
+            raise ErreurRequete(HTTPStatus.BAD_REQUEST, "affectations : liste attendue")
+        paires = []
+        for a in affectations:
+            if not isinstance(a, dict):
+                raise ErreurRequete(HTTPStatus.BAD_REQUEST, "affectations : objets {projet_id, chef_id} attendus")
+            paires.append((str(self._champ(a, 'projet_id')), str(self._champ(a, 'chef_id'))))
+        for projet_id, chef_id in paires:
+            self._projet(instantane, projet_id)
+            self._verifier_chef(instantane, chef_id)
+        return paires
+
+    # ----------------------------------------
+    # Points d'entrée
+    # ----------------------------------------
+
+    def sante(self, corps: Dict) -> Dict:
+        """État du service et de l'instantané."""
+        return {
+            'statut': 'ok',
+            **self.rafraichisseur.etat(),
+            'anomalies_saisie': len(self.data_manager.rapport_validation())
+        }
+
+    def recommander(self, corps: Dict) -> Dict:
+        """Meilleurs chefs pour un projet (même calcul que la page Affectation)."""
+        instantane = self._instantane()
+        donnees = instantane.donnees
+        projet = self._projet(instantane, str(self._champ(corps, 'projet_id')))
+        try:
+            top = int(corps.get('top', 3))
+        except (TypeError, ValueError):
+            raise ErreurRequete(HTTPStatus.BAD_REQUEST, "top : entier attendu")
+
+        chefs = donnees['chefs']
+        filtre_disponibilite = False
+        if corps.get('disponibles_seulement'):
+            debut, fin = projet.get('Date_Debut'), projet.get('Date_Fin_Prev')
+            dispo = instantane.index['index_disponibilite'].chefs_disponibles(
+                icm_to_heures_semaine(projet.get('Indice_Charge', 0)),
+                0 if pd.isna(debut) else debut,
+                HORIZON_SEMAINES - 1 if pd.isna(fin) else fin
+            )
+            # None : projet hors de l'horizon de l'index, pas de pré-filtre
+            if dispo is not None:
+                chefs = chefs[chefs['ID_Chef'].isin(dispo['Chef_ID'])]
+                filtre_disponibilite = True
+
+        client = donnees['noms'].client(projet.get('ID_Client'))
+        chef_favori_id = client.get('Chef_Favori') if client else None
+        if not isinstance(chef_favori_id, str) or not chef_favori_id:
+            chef_favori_id = None
+
+        algo = AlgorithmeAffectationV4(donnees['ponderations'])
+        recommandations = algo.recommander_affectation(
+            projet, chefs, donnees['projets'], chef_favori_id=chef_favori_id
+        )
+        return {
+            'projet_id': projet['ID_Projet'],
+            'filtre_disponibilite': filtre_disponibilite,
+            'recommandations': recommandations[:top] if top > 0 else recommandations
+        }
+
+    def valider(self, corps: Dict) -> Dict:
+        """Validation en heures d'une affectation (alertes progressives)."""
+        instantane = self._instantane()
+        chef_id = str(self._champ(corps, 'chef_id'))
+        self._verifier_chef(instantane, chef_id)
+        if corps.get('projet_id'):
+            icm = self._projet(instantane, str(corps['projet_id'])).get('Indice_Charge', 0)
+        else:
+            try:
+                icm = float(self._champ(corps, 'icm'))
+            except (TypeError, ValueError):
+                raise ErreurRequete(HTTPStatus.BAD_REQUEST, "icm : nombre attendu")
+        return {
+            'chef_id': chef_id,
+            **valider_affectation(
+                chef_id, icm, instantane.donnees['projets'], instantane.donnees['chefs']
+            )
+        }
+
+    def simuler(self, corps: Dict) -> Dict:
+        """Charge des chefs concernés avant / après des affectations (sans écriture)."""
+        instantane = self._instantane()
+        affectations = self._affectations(corps, instantane)
+        projets = instantane.donnees['projets']
+        chefs = instantane.donnees['chefs']
+
+        simules = modifiable(projets.copy(), 'Chef_Affecte', 'Statut')
+        cibles = dict(affectations)
+        modifies = simules['ID_Projet'].isin(list(cibles))
+        chefs_concernes = set(cibles.values()) | set(simules.loc[modifies, 'Chef_Affecte'].dropna())
+        simules.loc[modifies, 'Chef_Affecte'] = simules.loc[modifies, 'ID_Projet'].map(cibles)
+        simules.loc[modifies, 'Statut'] = 'Actif'
+
+        # La matrice hebdomadaire ne compte que STATUTS_PLANIFIES : un projet
+        # simulé y garde son statut s'il est déjà planifié, sinon "Planifié"
+        planifies = simules.copy()
+        statuts = projets.loc[modifies, 'Statut'].astype(object)
+        planifies.loc[modifies, 'Statut'] = statuts.where(statuts.isin(STATUTS_PLANIFIES), 'Planifié')
+
+        # Mêmes chefs et même grille de semaines avant / après
+        chefs_concernes = [c for c in chefs['ID_Chef'] if c in chefs_concernes]
+        avant_snapshot = instantane.donnees['charge'].par_chef
+        apres_snapshot = SnapshotCharge.construire(simules, chefs).par_chef
+        avant_matrice = MatriceCharge.depuis_projets(projets, HORIZON_SEMAINES, chefs=chefs_concernes)
+        apres_matrice = MatriceCharge.depuis_projets(
+            planifies, HORIZON_SEMAINES, chefs=chefs_concernes, semaines=avant_matrice.semaines
+        )
+
+        resultat = []
+        for chef_id in chefs_concernes:
+            hebdo = apres_matrice.charge(chef_id)
+            resultat.append({
+                'chef_id': chef_id,
+                'charge_h_avant': avant_snapshot.at[chef_id, 'Charge_H'],
+                'charge_h_apres': apres_snapshot.at[chef_id, 'Charge_H'],
+                'taux_avant': avant_snapshot.at[chef_id, 'Taux_Calc'],
+                'taux_apres': apres_snapshot.at[chef_id, 'Taux_Calc'],
+                'pic_hebdo_h_avant': float(avant_matrice.charge(chef_id).max(initial=0)),
+                'pic_hebdo_h_apres': float(hebdo.max(initial=0)),
+                'semaines_surcharge_apres': int((hebdo > HEURES_SEMAINE_PLAFOND).sum())
+            })
+        return {'horizon_semaines': HORIZON_SEMAINES, 'chefs': resultat}
+
+    def affecter(self, corps: Dict) -> Dict:
+        """Écriture groupée des affectations ; résultat par projet."""
+        instantane = self._instantane()
+        affectations = self._affectations(corps, instantane)
+        resultats = self.data_manager.affecter_projets(affectations)
+        # Les requêtes suivantes voient l'affectation
+        self.rafraichisseur.rafraichir(attendre=True, timeout=DELAI_RELECTURE_S, rejoindre=True)
+        return {
+            'resultats': [
+                {'projet_id': projet_id, 'chef_id': chef_id, 'affecte': resultats.get(projet_id) is None,
+                 'erreur': resultats.get(projet_id)}
+                for projet_id, chef_id in affectations
+            ]
+        }
+
+    # ----------------------------------------
+    # Transport
+    # ----------------------------------------
+
+    async def traiter(self, methode: str, chemin: str, corps: bytes) -> Tuple[int, Dict]:
+        """
+        Traite une requête.
+
+        Args:
+            methode: GET / POST
+            chemin: Chemin de l'URL (sans paramètres)
+            corps: Corps JSON brut (vide accepté)
+
+        Returns:
+            Tuple (code HTTP, réponse JSON)
+        """
+        chemin = chemin.rstrip('/') or '/'
+        route = self.routes.get((methode, chemin))
+        if route is None:
+            if any(c == chemin for _, c in self.routes):
+                return HTTPStatus.METHOD_NOT_ALLOWED, {'erreur': f"Méthode {methode} non autorisée"}
+            return HTTPStatus.NOT_FOUND, {'erreur': f"Route inconnue : {chemin}"}
+        try:
+            donnees = json.loads(corps) if corps.strip() else {}
+            if not isinstance(donnees, dict):
+                raise ErreurRequete(HTTPStatus.BAD_REQUEST, "Objet JSON attendu")
+            # Calcul (et écriture éventuelle) hors de la boucle asyncio
+            reponse = await asyncio.get_running_loop().run_in_executor(None, route, donnees)
+            return HTTPStatus.OK, reponse
+        except json.JSONDecodeError as e:
+            return HTTPStatus.BAD_REQUEST, {'erreur': f"JSON invalide : {e}"}
+        except ErreurRequete as e:
+            return e.statut, {'erreur': str(e)}
+        except Exception as e:
+            print(f"❌ Erreur service {chemin} : {str(e)}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'erreur': str(e)}
+
+    async def _connexion(self, lecteur: asyncio.StreamReader, ecrivain: asyncio.StreamWriter) -> None:
+        """Une connexion HTTP/1.1 (keep-alive)."""
+        try:
+            while True:
+                ligne = await lecteur.readline()
+                if not ligne:
+                    break
+                methode, cible, version = ligne.decode('latin-1').split()
+                entetes = {}
+                while True:
+                    ligne = await lecteur.readline()
+                    if ligne in (b'\r\n', b'\n', b''):
+                        break
+                    nom, _, valeur = ligne.decode('latin-1').partition(':')
+                    entetes[nom.strip().lower()] = valeur.strip()
+
+                longueur = int(entetes.get('content-length', 0))
+                if longueur > TAILLE_MAX_CORPS:
+                    await self._repondre(ecrivain, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                         {'erreur': 'Corps trop volumineux'}, False)
+                    break
+                corps = await lecteur.readexactly(longueur) if longueur else b''
+
+                statut, reponse = await self.traiter(methode.upper(), urlsplit(cible).path, corps)
+                garder = version == 'HTTP/1.1' and entetes.get('connection', '').lower() != 'close'
+                await self._repondre(ecrivain, statut, reponse, garder)
+                if not garder:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            ecrivain.close()
+
+    @staticmethod
+    async def _repondre(ecrivain: asyncio.StreamWriter, statut: int, reponse: Dict, garder: bool) -> None:
+        corps = encoder_json(reponse)
+        statut = HTTPStatus(statut)
+        ecrivain.write(
+            f"HTTP/1.1 {statut.value} {statut.phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(corps)}\r\n"
+            f"Connection: {'keep-alive' if garder else 'close'}\r\n\r\n".encode('latin-1') + corps
+        )
+        await ecrivain.drain()
+
+    async def demarrer(self, hote: str = HOTE_DEFAUT, port: int = PORT_DEFAUT) -> asyncio.AbstractServer:
+        """Ouvre le port d'écoute (le premier instantané est chargé avant)."""
+        await asyncio.get_running_loop().run_in_executor(None, self.rafraichisseur.instantane)
+        serveur = await asyncio.start_server(self._connexion, hote, port)
+        print(f"✅ Service de recommandation sur http://{hote}:{port}")
+        return serveur
+
+
+# ========================================
+# LIGNE DE COMMANDE
+# ========================================
+
+async def _servir(service: ServiceRecommandation, hote: str, port: int) -> None:
+    serveur = await service.demarrer(hote, port)
+    async with serveur:
+        await serveur.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Lance le service (Ctrl+C pour arrêter)."""
+    parser = argparse.ArgumentParser(prog='service_v4.py', description="PMO Orchestre V4 - API de recommandation")
+    parser.add_argument('--hote', default=HOTE_DEFAUT)
+    parser.add_argument('--port', type=int, default=PORT_DEFAUT)
+    parser.add_argument('--sqlite', default=os.environ.get('PMO_SQLITE_DB'),
+                        help="Base SQLite locale (défaut : $PMO_SQLITE_DB)")
+    parser.add_argument('--credentials', default=os.environ.get('PMO_CREDENTIALS'),
+                        help="Fichier credentials.json (défaut : $PMO_CREDENTIALS)")
+    parser.add_argument('--sheet-id', default=os.environ.get('PMO_SHEET_ID'))
+    parser.add_argument('--miroir', default=None, help="Miroir SQLite local du Google Sheet")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.sqlite:
+            dm = init_data_manager(sqlite_path=args.sqlite)
+        else:
+            dm = init_data_manager(
+                credentials_file=args.credentials, sheet_id=args.sheet_id, miroir_path=args.miroir
+            )
+    except ErreurStockage as e:
+        print(f"❌ Stockage inaccessible : {e}")
+        return 1
+
+    try:
+        asyncio.run(_servir(ServiceRecommandation(dm), args.hote, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
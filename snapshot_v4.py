@@ -0,0 +1,221 @@
+"""
+Snapshot V4 - Charge agrégée par chef
+======================================
+
+Instantané de la charge de chaque chef, calculé une fois par chargement
+de données et partagé par le Dashboard et la page Chefs :
+un seul groupby (Chef_Affecte, Statut) au lieu d'un filtrage des projets
+par chef et par indicateur.
+
+La vue "Utilisation des chefs" est filtrée, triée et paginée ici avant
+rendu : seuls les chefs de la page affichée produisent des widgets.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+from datetime import datetime
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from algorithme_v4 import RATIO_CONVERSION
+
+
+# Statut des projets comptés dans la charge courante (pages Dashboard / Chefs)
+STATUT_ACTIF = 'Actif'
+
+
+class SnapshotCharge:
+    """
+    Charge courante agrégée par chef.
+
+    Attributs:
+        par_chef: DataFrame indexé par ID_Chef (tous les chefs, ordre de
+            la feuille) : Projets_Actifs, Charge_ICM, Charge_H, Taux_Calc
+        par_statut: Nombre de projets et ICM par (Chef_Affecte, Statut)
+        nb_par_statut: Nombre de projets par Statut (tous chefs)
+        horodatage: Date de construction
+    """
+
+    def __init__(
+        self,
+        par_chef: pd.DataFrame,
+        par_statut: pd.DataFrame,
+        nb_par_statut: pd.Series,
+        projets_actifs: pd.DataFrame,
+        groupes_actifs: dict
+    ):
+        self.par_chef = par_chef
+        self.par_statut = par_statut
+        self.nb_par_statut = nb_par_statut
+        self._projets_actifs = projets_actifs
+        self._groupes_actifs = groupes_actifs
+        self.horodatage = datetime.now()
+
+    @classmethod
+    def construire(cls, projets: pd.DataFrame, chefs: pd.DataFrame) -> 'SnapshotCharge':
+        """
+        Agrège les projets par chef et par statut (un seul passage).
+
+        Args:
+            projets: DataFrame projets (typé par DataManagerV4)
+            chefs: DataFrame chefs (typé par DataManagerV4)
+
+        Returns:
+            SnapshotCharge
+        """
+        ids_chefs = chefs['ID_Chef'].drop_duplicates() if 'ID_Chef' in chefs.columns \
+            else pd.Series(dtype=object)
+
+        if {'Chef_Affecte', 'Statut'}.issubset(projets.columns) and len(projets):
+            icm = projets['Indice_Charge'] if 'Indice_Charge' in projets.columns \
+                else pd.Series(0, index=projets.index)
+            par_statut = icm.groupby([projets['Chef_Affecte'], projets['Statut']], observed=True).agg(['count', 'sum']) \
+                .rename(columns={'count': 'Nb_Projets', 'sum': 'Charge_ICM'})
+            nb_par_statut = projets['Statut'].value_counts()
+            actifs = projets[projets['Statut'] == STATUT_ACTIF]
+            groupes = actifs.groupby('Chef_Affecte', sort=False, observed=True).indices
+        else:
+            par_statut = pd.DataFrame(
+                columns=['Nb_Projets', 'Charge_ICM'],
+                index=pd.MultiIndex.from_arrays([[], []], names=['Chef_Affecte', 'Statut'])
+            )
+            nb_par_statut = pd.Series(dtype='int64')
+            actifs = projets.iloc[0:0]
+            groupes = {}
+
+        # Ligne "Actif" de chaque chef (0 si aucun projet actif)
+        statuts = par_statut.index.get_level_values('Statut')
+        actif = par_statut[statuts == STATUT_ACTIF].droplevel('Statut') \
+            .reindex(ids_chefs.to_numpy(), fill_value=0)
+
+        charge_icm = actif['Charge_ICM'].to_numpy(dtype=float)
+        capacite = chefs.loc[ids_chefs.index, 'Capacite_Max'].to_numpy(dtype=float) \
+            if 'Capacite_Max' in chefs.columns else np.zeros(len(ids_chefs))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            taux = np.where(capacite > 0, charge_icm / capacite * 100, 0.0)
+
+        par_chef = pd.DataFrame({
+            'Projets_Actifs': actif['Nb_Projets'].to_numpy(dtype='int64'),
+            'Charge_ICM': charge_icm,
+            'Charge_H': charge_icm * RATIO_CONVERSION,
+            'Taux_Calc': taux
+        }, index=pd.Index(ids_chefs.to_numpy(), name='ID_Chef'))
+
+        return cls(par_chef, par_statut, nb_par_statut, actifs, groupes)
+
+    def projets_actifs(self, chef_id: str) -> pd.DataFrame:
+        """Projets au statut Actif d'un chef (vide si aucun)."""
+        positions = self._groupes_actifs.get(chef_id)
+        if positions is None:
+            return self._projets_actifs.iloc[0:0]
+        return self._projets_actifs.iloc[positions]
+
+    def nb_statut(self, statut: str) -> int:
+        """Nombre de projets ayant ce statut."""
+        return int(self.nb_par_statut.get(statut, 0))
+
+    def charge_moyenne(self) -> float:
+        """Taux de charge moyen des chefs (%)."""
+        return float(self.par_chef['Taux_Calc'].mean()) if len(self.par_chef) else 0.0
+
+    def joindre(self, chefs: pd.DataFrame, colonnes: Optional[dict] = None) -> pd.DataFrame:
+        """
+        Ajoute les indicateurs du snapshot aux lignes chefs.
+
+        Args:
+            chefs: DataFrame chefs (colonne ID_Chef)
+            colonnes: Renommage {indicateur: colonne cible}
+
+        Returns:
+            Copie de `chefs` avec les indicateurs (alignés sur ID_Chef)
+        """
+        indicateurs = self.par_chef.rename(columns=colonnes or {})
+        resultat = chefs.copy()
+        for colonne in indicateurs.columns:
+            resultat[colonne] = indicateurs[colonne].reindex(chefs['ID_Chef'].to_numpy()).to_numpy()
+        return resultat
+
+
+# ========================================
+# VUE UTILISATION (FILTRES / PAGINATION)
+# ========================================
+
+# Tranches de taux de charge (mêmes seuils que les pastilles du dashboard)
+TRANCHES_TAUX = {
+    '🟢 < 70%': (0, 70),
+    '🟡 70-90%': (70, 90),
+    '🟠 90-100%': (90, 100),
+    '🔴 ≥ 100%': (100, float('inf'))
+}
+
+# Seuil de surcharge (taux de charge, %)
+TAUX_SURCHARGE = 100
+
+# Colonne équipe de la feuille Chefs_Projets (filtre proposé si présente)
+COLONNE_EQUIPE = 'Equipe'
+
+
+def filtrer_utilisation(
+    chefs: pd.DataFrame,
+    surcharges_seulement: bool = False,
+    equipes: Optional[list] = None,
+    tranches: Optional[list] = None,
+    tri: str = 'Taux_Calc',
+    decroissant: bool = True
+) -> pd.DataFrame:
+    """
+    Filtre et trie les chefs de la vue utilisation (côté serveur).
+
+    Args:
+        chefs: Chefs enrichis par SnapshotCharge.joindre
+        surcharges_seulement: Garder les chefs à TAUX_SURCHARGE % ou plus
+        equipes: Équipes retenues (COLONNE_EQUIPE, ignoré si vide/absente)
+        tranches: Clés de TRANCHES_TAUX retenues (toutes si vide)
+        tri: Colonne de tri
+        decroissant: Ordre décroissant
+
+    Returns:
+        DataFrame filtré et trié (index réinitialisé)
+    """
+    masque = np.ones(len(chefs), dtype=bool)
+    if 'Statut' in chefs.columns:
+        masque &= (chefs['Statut'] == STATUT_ACTIF).to_numpy()
+
+    taux = chefs['Taux_Calc'].to_numpy(dtype=float)
+    if surcharges_seulement:
+        masque &= taux >= TAUX_SURCHARGE
+    if equipes and COLONNE_EQUIPE in chefs.columns:
+        masque &= chefs[COLONNE_EQUIPE].isin(equipes).to_numpy()
+    if tranches:
+        dans_tranche = np.zeros(len(chefs), dtype=bool)
+        for tranche in tranches:
+            bas, haut = TRANCHES_TAUX[tranche]
+            dans_tranche |= (taux >= bas) & (taux < haut)
+        masque &= dans_tranche
+
+    resultat = chefs[masque]
+    if tri in resultat.columns:
+        resultat = resultat.sort_values(tri, ascending=not decroissant, kind='stable')
+    return resultat.reset_index(drop=True)
+
+
+def paginer(df: pd.DataFrame, page: int, taille_page: int) -> Tuple[pd.DataFrame, int]:
+    """
+    Extrait une page d'un DataFrame.
+
+    Args:
+        df: Lignes à paginer
+        page: Numéro de page (1 = première, ramené dans les bornes)
+        taille_page: Nombre de lignes par page
+
+    Returns:
+        Tuple (lignes de la page, nombre de pages)
+    """
+    nb_pages = max(1, -(-len(df) // taille_page))
+    page = min(max(page, 1), nb_pages)
+    debut = (page - 1) * taille_page
+    return df.iloc[debut:debut + taille_page], nb_pages
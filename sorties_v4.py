@@ -0,0 +1,148 @@
+"""
+Sorties V4 - Écriture par blocs de la planification
+====================================================
+
+Destinations des blocs produits par planification_v4.iterer_planification :
+- SortieCSV : fichier CSV (en-tête écrit une seule fois)
+- SortieParquet : fichier Parquet, un row group par bloc (pyarrow requis)
+- SortieStockage : feuille Planification_Hebdo du backend (append par bloc)
+
+Chaque bloc est écrit puis libéré : la mémoire reste constante quelle
+que soit la longueur de l'horizon.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+from abc import ABC, abstractmethod
+from typing import Iterable
+
+import pandas as pd
+
+from storage_v4 import StorageBackend, COLONNES_PLANIFICATION
+
+
+# ========================================
+# INTERFACE
+# ========================================
+
+class SortiePlanification(ABC):
+    """Destination de blocs de planification (utilisable avec `with`)."""
+
+    def __init__(self):
+        self.nb_lignes = 0
+        self.nb_blocs = 0
+
+    def ecrire(self, bloc: pd.DataFrame) -> None:
+        """Écrit un bloc (colonnes COLONNES_PLANIFICATION)."""
+        self._ecrire(bloc)
+        self.nb_lignes += len(bloc)
+        self.nb_blocs += 1
+
+    @abstractmethod
+    def _ecrire(self, bloc: pd.DataFrame) -> None:
+        """Écrit un bloc dans la destination."""
+
+    def fermer(self) -> None:
+        """Termine l'écriture (sortie vide si aucun bloc reçu)."""
+        if self.nb_blocs == 0:
+            self._ecrire(pd.DataFrame(columns=COLONNES_PLANIFICATION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+        return False
+
+
+def ecrire_blocs(blocs: Iterable[pd.DataFrame], sortie: SortiePlanification) -> int:
+    """
+    Écrit tous les blocs d'un générateur dans une sortie puis la ferme.
+
+    Args:
+        blocs: Blocs de planification (ex. iterer_planification(...))
+        sortie: Destination
+
+    Returns:
+        Nombre total de lignes écrites
+    """
+    with sortie:
+        for bloc in blocs:
+            sortie.ecrire(bloc)
+    return sortie.nb_lignes
+
+
+# ========================================
+# FICHIERS
+# ========================================
+
+class SortieCSV(SortiePlanification):
+    """Fichier CSV, dates au format AAAA-MM-JJ."""
+
+    def __init__(self, chemin: str):
+        super().__init__()
+        self.chemin = chemin
+
+    def _ecrire(self, bloc: pd.DataFrame) -> None:
+        premier = self.nb_blocs == 0
+        bloc.to_csv(
+            self.chemin,
+            mode='w' if premier else 'a',
+            header=premier,
+            index=False,
+            date_format='%Y-%m-%d'
+        )
+
+
+class SortieParquet(SortiePlanification):
+    """Fichier Parquet écrit en continu (un row group par bloc)."""
+
+    def __init__(self, chemin: str):
+        """
+        Args:
+            chemin: Fichier Parquet à créer
+
+        Raises:
+            ImportError: si pyarrow n'est pas installé
+        """
+        super().__init__()
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Export Parquet : installer pyarrow (pip install pyarrow)") from e
+        self._pa = pa
+        self._pq = pq
+        self.chemin = chemin
+        self._writer = None
+
+    def _ecrire(self, bloc: pd.DataFrame) -> None:
+        table = self._pa.Table.from_pandas(bloc, preserve_index=False)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.chemin, table.schema)
+        else:
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table)
+
+    def fermer(self) -> None:
+        super().fermer()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+# ========================================
+# STOCKAGE
+# ========================================
+
+class SortieStockage(SortiePlanification):
+    """Feuille Planification_Hebdo : remplacée au premier bloc, complétée ensuite."""
+
+    def __init__(self, backend: StorageBackend):
+        super().__init__()
+        self.backend = backend
+
+    def _ecrire(self, bloc: pd.DataFrame) -> None:
+        self.backend.ajouter_planification(bloc, remplacer=self.nb_blocs == 0)
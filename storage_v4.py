@@ -0,0 +1,1021 @@
+"""
+Storage V4 - Backends de stockage PMO Orchestre
+================================================
+
+Abstraction du stockage utilisé par DataManagerV4 :
+- SheetsBackend : Google Sheets via gspread (comportement historique)
+- SQLiteBackend : base locale SQLite indexée (hors-ligne, tests, volumétrie)
+
+Les backends renvoient les lignes "brutes" (chaînes de get_values pour
+Google Sheets) ; le typage et la validation restent la responsabilité de
+DataManagerV4 (schema_v4).
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ordonnanceur_v4 import OrdonnanceurRequetes
+from tracage_v4 import compter_reponse_http
+
+
+# ========================================
+# CONSTANTES
+# ========================================
+
+FEUILLE_PROJETS = 'Projets'
+FEUILLE_CHEFS = 'Chefs_Projets'
+FEUILLE_CLIENTS = 'Clients'
+FEUILLE_PONDERATIONS = 'Ponderations'
+FEUILLE_PLANIFICATION = 'Planification_Hebdo'
+
+FEUILLES = [
+    FEUILLE_PROJETS,
+    FEUILLE_CHEFS,
+    FEUILLE_CLIENTS,
+    FEUILLE_PONDERATIONS,
+    FEUILLE_PLANIFICATION
+]
+
+# Colonne identifiant de chaque feuille
+COLONNES_ID = {
+    FEUILLE_PROJETS: 'ID_Projet',
+    FEUILLE_CHEFS: 'ID_Chef',
+    FEUILLE_CLIENTS: 'ID_Client'
+}
+
+COLONNES_PLANIFICATION = [
+    'Semaine', 'Annee', 'Date', 'Chef_ID',
+    'Projet_ID', 'Projet_Nom', 'ICM', 'Charge_H'
+]
+
+
+class ErreurStockage(Exception):
+    """Erreur de connexion ou d'accès au stockage."""
+
+
+# ========================================
+# HELPERS
+# ========================================
+
+def lignes_planification(planning_df: pd.DataFrame) -> List[List]:
+    """
+    Convertit une planification en lignes prêtes à écrire.
+
+    Args:
+        planning_df: DataFrame planification (colonnes COLONNES_PLANIFICATION)
+
+    Returns:
+        Liste de lignes [Semaine, Annee, Date, Chef_ID, Projet_ID, Projet_Nom, ICM, Charge_H]
+    """
+    if len(planning_df) == 0:
+        return []
+    # Conversion colonne par colonne (les blocs peuvent compter des
+    # centaines de milliers de lignes) ; mêmes types que ligne à ligne
+    dates = pd.to_datetime(planning_df['Date'])
+    colonnes = [
+        planning_df['Semaine'].astype('int64').tolist(),
+        planning_df['Annee'].astype('int64').tolist(),
+        dates.dt.strftime('%Y-%m-%d').where(dates.notna(), '').tolist(),
+        planning_df['Chef_ID'].astype(str).tolist(),
+        planning_df['Projet_ID'].astype(str).tolist(),
+        planning_df['Projet_Nom'].astype(str).tolist(),
+        planning_df['ICM'].astype(float).tolist(),
+        planning_df['Charge_H'].astype(float).tolist()
+    ]
+    return [list(ligne) for ligne in zip(*colonnes)]
+
+
+def tableau_valeurs(valeurs: List[List]) -> pd.DataFrame:
+    """
+    DataFrame brut d'un onglet lu par get_values (ligne 1 = en-têtes).
+
+    Aucune conversion de type : les cellules restent des chaînes. Les
+    colonnes sans en-tête sont ignorées, les lignes courtes complétées.
+
+    Args:
+        valeurs: Lignes de l'onglet, en-têtes compris
+
+    Returns:
+        DataFrame (une ligne par ligne du Sheet, dans l'ordre)
+
+    Raises:
+        ErreurStockage: si deux colonnes portent le même en-tête
+    """
+    if not valeurs:
+        return pd.DataFrame()
+    entetes = [str(entete).strip() for entete in valeurs[0]]
+    nommees = [i for i, entete in enumerate(entetes) if entete]
+    noms = [entetes[i] for i in nommees]
+    doublons = sorted({nom for nom in noms if noms.count(nom) > 1})
+    if doublons:
+        raise ErreurStockage(f"En-têtes en double : {doublons}")
+    lignes = [
+        [ligne[i] if i < len(ligne) else '' for i in nommees]
+        for ligne in valeurs[1:]
+    ]
+    return pd.DataFrame(lignes, columns=noms, dtype=object)
+
+
+def cle_planification(projet_id, date_valeur) -> tuple:
+    """Clé (Projet_ID, Date 'AAAA-MM-JJ') d'une ligne de planification stockée."""
+    if isinstance(date_valeur, (pd.Timestamp, datetime, date)):
+        date_valeur = date_valeur.strftime('%Y-%m-%d')
+    return (str(projet_id), str(date_valeur))
+
+
+def est_vide(valeur) -> bool:
+    """Indique si une cellule est vide (None, NaN ou chaîne vide)."""
+    if valeur is None:
+        return True
+    if isinstance(valeur, str):
+        return valeur == ''
+    try:
+        return bool(pd.isna(valeur))
+    except (TypeError, ValueError):
+        return False
+
+
+def lettre_colonne(numero: int) -> str:
+    """Lettre de colonne A1 (1 -> 'A', 27 -> 'AA')."""
+    lettres = ''
+    while numero > 0:
+        numero, reste = divmod(numero - 1, 26)
+        lettres = chr(ord('A') + reste) + lettres
+    return lettres
+
+
+def _blocs_contigus(numeros_desc: List[int]) -> List[tuple]:
+    """Regroupe des numéros de ligne triés décroissants en blocs (début, fin)."""
+    blocs = []
+    for numero in numeros_desc:
+        if blocs and blocs[-1][0] == numero + 1:
+            blocs[-1] = (numero, blocs[-1][1])
+        else:
+            blocs.append((numero, numero))
+    return blocs
+
+
+# ========================================
+# INTERFACE
+# ========================================
+
+class StorageBackend(ABC):
+    """
+    Interface commune des backends de stockage.
+
+    Toutes les méthodes lèvent ErreurStockage (ou l'exception d'origine)
+    en cas d'échec ; la gestion des messages reste dans DataManagerV4.
+    """
+
+    nom = 'abstrait'
+
+    @abstractmethod
+    def lire_table(self, table: str) -> pd.DataFrame:
+        """
+        Lit toutes les lignes d'une feuille.
+
+        Args:
+            table: Nom de la feuille (ex. 'Projets')
+
+        Returns:
+            DataFrame des valeurs brutes
+        """
+
+    def lire_par_id(self, table: str, valeur: str) -> pd.DataFrame:
+        """
+        Lit les lignes dont l'identifiant vaut `valeur`.
+
+        Args:
+            table: Nom de la feuille (doit figurer dans COLONNES_ID)
+            valeur: Identifiant recherché
+
+        Returns:
+            DataFrame (0 ou 1 ligne en pratique)
+        """
+        return self.lire_filtre(table, COLONNES_ID[table], [valeur])
+
+    def lire_filtre(
+        self,
+        table: str,
+        colonne: str,
+        valeurs: List,
+        inclure_vides: bool = False
+    ) -> pd.DataFrame:
+        """
+        Lit les lignes dont `colonne` prend une des `valeurs`.
+
+        Args:
+            table: Nom de la feuille
+            colonne: Colonne filtrée
+            valeurs: Valeurs acceptées
+            inclure_vides: Inclure aussi les cellules vides / nulles
+
+        Returns:
+            DataFrame filtré
+        """
+        df = self.lire_table(table)
+        if colonne not in df.columns:
+            return df.iloc[0:0]
+        masque = df[colonne].isin(valeurs)
+        if inclure_vides:
+            masque = masque | df[colonne].map(est_vide)
+        return df[masque]
+
+    @abstractmethod
+    def affecter_projet(self, projet_id: str, chef_id: str) -> None:
+        """Affecte un chef à un projet et passe son statut à "Actif"."""
+
+    def affecter_projets(self, affectations: List[Tuple[str, str]]) -> Dict[str, Optional[str]]:
+        """
+        Affecte plusieurs projets (Chef_Affecte + Statut "Actif").
+
+        Par défaut une écriture par projet ; les backends la remplacent
+        par une écriture groupée.
+
+        Args:
+            affectations: Liste de (ID_Projet, ID_Chef)
+
+        Returns:
+            Dict {ID_Projet: None si affecté, sinon message d'erreur}
+        """
+        resultats = {}
+        for projet_id, chef_id in affectations:
+            try:
+                self.affecter_projet(projet_id, chef_id)
+                resultats[projet_id] = None
+            except ErreurStockage as e:
+                resultats[projet_id] = str(e)
+        return resultats
+
+    @abstractmethod
+    def mettre_a_jour_cellules(self, table: str, cellules: List[Tuple[str, str, object]]) -> int:
+        """
+        Réécrit des cellules isolées, repérées par l'identifiant de ligne.
+
+        Args:
+            table: Feuille disposant d'une colonne identifiant (COLONNES_ID)
+            cellules: Liste de (identifiant, colonne, nouvelle valeur)
+
+        Returns:
+            Nombre de cellules écrites (identifiants inconnus ignorés)
+        """
+
+    @abstractmethod
+    def sauvegarder_planification(self, planning_df: pd.DataFrame) -> None:
+        """Remplace le contenu de Planification_Hebdo."""
+
+    @abstractmethod
+    def appliquer_diff_planification(self, diff) -> None:
+        """
+        Applique ligne à ligne une différence de planification.
+
+        Args:
+            diff: DiffPlanification (planification_v4) ; lignes identifiées
+                par (Projet_ID, Date)
+        """
+
+    @abstractmethod
+    def ajouter_planification(self, planning_df: pd.DataFrame, remplacer: bool = False) -> None:
+        """
+        Ajoute des lignes en fin de Planification_Hebdo (écriture par blocs).
+
+        Args:
+            planning_df: Bloc de planification
+            remplacer: Vider la feuille avant d'écrire (premier bloc)
+        """
+
+    @abstractmethod
+    def lister_tables(self) -> List[str]:
+        """Liste les feuilles disponibles."""
+
+    def reconnecter(self) -> None:
+        """Rétablit la connexion (sans effet par défaut)."""
+
+    def revision(self) -> Optional[str]:
+        """
+        Marqueur de révision du stockage.
+
+        Returns:
+            Chaîne qui change à chaque modification, ou None si inconnu
+        """
+        return None
+
+    def metriques(self) -> Dict:
+        """Métriques d'accès au stockage (vide par défaut)."""
+        return {}
+
+    def description(self) -> str:
+        """Description lisible du stockage."""
+        return self.nom
+
+
+# ========================================
+# BACKEND GOOGLE SHEETS
+# ========================================
+
+class SheetsBackend(StorageBackend):
+    """Stockage Google Sheets (gspread)."""
+
+    nom = 'Google Sheets'
+
+    SCOPES = [
+        'https://spreadsheets.google.com/feeds',
+        'https://www.googleapis.com/auth/drive'
+    ]
+
+    def __init__(
+        self,
+        credentials_file: Optional[str],
+        sheet_id: str,
+        client=None,
+        credentials_info: Optional[Dict] = None,
+        ordonnanceur: Optional[OrdonnanceurRequetes] = None
+    ):
+        """
+        Initialise la connexion à Google Sheets.
+
+        Préférer obtenir_backend_sheets(), qui partage une seule
+        connexion authentifiée par processus.
+
+        Args:
+            credentials_file: Chemin vers le fichier credentials.json
+            sheet_id: ID du Google Sheet
+            client: Client gspread déjà autorisé (optionnel, ex. faux client
+                pour les benchmarks) ; les credentials sont alors ignorés
+            credentials_info: Contenu du compte de service (dict), à la
+                place de credentials_file (ex. st.secrets)
+            ordonnanceur: Ordonnanceur des appels API (quota, regroupement,
+                reprise) ; un ordonnanceur par défaut est créé sinon
+
+        Raises:
+            ErreurStockage: si la connexion échoue
+        """
+        self.credentials_file = credentials_file
+        self.credentials_info = credentials_info
+        self.sheet_id = sheet_id
+        self.client = client
+        self._client_fourni = client is not None
+        self.ordonnanceur = ordonnanceur or OrdonnanceurRequetes()
+        self.spreadsheet = None
+        self._worksheets: Dict = {}
+        self._dernieres_valeurs: Dict[str, List[List]] = {}
+        self._verrou = threading.Lock()
+        self._connect()
+
+    def _connect(self):
+        """Établit la connexion avec Google Sheets."""
+        try:
+            if not self._client_fourni:
+                import gspread
+                from google.oauth2.service_account import Credentials
+
+                # La session autorisée google-auth renouvelle le jeton
+                # d'accès d'elle-même à expiration : pas de reconnexion.
+                if self.credentials_info is not None:
+                    credentials = Credentials.from_service_account_info(
+                        self.credentials_info, scopes=self.SCOPES
+                    )
+                else:
+                    credentials = Credentials.from_service_account_file(
+                        self.credentials_file, scopes=self.SCOPES
+                    )
+                self.client = gspread.authorize(credentials)
+                # Octets téléchargés par rendu (panneau de diagnostic)
+                self.client.session.hooks['response'].append(compter_reponse_http)
+
+            spreadsheet = self.ordonnanceur.executer(
+                lambda: self.client.open_by_key(self.sheet_id)
+            )
+            with self._verrou:
+                self.spreadsheet = spreadsheet
+                self._worksheets = {}
+            if not self._client_fourni:
+                print("✅ Connexion Google Sheets établie")
+        except Exception as e:
+            print(f"❌ Erreur de connexion : {str(e)}")
+            print(f"   Vérifiez : credentials_file='{self.credentials_file}'")
+            print(f"   Vérifiez : sheet_id='{self.sheet_id}'")
+            raise ErreurStockage(f"Connexion Google Sheets impossible : {e}") from e
+
+    def _appel(self, fonction, cle=None, idempotent=True):
+        """Appel API via l'ordonnanceur (quota, regroupement, reprise)."""
+        return self.ordonnanceur.executer(fonction, cle, idempotent)
+
+    def _worksheet(self, table: str):
+        """
+        Onglet gspread, mis en cache.
+
+        spreadsheet.worksheet() relit les métadonnées du classeur à chaque
+        appel ; le cache est protégé par un verrou car les lectures
+        peuvent venir de plusieurs threads (DataManagerV4.charger_donnees).
+        """
+        with self._verrou:
+            ws = self._worksheets.get(table)
+            spreadsheet = self.spreadsheet
+        if ws is None:
+            ws = self._appel(lambda: spreadsheet.worksheet(table), ('onglet', table))
+            with self._verrou:
+                self._worksheets[table] = ws
+        return ws
+
+    def lire_table(self, table: str, repli: bool = True) -> pd.DataFrame:
+        """
+        Lit toutes les lignes d'un onglet.
+
+        Args:
+            table: Nom de l'onglet
+            repli: En cas d'échec, servir la dernière lecture réussie ;
+                False pour voir l'exception (ex. synchronisation du
+                miroir, qui ne doit pas enregistrer une révision non lue)
+        """
+        try:
+            ws = self._worksheet(table)
+            # Lectures identiques en vol regroupées : une requête pour
+            # toutes les sessions (DataFrame construit par appelant).
+            # Valeurs brutes : pas de devinette de type cellule par
+            # cellule, le schéma de la feuille type chaque colonne
+            valeurs = self._appel(ws.get_values, ('lire', table))
+        except Exception as e:
+            # Quota épuisé malgré les reprises : dernière lecture réussie
+            # plutôt qu'une feuille vide affichée comme "0 projet"
+            with self._verrou:
+                valeurs = self._dernieres_valeurs.get(table) if repli else None
+            if valeurs is None:
+                raise
+            print(f"⚠️ Lecture {table} impossible ({str(e)}), données précédentes servies")
+            return tableau_valeurs(valeurs)
+
+        with self._verrou:
+            self._dernieres_valeurs[table] = valeurs
+        return tableau_valeurs(valeurs)
+
+    def affecter_projet(self, projet_id: str, chef_id: str) -> None:
+        ws = self._worksheet(FEUILLE_PROJETS)
+
+        # Trouver la ligne du projet
+        cell = self._appel(lambda: ws.find(projet_id))
+        if cell is None:
+            raise ErreurStockage(f"Projet {projet_id} introuvable")
+
+        # Trouver les colonnes dynamiquement
+        headers = self._appel(lambda: ws.row_values(1), ('entetes', FEUILLE_PROJETS))
+        try:
+            col_chef = headers.index('Chef_Affecte') + 1
+            col_statut = headers.index('Statut') + 1
+        except ValueError as e:
+            raise ErreurStockage(f"Colonne introuvable : {str(e)}") from e
+
+        # Mettre à jour Chef ET Statut
+        self._appel(lambda: ws.update_cell(cell.row, col_chef, chef_id))
+        self._appel(lambda: ws.update_cell(cell.row, col_statut, 'Actif'))
+
+    def _lignes_par_id(self, ws, table: str) -> Tuple[List[str], Dict[str, int]]:
+        """En-têtes et numéro de ligne de chaque identifiant (deux lectures)."""
+        headers = self._appel(lambda: ws.row_values(1), ('entetes', table))
+        try:
+            col_id = headers.index(COLONNES_ID[table]) + 1
+        except ValueError as e:
+            raise ErreurStockage(f"Colonne introuvable : {str(e)}") from e
+        ids = self._appel(lambda: ws.col_values(col_id))
+        lignes = {}
+        for numero, valeur in enumerate(ids[1:], start=2):
+            lignes.setdefault(str(valeur), numero)
+        return headers, lignes
+
+    def affecter_projets(self, affectations: List[Tuple[str, str]]) -> Dict[str, Optional[str]]:
+        ws = self._worksheet(FEUILLE_PROJETS)
+
+        # Deux lectures (en-têtes, colonne ID) puis un seul batch_update
+        headers, lignes = self._lignes_par_id(ws, FEUILLE_PROJETS)
+        try:
+            lettre_chef = lettre_colonne(headers.index('Chef_Affecte') + 1)
+            lettre_statut = lettre_colonne(headers.index('Statut') + 1)
+        except ValueError as e:
+            raise ErreurStockage(f"Colonne introuvable : {str(e)}") from e
+
+        resultats = {}
+        maj = []
+        for projet_id, chef_id in affectations:
+            numero = lignes.get(str(projet_id))
+            if numero is None:
+                resultats[projet_id] = f"Projet {projet_id} introuvable"
+                continue
+            maj.append({'range': f'{lettre_chef}{numero}', 'values': [[chef_id]]})
+            maj.append({'range': f'{lettre_statut}{numero}', 'values': [['Actif']]})
+            resultats[projet_id] = None
+        if maj:
+            self._appel(lambda: ws.batch_update(maj))
+        return resultats
+
+    def mettre_a_jour_cellules(self, table: str, cellules: List[Tuple[str, str, object]]) -> int:
+        ws = self._worksheet(table)
+        headers, lignes = self._lignes_par_id(ws, table)
+
+        maj = []
+        for identifiant, colonne, valeur in cellules:
+            numero = lignes.get(str(identifiant))
+            if numero is None:
+                continue
+            try:
+                lettre = lettre_colonne(headers.index(colonne) + 1)
+            except ValueError as e:
+                raise ErreurStockage(f"Colonne introuvable : {str(e)}") from e
+            maj.append({'range': f'{lettre}{numero}', 'values': [[_valeur_sql(valeur)]]})
+        if maj:
+            self._appel(lambda: ws.batch_update(maj))
+        return len(maj)
+
+    def sauvegarder_planification(self, planning_df: pd.DataFrame) -> None:
+        self.ajouter_planification(planning_df, remplacer=True)
+
+    def ajouter_planification(self, planning_df: pd.DataFrame, remplacer: bool = False) -> None:
+        ws = self._worksheet(FEUILLE_PLANIFICATION)
+
+        if remplacer:
+            # Effacer contenu existant puis réécrire en-têtes
+            self._appel(ws.clear)
+            self._appel(lambda: ws.append_row(COLONNES_PLANIFICATION), idempotent=False)
+
+        # Un seul appel API par bloc
+        lignes = lignes_planification(planning_df)
+        if lignes:
+            self._appel(lambda: ws.append_rows(lignes), idempotent=False)
+
+    def appliquer_diff_planification(self, diff) -> None:
+        ws = self._worksheet(FEUILLE_PLANIFICATION)
+        valeurs = self._appel(ws.get_all_values)
+        if not valeurs:
+            valeurs = [COLONNES_PLANIFICATION]
+            self._appel(lambda: ws.append_row(COLONNES_PLANIFICATION), idempotent=False)
+        entetes = valeurs[0]
+        i_projet = entetes.index('Projet_ID')
+        i_date = entetes.index('Date')
+        lignes_sheet = {
+            cle_planification(ligne[i_projet], ligne[i_date]): numero
+            for numero, ligne in enumerate(valeurs[1:], start=2)
+        }
+        derniere_colonne = lettre_colonne(len(COLONNES_PLANIFICATION))
+
+        # 1. Modifications : un seul batch_update
+        maj = []
+        for ligne in lignes_planification(diff.modifiees):
+            numero = lignes_sheet.get(cle_planification(ligne[4], ligne[2]))
+            if numero is not None:
+                maj.append({'range': f'A{numero}:{derniere_colonne}{numero}', 'values': [ligne]})
+        if maj:
+            self._appel(lambda: ws.batch_update(maj))
+
+        # 2. Suppressions : blocs contigus, du bas vers le haut
+        numeros = sorted(
+            {lignes_sheet[cle] for cle in (
+                cle_planification(p, d)
+                for p, d in zip(diff.supprimees.get('Projet_ID', []), diff.supprimees.get('Date', []))
+            ) if cle in lignes_sheet},
+            reverse=True
+        )
+        for debut, fin in _blocs_contigus(numeros):
+            self._appel(lambda debut=debut, fin=fin: ws.delete_rows(debut, fin), idempotent=False)
+
+        # 3. Insertions : un seul append_rows
+        nouvelles = lignes_planification(diff.inserees)
+        if nouvelles:
+            self._appel(lambda: ws.append_rows(nouvelles), idempotent=False)
+
+    def metriques(self) -> Dict:
+        """Métriques de l'ordonnanceur (file d'attente, limitation, reprises)."""
+        return self.ordonnanceur.metriques()
+
+    def lister_tables(self) -> List[str]:
+        return [ws.title for ws in self._appel(self.spreadsheet.worksheets)]
+
+    def reconnecter(self) -> None:
+        self._connect()
+
+    def revision(self) -> Optional[str]:
+        # Date de dernière modification Drive (un seul appel léger)
+        return self._appel(self.spreadsheet.get_lastUpdateTime, ('revision',))
+
+    def description(self) -> str:
+        return f"https://docs.google.com/spreadsheets/d/{self.sheet_id}"
+
+
+# ========================================
+# REGISTRE DE CONNEXIONS (PROCESSUS)
+# ========================================
+
+_CONNEXIONS_SHEETS: Dict[tuple, SheetsBackend] = {}
+_VERROU_CONNEXIONS = threading.Lock()
+
+
+def obtenir_backend_sheets(
+    sheet_id: str,
+    credentials_file: Optional[str] = None,
+    credentials_info: Optional[Dict] = None
+) -> SheetsBackend:
+    """
+    Renvoie la connexion Google Sheets partagée du processus.
+
+    L'authentification, la session HTTP, le classeur et le cache des
+    onglets sont créés une seule fois puis réutilisés par toutes les
+    reruns et sessions Streamlit. La fraîcheur des données relève du
+    cache applicatif, pas de la reconnexion.
+
+    Args:
+        sheet_id: ID du Google Sheet
+        credentials_file: Chemin vers le fichier credentials.json
+        credentials_info: Contenu du compte de service (dict)
+
+    Returns:
+        Instance SheetsBackend partagée
+    """
+    compte = (credentials_info or {}).get('client_email', credentials_file)
+    cle = (sheet_id, compte)
+    with _VERROU_CONNEXIONS:
+        backend = _CONNEXIONS_SHEETS.get(cle)
+        if backend is None:
+            backend = SheetsBackend(
+                credentials_file, sheet_id, credentials_info=credentials_info
+            )
+            _CONNEXIONS_SHEETS[cle] = backend
+        return backend
+
+
+def oublier_connexions() -> None:
+    """Vide le registre (les prochaines demandes se réauthentifient)."""
+    with _VERROU_CONNEXIONS:
+        _CONNEXIONS_SHEETS.clear()
+
+
+# ========================================
+# BACKEND SQLITE LOCAL
+# ========================================
+
+def _identifiant(nom: str) -> str:
+    """Échappe un nom de table/colonne SQL (accents, espaces)."""
+    return '"' + str(nom).replace('"', '""') + '"'
+
+
+def _valeur_sql(valeur):
+    """Convertit une valeur pandas/numpy en valeur liable par sqlite3."""
+    if valeur is None:
+        return None
+    if isinstance(valeur, (pd.Timestamp, datetime, date)):
+        return valeur.strftime('%Y-%m-%d') if not pd.isna(valeur) else None
+    if isinstance(valeur, np.generic):
+        valeur = valeur.item()
+    if isinstance(valeur, float) and np.isnan(valeur):
+        return None
+    if valeur is pd.NaT:
+        return None
+    return valeur
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Stockage local SQLite.
+
+    Chaque feuille est une table aux colonnes non typées (les valeurs
+    sont conservées telles que Google Sheets les renverrait), avec des
+    index sur les identifiants et les colonnes filtrées par l'application.
+    """
+
+    nom = 'SQLite'
+
+    INDEX = {
+        FEUILLE_PROJETS: ['ID_Projet', 'Chef_Affecte', 'Statut', 'ID_Client'],
+        FEUILLE_CHEFS: ['ID_Chef'],
+        FEUILLE_CLIENTS: ['ID_Client'],
+        FEUILLE_PLANIFICATION: ['Chef_ID', 'Projet_ID']
+    }
+
+    def __init__(self, chemin_db: str):
+        """
+        Ouvre (ou crée) la base locale.
+
+        Args:
+            chemin_db: Chemin du fichier SQLite
+        """
+        self.chemin_db = chemin_db
+        self._verrou_ecriture = threading.Lock()
+        with self._connexion() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+
+    @contextmanager
+    def _connexion(self):
+        """Connexion courte (une par opération, sûre entre threads)."""
+        conn = sqlite3.connect(self.chemin_db, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _colonnes(self, conn: sqlite3.Connection, table: str) -> List[str]:
+        lignes = conn.execute(f'PRAGMA table_info({_identifiant(table)})').fetchall()
+        return [ligne[1] for ligne in lignes]
+
+    def _requete(self, sql: str, params: tuple = ()) -> pd.DataFrame:
+        with self._connexion() as conn:
+            curseur = conn.execute(sql, params)
+            colonnes = [d[0] for d in curseur.description]
+            return pd.DataFrame(curseur.fetchall(), columns=colonnes)
+
+    def colonnes_table(self, table: str) -> List[str]:
+        """Colonnes d'une table (liste vide si la table n'existe pas)."""
+        with self._connexion() as conn:
+            return self._colonnes(conn, table)
+
+    def _verifier_table(self, table: str) -> List[str]:
+        with self._connexion() as conn:
+            colonnes = self._colonnes(conn, table)
+        if not colonnes:
+            raise ErreurStockage(f"Table {table} absente de {self.chemin_db}")
+        return colonnes
+
+    # ----------------------------------------
+    # Import
+    # ----------------------------------------
+
+    def importer_table(self, table: str, df: pd.DataFrame) -> None:
+        """
+        Remplace une table par le contenu d'un DataFrame et crée ses index.
+
+        Args:
+            table: Nom de la feuille
+            df: Données (valeurs brutes ou typées)
+        """
+        colonnes = [str(c) for c in df.columns]
+        cols_sql = ', '.join(_identifiant(c) for c in colonnes)
+        marques = ', '.join('?' for _ in colonnes)
+        lignes = [
+            tuple(_valeur_sql(v) for v in ligne)
+            for ligne in df.itertuples(index=False, name=None)
+        ]
+
+        with self._verrou_ecriture, self._connexion() as conn:
+            conn.execute(f'DROP TABLE IF EXISTS {_identifiant(table)}')
+            conn.execute(f'CREATE TABLE {_identifiant(table)} ({cols_sql})')
+            if lignes:
+                conn.executemany(
+                    f'INSERT INTO {_identifiant(table)} ({cols_sql}) VALUES ({marques})',
+                    lignes
+                )
+            for colonne in self.INDEX.get(table, []):
+                if colonne in colonnes:
+                    conn.execute(
+                        f'CREATE INDEX IF NOT EXISTS '
+                        f'{_identifiant(f"idx_{table}_{colonne}")} '
+                        f'ON {_identifiant(table)} ({_identifiant(colonne)})'
+                    )
+
+    @classmethod
+    def depuis_backend(
+        cls,
+        source: StorageBackend,
+        chemin_db: str,
+        tables: Optional[List[str]] = None
+    ) -> 'SQLiteBackend':
+        """
+        Crée une base locale à partir d'un autre backend (ex. copie du Sheet).
+
+        Args:
+            source: Backend source
+            chemin_db: Chemin du fichier SQLite à créer
+            tables: Feuilles à copier (défaut : toutes)
+
+        Returns:
+            Instance SQLiteBackend
+        """
+        backend = cls(chemin_db)
+        for table in tables or FEUILLES:
+            backend.importer_table(table, source.lire_table(table))
+        return backend
+
+    # ----------------------------------------
+    # Lecture
+    # ----------------------------------------
+
+    def lire_table(self, table: str) -> pd.DataFrame:
+        self._verifier_table(table)
+        return self._requete(f'SELECT * FROM {_identifiant(table)} ORDER BY rowid')
+
+    def lire_filtre(
+        self,
+        table: str,
+        colonne: str,
+        valeurs: List,
+        inclure_vides: bool = False
+    ) -> pd.DataFrame:
+        colonnes = self._verifier_table(table)
+        if colonne not in colonnes:
+            return pd.DataFrame(columns=colonnes)
+
+        conditions = []
+        params = [_valeur_sql(v) for v in valeurs]
+        if params:
+            marques = ', '.join('?' for _ in params)
+            conditions.append(f'{_identifiant(colonne)} IN ({marques})')
+        if inclure_vides:
+            conditions.append(f"{_identifiant(colonne)} IS NULL OR {_identifiant(colonne)} = ''")
+        if not conditions:
+            return pd.DataFrame(columns=colonnes)
+
+        return self._requete(
+            f'SELECT * FROM {_identifiant(table)} '
+            f'WHERE {" OR ".join(conditions)} ORDER BY rowid',
+            tuple(params)
+        )
+
+    # ----------------------------------------
+    # Écriture
+    # ----------------------------------------
+
+    def affecter_projet(self, projet_id: str, chef_id: str) -> None:
+        self._verifier_table(FEUILLE_PROJETS)
+        with self._verrou_ecriture, self._connexion() as conn:
+            curseur = conn.execute(
+                f'UPDATE {_identifiant(FEUILLE_PROJETS)} '
+                f'SET "Chef_Affecte" = ?, "Statut" = ? WHERE "ID_Projet" = ?',
+                (chef_id, 'Actif', projet_id)
+            )
+            if curseur.rowcount == 0:
+                raise ErreurStockage(f"Projet {projet_id} introuvable")
+
+    def affecter_projets(self, affectations: List[Tuple[str, str]]) -> Dict[str, Optional[str]]:
+        self._verifier_table(FEUILLE_PROJETS)
+        table = _identifiant(FEUILLE_PROJETS)
+        with self._verrou_ecriture, self._connexion() as conn:
+            # Une transaction : IDs existants puis un executemany
+            ids = [projet_id for projet_id, _ in affectations]
+            existants = {str(ligne[0]) for ligne in conn.execute(
+                f'SELECT "ID_Projet" FROM {table} '
+                f'WHERE "ID_Projet" IN ({", ".join("?" for _ in ids)})',
+                ids
+            )} if ids else set()
+            conn.executemany(
+                f'UPDATE {table} SET "Chef_Affecte" = ?, "Statut" = ? WHERE "ID_Projet" = ?',
+                [(chef_id, 'Actif', projet_id) for projet_id, chef_id in affectations
+                 if str(projet_id) in existants]
+            )
+        return {
+            projet_id: None if str(projet_id) in existants else f"Projet {projet_id} introuvable"
+            for projet_id, _ in affectations
+        }
+
+    def mettre_a_jour_cellules(self, table: str, cellules: List[Tuple[str, str, object]]) -> int:
+        colonnes = self._verifier_table(table)
+        colonne_id = COLONNES_ID[table]
+        par_colonne: Dict[str, List[tuple]] = {}
+        for identifiant, colonne, valeur in cellules:
+            if colonne not in colonnes:
+                raise ErreurStockage(f"Colonne introuvable : {colonne}")
+            par_colonne.setdefault(colonne, []).append((_valeur_sql(valeur), identifiant))
+
+        # Une transaction, un executemany par colonne
+        nb = 0
+        with self._verrou_ecriture, self._connexion() as conn:
+            for colonne, parametres in par_colonne.items():
+                curseur = conn.executemany(
+                    f'UPDATE {_identifiant(table)} SET {_identifiant(colonne)} = ? '
+                    f'WHERE {_identifiant(colonne_id)} = ?',
+                    parametres
+                )
+                nb += curseur.rowcount
+        return nb
+
+    def appliquer_delta(
+        self,
+        table: str,
+        lignes: pd.DataFrame,
+        ids_supprimes: List
+    ) -> None:
+        """
+        Met à jour une table ligne par ligne à partir de son identifiant.
+
+        Les lignes existantes sont modifiées en place (ordre conservé),
+        les nouvelles ajoutées en fin de table.
+
+        Args:
+            table: Feuille disposant d'une colonne identifiant (COLONNES_ID)
+            lignes: Lignes à insérer ou modifier (mêmes colonnes que la table)
+            ids_supprimes: Identifiants à supprimer
+        """
+        colonne_id = COLONNES_ID[table]
+        colonnes = [str(c) for c in lignes.columns]
+        autres = [c for c in colonnes if c != colonne_id]
+        sql_update = (
+            f'UPDATE {_identifiant(table)} SET '
+            + ', '.join(f'{_identifiant(c)} = ?' for c in autres)
+            + f' WHERE {_identifiant(colonne_id)} = ?'
+        )
+        sql_insert = (
+            f'INSERT INTO {_identifiant(table)} '
+            f'({", ".join(_identifiant(c) for c in colonnes)}) '
+            f'VALUES ({", ".join("?" for _ in colonnes)})'
+        )
+
+        with self._verrou_ecriture, self._connexion() as conn:
+            if ids_supprimes:
+                conn.executemany(
+                    f'DELETE FROM {_identifiant(table)} WHERE {_identifiant(colonne_id)} = ?',
+                    [(_valeur_sql(v),) for v in ids_supprimes]
+                )
+            for ligne in lignes.to_dict('records'):
+                valeurs = {c: _valeur_sql(ligne[c]) for c in colonnes}
+                curseur = conn.execute(
+                    sql_update,
+                    tuple(valeurs[c] for c in autres) + (valeurs[colonne_id],)
+                )
+                if curseur.rowcount == 0:
+                    conn.execute(sql_insert, tuple(valeurs[c] for c in colonnes))
+
+    def appliquer_diff_planification(self, diff) -> None:
+        table = _identifiant(FEUILLE_PLANIFICATION)
+        if not self.colonnes_table(FEUILLE_PLANIFICATION):
+            self.importer_table(
+                FEUILLE_PLANIFICATION, pd.DataFrame(columns=COLONNES_PLANIFICATION)
+            )
+        autres = [c for c in COLONNES_PLANIFICATION if c not in ('Projet_ID', 'Date')]
+        sql_update = (
+            f'UPDATE {table} SET '
+            + ', '.join(f'{_identifiant(c)} = ?' for c in autres)
+            + ' WHERE "Projet_ID" = ? AND "Date" = ?'
+        )
+        sql_insert = (
+            f'INSERT INTO {table} ({", ".join(_identifiant(c) for c in COLONNES_PLANIFICATION)}) '
+            f'VALUES ({", ".join("?" for _ in COLONNES_PLANIFICATION)})'
+        )
+
+        def parametres_update(ligne):
+            valeurs = dict(zip(COLONNES_PLANIFICATION, ligne))
+            return tuple(valeurs[c] for c in autres) + (valeurs['Projet_ID'], valeurs['Date'])
+
+        supprimees = [
+            cle_planification(p, d)
+            for p, d in zip(diff.supprimees.get('Projet_ID', []), diff.supprimees.get('Date', []))
+        ]
+        with self._verrou_ecriture, self._connexion() as conn:
+            conn.executemany(
+                f'DELETE FROM {table} WHERE "Projet_ID" = ? AND "Date" = ?', supprimees
+            )
+            conn.executemany(sql_update, [
+                parametres_update(ligne) for ligne in lignes_planification(diff.modifiees)
+            ])
+            conn.executemany(sql_insert, lignes_planification(diff.inserees))
+
+    def lire_meta(self, cle: str) -> Optional[str]:
+        """Lit une valeur de la table technique _meta (None si absente)."""
+        with self._connexion() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS "_meta" (cle TEXT PRIMARY KEY, valeur TEXT)')
+            ligne = conn.execute('SELECT valeur FROM "_meta" WHERE cle = ?', (cle,)).fetchone()
+        return ligne[0] if ligne else None
+
+    def ecrire_meta(self, cle: str, valeur: Optional[str]) -> None:
+        """Écrit une valeur dans la table technique _meta."""
+        with self._verrou_ecriture, self._connexion() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS "_meta" (cle TEXT PRIMARY KEY, valeur TEXT)')
+            conn.execute(
+                'INSERT OR REPLACE INTO "_meta" (cle, valeur) VALUES (?, ?)',
+                (cle, valeur)
+            )
+
+    def sauvegarder_planification(self, planning_df: pd.DataFrame) -> None:
+        df = pd.DataFrame(
+            lignes_planification(planning_df),
+            columns=COLONNES_PLANIFICATION
+        )
+        self.importer_table(FEUILLE_PLANIFICATION, df)
+
+    def ajouter_planification(self, planning_df: pd.DataFrame, remplacer: bool = False) -> None:
+        if remplacer or not self.colonnes_table(FEUILLE_PLANIFICATION):
+            self.sauvegarder_planification(planning_df)
+            return
+        table = _identifiant(FEUILLE_PLANIFICATION)
+        sql_insert = (
+            f'INSERT INTO {table} ({", ".join(_identifiant(c) for c in COLONNES_PLANIFICATION)}) '
+            f'VALUES ({", ".join("?" for _ in COLONNES_PLANIFICATION)})'
+        )
+        with self._verrou_ecriture, self._connexion() as conn:
+            conn.executemany(sql_insert, lignes_planification(planning_df))
+
+    def lister_tables(self) -> List[str]:
+        with self._connexion() as conn:
+            lignes = conn.execute(
+                "SELECT name FROM sqlite_master "
+                "WHERE type = 'table' AND name NOT LIKE '\\_%' ESCAPE '\\' ORDER BY name"
+            ).fetchall()
+        return [ligne[0] for ligne in lignes]
+
+    def description(self) -> str:
+        return f"sqlite:///{self.chemin_db}"
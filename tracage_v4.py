@@ -0,0 +1,276 @@
+"""
+Traçage V4 - Profil léger des rendus (temps, requêtes, octets)
+================================================================
+
+Une trace regroupe ce qui se passe pendant un traitement (rendu d'une
+page, cycle de rafraîchissement) :
+- durée totale
+- durée de chaque appel des couches données et algorithme
+- compteurs (requêtes Sheets émises, octets téléchargés)
+
+La trace courante est portée par une ContextVar : chaque couche y
+rapporte sans qu'on la lui passe en paramètre, et deux sessions
+Streamlit (threads différents) ne se mélangent pas. Hors trace, les
+points de mesure se réduisent à une lecture de ContextVar.
+
+Seuls les appels les plus externes d'une catégorie sont mesurés : un
+get_projets appelé depuis charger_donnees n'est pas compté deux fois.
+
+Auteur : PFE - ENCG Settat
+Projet : PMO Orchestre
+Date : Novembre 2025
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, FrozenSet, List, Optional
+
+
+# ========================================
+# CONSTANTES
+# ========================================
+
+# Catégories de mesure
+DONNEES = 'donnees'
+ALGORITHME = 'algorithme'
+
+# Compteurs
+REQUETES_SHEETS = 'requetes_sheets'
+OCTETS_SHEETS = 'octets_sheets'
+
+# Traces conservées pour l'historique (tous traitements confondus)
+HISTORIQUE_MAX = 500
+
+
+# ========================================
+# TRACE
+# ========================================
+
+class Trace:
+    """
+    Mesures d'un traitement.
+
+    Attributs:
+        nom: Traitement tracé (ex. 'page:Dashboard', 'rafraichissement')
+        horodatage: Début du traitement
+        duree_s: Durée totale (None tant que la trace est ouverte)
+        appels: Liste de (catégorie, nom, durée en secondes)
+        compteurs: Dict {compteur: valeur cumulée}
+    """
+
+    def __init__(self, nom: str):
+        self.nom = nom
+        self.horodatage = datetime.now()
+        self.duree_s: Optional[float] = None
+        self.appels: List[tuple] = []
+        self.compteurs: Dict[str, float] = {}
+        # Alimentée aussi depuis les threads du pool de lectures
+        self._verrou = threading.Lock()
+        self._debut = time.perf_counter()
+
+    def ajouter_appel(self, categorie: str, nom: str, duree_s: float) -> None:
+        with self._verrou:
+            self.appels.append((categorie, nom, duree_s))
+
+    def incrementer(self, compteur: str, valeur: float = 1) -> None:
+        with self._verrou:
+            self.compteurs[compteur] = self.compteurs.get(compteur, 0) + valeur
+
+    def fermer(self) -> None:
+        self.duree_s = time.perf_counter() - self._debut
+
+    def duree_categorie(self, categorie: str) -> float:
+        """Temps cumulé des appels d'une catégorie (secondes)."""
+        with self._verrou:
+            return sum(duree for cat, _, duree in self.appels if cat == categorie)
+
+    def detail(self, categorie: str) -> List[Dict]:
+        """
+        Appels d'une catégorie regroupés par nom.
+
+        Returns:
+            Liste de dicts {appel, nb, duree_s}, du plus coûteux au moins coûteux
+        """
+        groupes: Dict[str, List[float]] = {}
+        with self._verrou:
+            for cat, nom, duree in self.appels:
+                if cat == categorie:
+                    groupes.setdefault(nom, []).append(duree)
+        lignes = [
+            {'appel': nom, 'nb': len(durees), 'duree_s': sum(durees)}
+            for nom, durees in groupes.items()
+        ]
+        return sorted(lignes, key=lambda ligne: ligne['duree_s'], reverse=True)
+
+    def resume(self) -> Dict:
+        """
+        Résumé à plat (une ligne d'historique).
+
+        Returns:
+            Dict avec horodatage, traitement, total_s, donnees_s,
+            algorithme_s, requetes_sheets, octets_sheets
+        """
+        return {
+            'horodatage': self.horodatage,
+            'traitement': self.nom,
+            'total_s': self.duree_s,
+            'donnees_s': self.duree_categorie(DONNEES),
+            'algorithme_s': self.duree_categorie(ALGORITHME),
+            'requetes_sheets': int(self.compteurs.get(REQUETES_SHEETS, 0)),
+            'octets_sheets': int(self.compteurs.get(OCTETS_SHEETS, 0))
+        }
+
+
+_TRACE: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar('pmo_trace', default=None)
+_CATEGORIES_ACTIVES: contextvars.ContextVar[FrozenSet[str]] = contextvars.ContextVar(
+    'pmo_categories_actives', default=frozenset()
+)
+
+_HISTORIQUE: deque = deque(maxlen=HISTORIQUE_MAX)
+_VERROU_HISTORIQUE = threading.Lock()
+
+
+@contextmanager
+def tracer(nom: str):
+    """
+    Ouvre une trace pour le bloc (puis l'ajoute à l'historique).
+
+    Args:
+        nom: Traitement tracé
+
+    Yields:
+        Trace en cours
+    """
+    trace = Trace(nom)
+    jeton = _TRACE.set(trace)
+    jeton_categories = _CATEGORIES_ACTIVES.set(frozenset())
+    try:
+        yield trace
+    finally:
+        _CATEGORIES_ACTIVES.reset(jeton_categories)
+        _TRACE.reset(jeton)
+        trace.fermer()
+        with _VERROU_HISTORIQUE:
+            _HISTORIQUE.append(trace.resume())
+
+
+def trace_courante() -> Optional[Trace]:
+    """Trace ouverte dans le contexte courant (None hors trace)."""
+    return _TRACE.get()
+
+
+def historique(nom: Optional[str] = None) -> List[Dict]:
+    """
+    Résumés des dernières traces du processus (plus ancienne en premier).
+
+    Args:
+        nom: Ne garder qu'un traitement (ex. 'page:Dashboard')
+
+    Returns:
+        Liste de Trace.resume()
+    """
+    with _VERROU_HISTORIQUE:
+        resumes = list(_HISTORIQUE)
+    if nom is not None:
+        resumes = [resume for resume in resumes if resume['traitement'] == nom]
+    return resumes
+
+
+# ========================================
+# POINTS DE MESURE
+# ========================================
+
+@contextmanager
+def mesurer(categorie: str, nom: str):
+    """
+    Mesure la durée du bloc dans la trace courante.
+
+    Sans effet hors trace, ou à l'intérieur d'un appel déjà mesuré de
+    la même catégorie.
+    """
+    trace = _TRACE.get()
+    categories = _CATEGORIES_ACTIVES.get()
+    if trace is None or categorie in categories:
+        yield
+        return
+    jeton = _CATEGORIES_ACTIVES.set(categories | {categorie})
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.ajouter_appel(categorie, nom, time.perf_counter() - debut)
+        _CATEGORIES_ACTIVES.reset(jeton)
+
+
+def compter(compteur: str, valeur: float = 1) -> None:
+    """Incrémente un compteur de la trace courante (sans effet hors trace)."""
+    trace = _TRACE.get()
+    if trace is not None:
+        trace.incrementer(compteur, valeur)
+
+
+def compter_reponse_http(reponse, *args, **kwargs):
+    """
+    Hook `response` de requests : octets téléchargés de la réponse.
+
+    À brancher sur la session du client gspread (voir SheetsBackend).
+    """
+    if _TRACE.get() is not None:
+        compter(OCTETS_SHEETS, len(reponse.content or b''))
+    return reponse
+
+
+def propager(fonction: Callable) -> Callable:
+    """
+    Lie une fonction au contexte courant avant de la confier à un pool
+    de threads : les mesures faites dans le thread rejoignent la trace
+    de l'appelant.
+    """
+    contexte = contextvars.copy_context()
+    return functools.partial(contexte.run, fonction)
+
+
+def mesure(categorie: str, nom: Optional[str] = None) -> Callable:
+    """
+    Décorateur de fonction : mesure chaque appel (voir mesurer).
+
+    Args:
+        categorie: DONNEES ou ALGORITHME
+        nom: Nom affiché (défaut : nom qualifié de la fonction)
+    """
+    def decorer(fonction: Callable) -> Callable:
+        libelle = nom or fonction.__qualname__
+
+        @functools.wraps(fonction)
+        def envelopper(*args, **kwargs):
+            if _TRACE.get() is None:
+                return fonction(*args, **kwargs)
+            with mesurer(categorie, libelle):
+                return fonction(*args, **kwargs)
+        return envelopper
+    return decorer
+
+
+def instrumenter(categorie: str) -> Callable:
+    """
+    Décorateur de classe : mesure toutes les méthodes publiques.
+
+    Les propriétés et les méthodes privées (préfixe _) sont laissées
+    telles quelles ; classmethod et staticmethod sont préservées.
+    """
+    def decorer(cls):
+        for attribut, valeur in list(vars(cls).items()):
+            if attribut.startswith('_'):
+                continue
+            nom = f"{cls.__name__}.{attribut}"
+            if isinstance(valeur, (classmethod, staticmethod)):
+                setattr(cls, attribut, type(valeur)(mesure(categorie, nom)(valeur.__func__)))
+            elif callable(valeur):
+                setattr(cls, attribut, mesure(categorie, nom)(valeur))
+        return cls
+    return decorer